@@ -27,6 +27,37 @@ def main():
         -ss:    The shelf size at store. In each trip, a random number of items are selected and
                 will be available on store shelf.
         -se:    Seed for reproducibility
+        -en:    Simulation engine. 'legacy' generates one user at a time, 'batched' draws
+                the utilities of all users of a group at once.
+        -cs:    Number of users generated per block
+        -st:    Streaming mode. Each block of users is appended to the output files as soon
+                as it is generated, so the data set is never held in memory. Report statistics
+                still keep num_users x num_items item view counts (int32), and with -rg global
+                the groups of all users are drawn up front.
+        -rg:    Random state mode. 'global' uses the numpy random state seeded here, 'spawn' gives
+                every block of users an independent random stream derived from the seed.
+        -nw:    Number of worker processes. Needs -rg spawn. Results do not depend on it.
+        -of:    Output format. 'csv' (default) or a binary layout of .npy files with a schema.json:
+                'npy' (dense item flags), 'index' (index of items on shelf) or 'bitpacked' (packed flags).
+        -pf:    Profile the run with cProfile. The profile is written to run_profile.prof in the output dir.
+        -tm:    Trace peak memory with tracemalloc. Reported in run_report.json.
+        -dc:    Directory caching parsed and factorized group distributions. Later runs on the same
+                input files skip parsing and validation.
+        -dl:    Size of the design library. If positive, a pool of designs is generated once and users
+                are served designs from it by index instead of drawing a design per user.
+        -dlb:   Serve only the designs of the library with the best item balance and co-occurrence.
+        -dlc:   Directory caching design libraries, keyed by design parameters and seed.
+        -lc:    Large catalog mode. Shelves are drawn in O(shelf_size log num_items) per trip and kept
+                as item index arrays instead of dense item flags.
+        -pa:    Pantry mode. Simulates consumption and restocking, adding the quantity bought and the
+                timestamp (days) of each trip to the data set.
+        -cr:    Mean consumption rate across users in units per day (pantry mode)
+        -pq:    Mean quantity bought per trip in units (pantry mode)
+        -ck:    Checkpoint mode. Blocks are written as shard files recorded in a checkpoint manifest.
+                Running the same command again after an interruption resumes from the completed shards.
+        -dd:    Design diagnostics. Adds item co-occurrence, global balance and D-efficiency reports.
+
+        Stage timings and counters of every run are written to run_report.json in the output dir.
 
         Example run:
         python __main__.py
@@ -52,16 +83,52 @@ def main():
     parser.add_argument('-nt', '--num_trips', help='Num shopping trips per user', default=18, required=False)
     parser.add_argument('-ss', '--shelf_size', help='Number of items shown in each trip', default=6, required=False)
     parser.add_argument('-se', '--seed', help='Random seed for reproducibility', default=1234, required=False)
+    parser.add_argument('-en', '--engine', help='Simulation engine', choices=['legacy', 'batched'],
+                        default='legacy', required=False)
+    parser.add_argument('-cs', '--chunk_size', help='Number of users generated per block', default=1000,
+                        required=False)
+    parser.add_argument('-st', '--stream', help='Append each block of users to the output files',
+                        action='store_true', required=False)
+    parser.add_argument('-rg', '--rng', help='Random state mode', choices=['global', 'spawn'], default='global',
+                        required=False)
+    parser.add_argument('-nw', '--num_workers', help='Number of worker processes', default=1, required=False)
+    parser.add_argument('-of', '--output_format', help='Format of the results', default='csv',
+                        choices=['csv', 'npy', 'index', 'bitpacked'], required=False)
+    parser.add_argument('-pf', '--profile', help='Profile the run with cProfile', action='store_true',
+                        required=False)
+    parser.add_argument('-tm', '--trace_memory', help='Trace peak memory with tracemalloc', action='store_true',
+                        required=False)
+    parser.add_argument('-dc', '--distribution_cache_dir', help='Cache directory of parsed distributions',
+                        default=None, required=False)
+    parser.add_argument('-dl', '--design_library_size', help='Number of designs in the design library',
+                        default=0, required=False)
+    parser.add_argument('-dlb', '--design_library_best', help='Number of best library designs served',
+                        default=None, required=False)
+    parser.add_argument('-dlc', '--design_cache_dir', help='Cache directory of design libraries', default=None,
+                        required=False)
+    parser.add_argument('-lc', '--large_catalog', help='Sparse DoE and shelves for large catalogs',
+                        action='store_true', required=False)
+    parser.add_argument('-pa', '--pantry', help='Simulate pantries, purchase quantities and trip times',
+                        action='store_true', required=False)
+    parser.add_argument('-cr', '--consumption_rate', help='Mean consumption rate in units per day', default=1.0,
+                        required=False)
+    parser.add_argument('-pq', '--purchase_quantity', help='Mean quantity bought per trip', default=3.0,
+                        required=False)
+    parser.add_argument('-ck', '--checkpoint', help='Write resumable shards with a checkpoint manifest',
+                        action='store_true', required=False)
+    parser.add_argument('-dd', '--design_diagnostics', help='Report co-occurrences and D-efficiency of the design',
+                        action='store_true', required=False)
 
     args = parser.parse_args()
-    random.seed(args.seed)
-    np.random.seed(args.seed)
+    random.seed(int(args.seed))
+    np.random.seed(int(args.seed))
     print("Parsing arguments done.")
 
     print("Starting dataset builder.")
     db = dataset_builder.DatasetBuilder(args)
     db.generate_data_set()
     db.generate_reports()
+    db.write_run_report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,81 @@
+import sys
+import argparse
+from benchmark.benchmark_runner import BenchmarkRunner
+from src.dataset.dataset_builder import DatasetBuilder
+
+
+def main():
+    """ Runs the simulator benchmark suite.
+        A base configuration is run first, then each parameter is swept on its own while the
+        others stay at their base value. Synthetic input files are generated in the work directory.
+
+        Detailed description of commandline arguments:
+        -w:     Work directory for synthetic inputs and outputs
+        -en:    Simulation engine to benchmark ('batched' or 'legacy')
+        -nu, -ni, -nt, -ss, -ng:
+                Base number of users, items, trips, shelf size and groups
+        -snu, -sni, -snt, -sss, -sng:
+                Values swept for each of these parameters
+        -cs:    Number of users simulated per block
+        -rg:    Random state of the simulation ('global' or 'spawn')
+        -r:     Number of timed repeats per configuration (best time is kept)
+        -out:   JSON file to write the report to
+        -b:     Baseline JSON report to compare against. Exits with status 1 on regressions.
+        -tol:   Relative slowdown tolerated before flagging a regression
+
+        Example run from the project root:
+        python -m benchmark -w /tmp/shopping_benchmark -out baseline.json
+        python -m benchmark -w /tmp/shopping_benchmark -b baseline.json
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--work_dir', help='Work directory', default='benchmark_output', required=False)
+    parser.add_argument('-en', '--engine', help='Simulation engine', choices=['legacy', 'batched'],
+                        default='batched', required=False)
+    parser.add_argument('-nu', '--num_users', help='Base number of users', type=int, default=1000)
+    parser.add_argument('-ni', '--num_items', help='Base number of items', type=int, default=12)
+    parser.add_argument('-nt', '--num_trips', help='Base number of trips', type=int, default=18)
+    parser.add_argument('-ss', '--shelf_size', help='Base shelf size', type=int, default=6)
+    parser.add_argument('-ng', '--num_groups', help='Base number of groups', type=int, default=3)
+    parser.add_argument('-snu', '--sweep_num_users', help='Swept numbers of users', type=int, nargs='*',
+                        default=[10000, 100000])
+    parser.add_argument('-sni', '--sweep_num_items', help='Swept numbers of items', type=int, nargs='*',
+                        default=[100, 1000])
+    parser.add_argument('-snt', '--sweep_num_trips', help='Swept numbers of trips', type=int, nargs='*',
+                        default=[54, 180])
+    parser.add_argument('-sss', '--sweep_shelf_size', help='Swept shelf sizes', type=int, nargs='*',
+                        default=[3, 12])
+    parser.add_argument('-sng', '--sweep_num_groups', help='Swept numbers of groups', type=int, nargs='*',
+                        default=[1, 10])
+    parser.add_argument('-cs', '--chunk_size', help='Users simulated per block', type=int,
+                        default=DatasetBuilder.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('-rg', '--rng', help='Random state of the simulation', choices=['global', 'spawn'],
+                        default='global', required=False)
+    parser.add_argument('-r', '--repeats', help='Timed repeats per configuration', type=int, default=3)
+    parser.add_argument('-se', '--seed', help='Random seed', type=int, default=1234)
+    parser.add_argument('-out', '--output_file', help='Report JSON file', default=None, required=False)
+    parser.add_argument('-b', '--baseline_file', help='Baseline report JSON file', default=None, required=False)
+    parser.add_argument('-tol', '--tolerance', help='Tolerated relative slowdown', type=float, default=0.2)
+    args = parser.parse_args()
+
+    base_config = {p: getattr(args, p) for p in BenchmarkRunner.PARAMETERS}
+    sweeps = {p: getattr(args, 'sweep_' + p) for p in BenchmarkRunner.PARAMETERS}
+    runner = BenchmarkRunner(args.work_dir, engine=args.engine, repeats=args.repeats, seed=args.seed,
+                             chunk_size=args.chunk_size, rng=args.rng)
+    report = runner.run(BenchmarkRunner.get_configs(base_config, sweeps))
+
+    if args.output_file is not None:
+        BenchmarkRunner.save_report(report, args.output_file)
+        print("Report written to {0}".format(args.output_file))
+
+    if args.baseline_file is not None:
+        regressions = BenchmarkRunner.find_regressions(report, BenchmarkRunner.load_report(args.baseline_file),
+                                                       tolerance=args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regression against {0}".format(args.baseline_file))
+
+
+if __name__ == '__main__':
+    main()
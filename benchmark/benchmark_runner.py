@@ -0,0 +1,211 @@
+import os
+import io
+import sys
+import json
+import argparse
+import platform
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+from src.dataset.dataset_builder import DatasetBuilder
+from src.dataset.instrumentation import run_monitor
+
+
+class BenchmarkRunner:
+    """ Measures simulator throughput on synthetic inputs.
+        Each configuration is generated by DatasetBuilder in blocks of chunk_size users, and the
+        time and peak memory of the stages timed by its RunMonitor (parsing, group draw, utilities,
+        DoE, choices, accumulation, result assembly, reports and save) are reported separately.
+        With the legacy engine utilities, DoE and choices are interleaved per user and reported
+        as a single simulation stage.
+    """
+    PARAMETERS = ('num_users', 'num_items', 'num_trips', 'shelf_size', 'num_groups')
+    PROBABILITY_RESOLUTION = 1024
+
+    def __init__(self, work_dir, engine='batched', repeats=1, seed=1234,
+                 chunk_size=DatasetBuilder.DEFAULT_CHUNK_SIZE, rng='global'):
+        self.work_dir = work_dir
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.rng = rng
+        self.repeats = repeats
+        self.seed = seed
+        if not os.path.exists(work_dir):
+            os.makedirs(work_dir)
+
+    @staticmethod
+    def get_config_key(config):
+        return ','.join('{0}={1}'.format(p, config[p]) for p in BenchmarkRunner.PARAMETERS)
+
+    @staticmethod
+    def get_configs(base_config, sweeps):
+        """ Varies one parameter at a time around the base configuration.
+            Configurations with a shelf larger than the catalog are skipped.
+
+            Returns:
+                configs:    A list of configuration dictionaries, base configuration first
+        """
+        configs = [dict(base_config)]
+        for parameter in BenchmarkRunner.PARAMETERS:
+            for value in sweeps.get(parameter, []):
+                config = dict(base_config, **{parameter: value})
+                if config['shelf_size'] <= config['num_items'] and config not in configs:
+                    configs.append(config)
+        return configs
+
+    def write_synthetic_inputs(self, num_items, num_groups):
+        """ Writes group distribution and probability files for a synthetic category.
+            Group means are spread over the items and covariances are a mild equicorrelation.
+            Probabilities are multiples of 1/PROBABILITY_RESOLUTION so that they add up to exactly 1.0.
+
+            Returns:
+                input_dir:  Directory holding user_group_distributions.csv and user_group_probabilities.csv
+        """
+        input_dir = os.path.join(self.work_dir, 'input_ni{0:d}_ng{1:d}'.format(num_items, num_groups))
+        if os.path.exists(os.path.join(input_dir, 'user_group_probabilities.csv')):
+            return input_dir
+        os.makedirs(input_dir, exist_ok=True)
+
+        random_state = np.random.RandomState(self.seed)
+        cov = 0.1*np.ones([num_items, num_items]) + 0.9*np.eye(num_items)
+        distributions = []
+        for g in range(num_groups):
+            group = pd.DataFrame(data=cov, columns=['cov{0:0{1:d}d}'.format(i+1, max(2, len(str(num_items))))
+                                                    for i in range(num_items)])
+            group.insert(0, 'mean', np.round(random_state.uniform(-3.0, 3.0, size=num_items), 3))
+            group.insert(0, 'group', g+1)
+            distributions.append(group)
+        pd.concat(distributions).to_csv(os.path.join(input_dir, 'user_group_distributions.csv'), index=False)
+
+        counts = np.repeat(BenchmarkRunner.PROBABILITY_RESOLUTION // num_groups, num_groups)
+        counts[-1] += BenchmarkRunner.PROBABILITY_RESOLUTION - np.sum(counts)
+        probabilities = pd.DataFrame({'group': np.arange(1, num_groups+1),
+                                      'probability': counts/BenchmarkRunner.PROBABILITY_RESOLUTION})
+        probabilities.to_csv(os.path.join(input_dir, 'user_group_probabilities.csv'), index=False)
+        return input_dir
+
+    def get_args(self, config):
+        output_dir = os.path.join(self.work_dir, 'output')
+        return argparse.Namespace(input_dir=self.write_synthetic_inputs(config['num_items'], config['num_groups']),
+                                  output_dir=output_dir,
+                                  group_distributions_file='user_group_distributions.csv',
+                                  group_probabilities_file='user_group_probabilities.csv',
+                                  engine=self.engine,
+                                  chunk_size=self.chunk_size,
+                                  rng=self.rng,
+                                  seed=self.seed,
+                                  **config)
+
+    def run_stages(self, config, trace_memory):
+        """ Runs one simulation with DatasetBuilder, the way the command line does, and reads the time
+            of each stage from its RunMonitor. Stages repeated per block are summed.
+
+            Returns:
+                stage_times:    Seconds spent in each stage
+                stage_memory:   Peak traced memory in bytes of each stage (empty unless trace_memory)
+        """
+        stage_memory = dict()
+        monitor = run_monitor.RunMonitor(verbose=False)
+        if trace_memory:
+            def on_stage_start(stage):
+                tracemalloc.reset_peak()
+
+            def on_stage_end(stage, seconds):
+                stage_memory[stage] = max(stage_memory.get(stage, 0), tracemalloc.get_traced_memory()[1])
+
+            monitor.add_hook(on_stage_start, on_stage_end)
+
+        np.random.seed(self.seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatasetBuilder(self.get_args(config), monitor=monitor)
+            db.generate_data_set()
+            db.generate_reports()
+        monitor.stop()
+        stage_times = {stage: stats['seconds'] for stage, stats in monitor.get_report()['stages'].items()}
+        return stage_times, stage_memory
+
+    def run_config(self, config):
+        """ Times a configuration (best of repeats) and measures its peak memory in a separate traced run.
+
+            Returns:
+                result: A dictionary with the configuration, stage times, rows per second and peak memory
+        """
+        stage_times = None
+        for _ in range(self.repeats):
+            times, _ = self.run_stages(config, trace_memory=False)
+            stage_times = times if stage_times is None else {s: min(t, stage_times[s]) for s, t in times.items()}
+
+        tracemalloc.start()
+        try:
+            _, stage_memory = self.run_stages(config, trace_memory=True)
+        finally:
+            tracemalloc.stop()
+
+        num_rows = config['num_users']*config['num_trips']
+        generation_stages = [s for s in stage_times if s not in ('parsing', 'reports', 'save')]
+        generation_time = sum(stage_times[s] for s in generation_stages)
+        return {'config': dict(config),
+                'stage_seconds': stage_times,
+                'total_seconds': sum(stage_times.values()),
+                'rows_per_sec': num_rows/generation_time if generation_time > 0 else float('inf'),
+                'stage_peak_memory_bytes': stage_memory,
+                'peak_memory_bytes': max(stage_memory.values())}
+
+    def run(self, configs):
+        """ Returns: A benchmark report dictionary with run metadata and one result per configuration """
+        report = {'meta': {'engine': self.engine,
+                           'chunk_size': self.chunk_size,
+                           'rng': self.rng,
+                           'repeats': self.repeats,
+                           'seed': self.seed,
+                           'python': platform.python_version(),
+                           'numpy': np.__version__,
+                           'pandas': pd.__version__,
+                           'machine': platform.machine()},
+                  'results': dict()}
+        for ic, config in enumerate(configs):
+            key = self.get_config_key(config)
+            sys.stdout.write("{0:d}/{1:d} {2}\n".format(ic+1, len(configs), key))
+            sys.stdout.flush()
+            report['results'][key] = self.run_config(config)
+            sys.stdout.write("    {0:.0f} rows/sec, {1:.3f} sec, {2:.1f} MB peak\n".format(
+                report['results'][key]['rows_per_sec'], report['results'][key]['total_seconds'],
+                report['results'][key]['peak_memory_bytes']/2**20))
+        return report
+
+    @staticmethod
+    def find_regressions(report, baseline, tolerance=0.2, min_seconds=0.005):
+        """ Compares a report with a stored baseline report.
+            A configuration regresses when its throughput drops by more than tolerance, or when one of
+            its stages slows down by more than tolerance and more than min_seconds.
+
+            Returns:
+                regressions:    A list of human readable regression descriptions
+        """
+        regressions = []
+        for key, result in report['results'].items():
+            if key not in baseline['results']:
+                continue
+            reference = baseline['results'][key]
+            if result['rows_per_sec'] < (1.0 - tolerance)*reference['rows_per_sec']:
+                regressions.append('{0}: {1:.0f} rows/sec, baseline {2:.0f} rows/sec'.format(
+                    key, result['rows_per_sec'], reference['rows_per_sec']))
+            for stage, seconds in result['stage_seconds'].items():
+                reference_seconds = reference['stage_seconds'].get(stage)
+                if reference_seconds is None:
+                    continue
+                if seconds > (1.0 + tolerance)*reference_seconds and seconds - reference_seconds > min_seconds:
+                    regressions.append('{0}: stage {1} took {2:.4f} sec, baseline {3:.4f} sec'.format(
+                        key, stage, seconds, reference_seconds))
+        return regressions
+
+    @staticmethod
+    def save_report(report, path):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def load_report(path):
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,59 @@
+import argparse
+from bias_study.bias_study_runner import BiasStudyRunner
+
+
+def main():
+    """ Runs a Monte Carlo bias study of multinomial logit estimates.
+        Data sets are simulated from independent random streams derived from the seed and kept in memory.
+        A pooled model and one model per user group are fitted to each of them and compared with the
+        mean true utilities of the simulated users. bias_study_summary.csv (bias and RMSE per model and item)
+        and bias_study_replications.csv (estimated and true utilities of every replication) are written
+        to the output directory.
+
+        Detailed description of commandline arguments:
+        -i:     Input directory
+        -o:     Output directory
+        -ng:    Number of canonical groups of like minded shoppers
+        -ni:    Number of total items in the category
+        -gdf:   csv file name in input dir including the group specific Gaussian distributions
+        -gpf:   csv file name in input dir including membership probability for each group
+        -nu:    Number of users in each replication
+        -nt:    Number of shopping trips for each user
+        -ss:    Number of items on the shelf (assortment size)
+        -se:    Seed of the study. Each replication uses its own stream derived from it.
+        -en:    Simulation engine: legacy or batched
+        -r:     Number of replications
+        -nw:    Number of worker processes running replications
+
+        Example run from the project root:
+        python -m bias_study -i input_data -o output_data -ng 3 -ni 12 -nu 450 -nt 18 -ss 6 -r 100 -nw 4
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input_dir', help='Input/data directory', required=True)
+    parser.add_argument('-o', '--output_dir', help='Output directory', required=True)
+    parser.add_argument('-ng', '--num_groups', help='Number of canonical user groups', required=True)
+    parser.add_argument('-ni', '--num_items', help='Number of items', required=True)
+    parser.add_argument('-gdf', '--group_distributions_file', help='Normal of group params',
+                        default='user_group_distributions.csv', required=False)
+    parser.add_argument('-gpf', '--group_probabilities_file', help='Normalized size of groups',
+                        default='user_group_probabilities.csv', required=False)
+    parser.add_argument('-nu', '--num_users', help='Number of users in each replication', required=True)
+    parser.add_argument('-nt', '--num_trips', help='Number of trips for each user', required=True)
+    parser.add_argument('-ss', '--shelf_size', help='Shelf size', required=True)
+    parser.add_argument('-se', '--seed', help='Seed of the study', default=1234, required=False)
+    parser.add_argument('-en', '--engine', help='Simulation engine', choices=['legacy', 'batched'],
+                        default='batched', required=False)
+    parser.add_argument('-r', '--num_replications', help='Number of replications', default=100, required=False)
+    parser.add_argument('-nw', '--num_workers', help='Number of worker processes', default=1, required=False)
+    args = vars(parser.parse_args())
+
+    num_replications = args.pop('num_replications')
+    num_workers = args.pop('num_workers')
+    study = BiasStudyRunner(args, num_replications, num_workers=num_workers)
+    estimates, targets = study.run()
+    study.write_reports(args['output_dir'], estimates, targets)
+    print("Bias study done. Reports written to {0}".format(args['output_dir']))
+
+
+if __name__ == '__main__':
+    main()
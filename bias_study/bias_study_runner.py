@@ -0,0 +1,138 @@
+import os
+import sys
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from src.dataset.dataset_builder import DatasetBuilder
+from src.dataset.instrumentation.run_monitor import RunMonitor
+from src.estimation.mnl_estimator import MNLEstimator
+
+# Bias study of a pool worker process
+_worker_study = None
+
+
+def _init_worker(study):
+    global _worker_study
+    _worker_study = study
+
+
+def _run_replication(replication):
+    return (replication,) + _worker_study.run_replication(replication)
+
+
+class BiasStudyRunner:
+    """ Monte Carlo study of the bias of multinomial logit estimates on simulated data sets.
+        Capabilities:
+            - Simulates num_replications data sets, each from its own random stream derived from the seed,
+            - Fits a pooled MNL model and one MNL model per user group to every data set,
+            - Compares estimates with the mean true utilities of the simulated users,
+            - Aggregates bias and RMSE across replications, running replications in parallel.
+
+        Group distributions are parsed once and shared by all replications. Data sets are kept in memory.
+    """
+    SUMMARY_FILE = 'bias_study_summary.csv'
+    REPLICATIONS_FILE = 'bias_study_replications.csv'
+
+    def __init__(self, args, num_replications, num_workers=1):
+        if int(num_replications) < 1:
+            raise ValueError('The number of replications should be a positive number.')
+        if int(num_workers) < 1:
+            raise ValueError('The number of workers should be a positive number.')
+        self.args = dict(args, rng='spawn', stream=False, num_workers=1)
+        self.num_replications = int(num_replications)
+        self.num_workers = int(num_workers)
+        self.seed = int(self.args.get('seed', DatasetBuilder.DEFAULT_SEED))
+        self.num_groups = int(self.args['num_groups'])
+        self.num_items = int(self.args['num_items'])
+        self.group_distributions = DatasetBuilder(argparse.Namespace(**dict(self.args, num_users=0)),
+                                                  monitor=RunMonitor(verbose=False)).group_distributions
+
+    def get_model_names(self):
+        return ['pooled'] + ['group{0:d}'.format(g+1) for g in range(self.num_groups)]
+
+    def get_replication_seed(self, replication):
+        """ Returns: The seed of a replication, drawn from the stream of the study seed and the replication index """
+        return int(np.random.SeedSequence(self.seed, spawn_key=(replication,)).generate_state(1)[0])
+
+    def run_replication(self, replication):
+        """ Simulates a data set and fits the pooled and per-group models to it.
+
+            Returns:
+                estimates:  Estimated utilities of the pooled model and of each group (size = 1+num_groups x num_items)
+                targets:    Mean true utilities of all users and of the users of each group (same size)
+        """
+        args = dict(self.args, seed=self.get_replication_seed(replication))
+        builder = DatasetBuilder(argparse.Namespace(**args), monitor=RunMonitor(verbose=False),
+                                 group_distributions=self.group_distributions)
+        results = builder.create_result_buffer(builder.num_users)
+        for block in builder.iter_data_set():
+            results.append(block)
+
+        shelf_items = results.get_shelf_items()
+        row_groups = results.user_group[results.trip_user_id]
+        estimator = MNLEstimator(self.num_items)
+        estimates = np.vstack([estimator.fit(shelf_items, results.choice),
+                               estimator.fit(shelf_items, results.choice, row_groups, self.num_groups)])
+
+        targets = np.full([1 + self.num_groups, self.num_items], np.nan)
+        targets[0] = np.mean(results.user_utilities, axis=0)
+        for g in np.unique(results.user_group):
+            targets[1 + g] = np.mean(results.user_utilities[results.user_group == g], axis=0)
+        return estimates, targets
+
+    def run(self):
+        """ Runs all replications.
+
+            Returns:
+                estimates:  Estimated utilities (size = num_replications x 1+num_groups x num_items)
+                targets:    Mean true utilities (same size)
+        """
+        estimates = np.zeros([self.num_replications, 1 + self.num_groups, self.num_items])
+        targets = np.zeros_like(estimates)
+        if self.num_workers > 1:
+            with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                results = pool.imap_unordered(_run_replication, range(self.num_replications))
+                self.collect(results, estimates, targets)
+        else:
+            _init_worker(self)
+            self.collect(map(_run_replication, range(self.num_replications)), estimates, targets)
+        return estimates, targets
+
+    def collect(self, results, estimates, targets):
+        for done, (replication, replication_estimates, replication_targets) in enumerate(results):
+            estimates[replication] = replication_estimates
+            targets[replication] = replication_targets
+            sys.stdout.write("\r{0:d}/{1:d}".format(done+1, self.num_replications))
+            sys.stdout.flush()
+        sys.stdout.write("\n")
+
+    def summarize(self, estimates, targets):
+        """ Returns: A DataFrame with mean true and estimated utilities, bias and RMSE per model and item """
+        errors = estimates - targets
+        with np.errstate(invalid='ignore'):
+            summary = {'model': np.repeat(self.get_model_names(), self.num_items),
+                       'item': np.tile(['item{0:03d}'.format(i) for i in range(self.num_items)], 1 + self.num_groups),
+                       'num_replications': np.sum(~np.isnan(errors), axis=0).ravel(),
+                       'mean_true_util': np.nanmean(targets, axis=0).ravel(),
+                       'mean_estimated_util': np.nanmean(estimates, axis=0).ravel(),
+                       'bias': np.nanmean(errors, axis=0).ravel(),
+                       'rmse': np.sqrt(np.nanmean(errors**2, axis=0)).ravel()}
+        return pd.DataFrame(summary)
+
+    def write_reports(self, output_dir, estimates, targets):
+        """ Writes the summary and the estimates and true utilities of every replication to output_dir """
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.summarize(estimates, targets).to_csv(os.path.join(output_dir, BiasStudyRunner.SUMMARY_FILE), index=False)
+
+        replications = []
+        for quantity, values in [('estimated', estimates), ('true', targets)]:
+            frame = pd.DataFrame(data=values.reshape(-1, self.num_items),
+                                 columns=['item{0:03d}'.format(i) for i in range(self.num_items)])
+            frame.insert(0, 'quantity', quantity)
+            frame.insert(0, 'model', np.tile(self.get_model_names(), self.num_replications))
+            frame.insert(0, 'replication', np.repeat(np.arange(self.num_replications), 1 + self.num_groups))
+            replications.append(frame)
+        pd.concat(replications).sort_values('replication', kind='stable')\
+            .to_csv(os.path.join(output_dir, BiasStudyRunner.REPLICATIONS_FILE), index=False)
@@ -0,0 +1,62 @@
+import asyncio
+import argparse
+from server.simulation_server import SimulationServer
+
+
+def main():
+    """ Runs the simulation server.
+        Group distributions are parsed once at start up. Requests are served over a local TCP socket
+        by a pool of worker processes, and results are streamed back block by block.
+
+        Detailed description of commandline arguments:
+        -i:     Input directory
+        -ng:    Number of canonical groups of like minded shoppers
+        -ni:    Number of total items in the category
+        -gdf:   csv file name in input dir including the group specific Gaussian distributions
+        -gpf:   csv file name in input dir including membership probability for each group
+        -dc:    Directory caching parsed and factorized group distributions
+        -ho:    Host to listen on
+        -p:     Port to listen on
+        -nw:    Number of worker processes
+        -mp:    Maximum number of blocks simulated or waiting to be sent across requests (default 2 x workers)
+
+        Example run from the project root:
+        python -m server -i input_data -ng 3 -ni 12 -nw 4
+
+        Example client:
+        from server.simulation_client import SimulationClient
+        with SimulationClient(port=8765) as client:
+            true_user_utilities, data_set = client.simulate(num_users=450, num_trips=18, shelf_size=6, seed=1234)
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input_dir', help='Input/data directory', required=True)
+    parser.add_argument('-ng', '--num_groups', help='Number of canonical user groups', required=True)
+    parser.add_argument('-ni', '--num_items', help='Number of items', required=True)
+    parser.add_argument('-gdf', '--group_distributions_file', help='Normal of group params',
+                        default='user_group_distributions.csv', required=False)
+    parser.add_argument('-gpf', '--group_probabilities_file', help='Normalized size of groups',
+                        default='user_group_probabilities.csv', required=False)
+    parser.add_argument('-dc', '--distribution_cache_dir', help='Cache directory of parsed distributions',
+                        default=None, required=False)
+    parser.add_argument('-ho', '--host', help='Host to listen on', default='127.0.0.1', required=False)
+    parser.add_argument('-p', '--port', help='Port to listen on', default=8765, required=False)
+    parser.add_argument('-nw', '--num_workers', help='Number of worker processes', default=1, required=False)
+    parser.add_argument('-mp', '--max_pending_blocks', help='Maximum number of blocks in flight', default=None,
+                        required=False)
+    args = parser.parse_args()
+
+    server = SimulationServer(args.input_dir, args.num_groups, args.num_items,
+                              group_distributions_file=args.group_distributions_file,
+                              group_probabilities_file=args.group_probabilities_file,
+                              host=args.host, port=args.port, num_workers=args.num_workers,
+                              max_pending_blocks=args.max_pending_blocks,
+                              distribution_cache_dir=args.distribution_cache_dir)
+    print("Serving on {0}:{1}".format(args.host, args.port))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
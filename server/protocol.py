@@ -0,0 +1,60 @@
+import json
+import numpy as np
+
+
+class Protocol:
+    """ Wire format of the simulation server.
+        Every message is a JSON header line followed by header['nbytes'] bytes of payload holding the
+        arrays listed in header['arrays'] ([name, dtype, shape] each) back to back in C order.
+        Clients send a request message without payload. The server answers with a 'start' message,
+        one 'block' message per block of users and a 'done' message, or with an 'error' message.
+    """
+    BLOCK_COLUMNS = ('user_id', 'user_group', 'user_utilities', 'trip_user_id', 'trip', 'choice', 'quantity',
+                     'timestamp')
+
+    @staticmethod
+    def encode_message(header, arrays=None):
+        """ Returns: The bytes of a message holding header and a dictionary of arrays (name: array) """
+        arrays = arrays if arrays is not None else dict()
+        payload = [np.ascontiguousarray(value) for value in arrays.values()]
+        header = dict(header,
+                      arrays=[[name, value.dtype.str, list(value.shape)] for name, value in zip(arrays, payload)],
+                      nbytes=sum(value.nbytes for value in payload))
+        return b''.join([json.dumps(header).encode() + b'\n'] + [value.tobytes() for value in payload])
+
+    @staticmethod
+    def decode_payload(header, payload):
+        """ Returns: The dictionary of arrays described by header, read from the payload bytes """
+        arrays = dict()
+        offset = 0
+        for name, dtype, shape in header['arrays']:
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape, dtype=np.int64))
+            arrays[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape)
+            offset += count*dtype.itemsize
+        return arrays
+
+    @staticmethod
+    def read_message(stream):
+        """ Reads a message from a binary file-like stream.
+
+            Returns:
+                header: The message header (None at the end of the stream)
+                arrays: The dictionary of arrays of the message
+        """
+        line = stream.readline()
+        if not line:
+            return None, dict()
+        header = json.loads(line)
+        payload = stream.read(header['nbytes'])
+        if len(payload) != header['nbytes']:
+            raise ValueError('The connection was closed in the middle of a message.')
+        return header, Protocol.decode_payload(header, payload)
+
+    @staticmethod
+    def encode_block(block_index, block):
+        """ Returns: A 'block' message holding the columns of a ResultBuffer, with shelves as item indices """
+        arrays = {name: getattr(block, name) for name in Protocol.BLOCK_COLUMNS if getattr(block, name) is not None}
+        arrays['shelf_items'] = block.get_shelf_items()
+        return Protocol.encode_message({'type': 'block', 'block_index': block_index, 'num_users': block.num_users},
+                                       arrays)
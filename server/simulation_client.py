@@ -0,0 +1,75 @@
+import json
+import socket
+from src.dataset.output.result_buffer import ResultBuffer
+from server.protocol import Protocol
+
+
+class SimulationClient:
+    """ Blocking client of SimulationServer.
+        Capabilities:
+            - Streams the blocks of a simulation request as ResultBuffer objects,
+            - Assembles them into the (true_user_utilities, data_set) pair DatasetBuilder.get_results returns.
+
+        A client keeps its connection open, so successive requests do not pay the connection set up.
+        A request is always read to its end, also when iter_blocks is left early.
+    """
+    def __init__(self, host='127.0.0.1', port=8765, timeout=None):
+        self.connection = socket.create_connection((host, port), timeout=timeout)
+        self.stream = self.connection.makefile('rb')
+
+    def close(self):
+        self.stream.close()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read_message(self):
+        header, arrays = Protocol.read_message(self.stream)
+        if header is None:
+            raise ValueError('The server closed the connection.')
+        if header['type'] == 'error':
+            raise ValueError(header['message'])
+        return header, arrays
+
+    def iter_blocks(self, **request):
+        """ Sends a request (num_users, num_trips, shelf_size, seed, ...) and yields its blocks as they arrive.
+
+            Yields:
+                block:  A ResultBuffer holding the utilities and trips of the users of a block, shelves as item indices
+        """
+        self.connection.sendall(json.dumps(request).encode() + b'\n')
+        start, _ = self.read_message()
+        while True:
+            header, arrays = self.read_message()
+            if header['type'] == 'done':
+                return
+            pantry = 'quantity' in arrays
+            block = ResultBuffer(header['num_users'], start['num_items'], start['num_trips'],
+                                 shelf_size=start['shelf_size'], pantry=pantry)
+            block.set_users(slice(None), arrays['user_id'], arrays['user_group'], arrays['user_utilities'])
+            block.set_trips(slice(None), arrays['trip_user_id'], arrays['trip'], arrays['choice'],
+                            arrays['shelf_items'])
+            if pantry:
+                block.set_pantry(slice(None), arrays['quantity'], arrays['timestamp'])
+            try:
+                yield block
+            except GeneratorExit:
+                # The caller stopped early: the remaining blocks are read and dropped, so that the next
+                # request on the connection does not get them
+                while self.read_message()[0]['type'] != 'done':
+                    pass
+                raise
+
+    def simulate(self, **request):
+        """ Returns: user utilities and data set DataFrames, as DatasetBuilder.get_results """
+        results = None
+        for block in self.iter_blocks(**request):
+            if results is None:
+                results = ResultBuffer(int(request['num_users']), block.num_items, block.num_trips,
+                                       shelf_size=block.shelf_size, pantry=block.quantity is not None)
+            results.append(block)
+        return results.get_user_utilities(), results.get_data_set()
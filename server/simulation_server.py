@@ -0,0 +1,181 @@
+import json
+import shutil
+import asyncio
+import argparse
+import tempfile
+import collections
+import concurrent.futures
+from src.dataset.dataset_builder import DatasetBuilder
+from src.dataset.instrumentation.run_monitor import RunMonitor
+from server.protocol import Protocol
+
+# Parsed group distributions and recently used dataset builders of a pool worker process
+_worker_distributions = None
+_worker_builders = collections.OrderedDict()
+
+
+def _init_worker(distributions):
+    global _worker_distributions
+    _worker_distributions = distributions
+
+
+def _simulate_block(args, block_index):
+    """ Simulates a block of a request in a worker and returns its encoded 'block' message.
+        Builders (with their design libraries) are kept for the last SimulationServer.MAX_CACHED_BUILDERS requests.
+    """
+    key = tuple(sorted(args.items()))
+    builder = _worker_builders.pop(key, None)
+    if builder is None:
+        builder = DatasetBuilder(argparse.Namespace(**args), monitor=RunMonitor(verbose=False),
+                                 group_distributions=_worker_distributions)
+    _worker_builders[key] = builder
+    while len(_worker_builders) > SimulationServer.MAX_CACHED_BUILDERS:
+        _worker_builders.popitem(last=False)
+    return Protocol.encode_block(block_index, builder.simulate_block(block_index))
+
+
+class SimulationServer:
+    """ Long-lived asyncio simulation service on a local TCP socket.
+        Capabilities:
+            - Parses group distributions (and factorizes covariances) once at start up,
+            - Keeps dataset builders and their design libraries warm in the worker processes,
+            - Simulates the blocks of concurrent requests on a process pool,
+            - Streams every block back as soon as it is ready, in block order.
+
+        Requests are JSON objects with num_users and optionally the keys in REQUEST_KEYS. Missing keys
+        take the defaults of the command line (DEFAULT_REQUEST), including the legacy engine.
+        Blocks use independent random streams (rng=spawn), so a response holds exactly the results
+        of DatasetBuilder run with the same arguments and rng=spawn. At most max_pending_blocks blocks
+        are simulated or waiting to be sent at a time across all requests, and a request does not get
+        new blocks simulated while its client is slow to read the previous ones (backpressure).
+    """
+    REQUEST_KEYS = ('num_users', 'num_trips', 'shelf_size', 'seed', 'engine', 'chunk_size', 'design_library_size',
+                    'design_library_best', 'large_catalog', 'pantry', 'consumption_rate', 'purchase_quantity')
+    DEFAULT_REQUEST = {'num_trips': 18, 'shelf_size': 6, 'seed': DatasetBuilder.DEFAULT_SEED,
+                       'engine': DatasetBuilder.DEFAULT_ENGINE, 'chunk_size': DatasetBuilder.DEFAULT_CHUNK_SIZE}
+    MAX_CACHED_BUILDERS = 16
+
+    def __init__(self, input_dir, num_groups, num_items, group_distributions_file='user_group_distributions.csv',
+                 group_probabilities_file='user_group_probabilities.csv', host='127.0.0.1', port=8765,
+                 num_workers=1, max_pending_blocks=None, distribution_cache_dir=None):
+        if int(num_workers) < 1:
+            raise ValueError('The number of workers should be a positive number.')
+        self.host = host
+        self.port = int(port)
+        self.num_workers = int(num_workers)
+        self.max_pending_blocks = int(max_pending_blocks) if max_pending_blocks is not None else 2*self.num_workers
+        self.output_dir = tempfile.mkdtemp(prefix='shopping_simulator_server_')
+        self.base_args = {'input_dir': input_dir,
+                          'output_dir': self.output_dir,
+                          'num_groups': int(num_groups),
+                          'num_items': int(num_items),
+                          'group_distributions_file': group_distributions_file,
+                          'group_probabilities_file': group_probabilities_file,
+                          'rng': 'spawn'}
+
+        # Inputs are checked and parsed once, the way DatasetBuilder does it
+        builder = DatasetBuilder(argparse.Namespace(num_users=0, num_trips=1, shelf_size=1,
+                                                    distribution_cache_dir=distribution_cache_dir, **self.base_args),
+                                 monitor=RunMonitor(verbose=False))
+        self.group_distributions = builder.group_distributions
+        self.executor = None
+        self.semaphore = None
+        self.server = None
+
+    def get_args(self, request):
+        """ Returns: DatasetBuilder arguments of a request """
+        if not isinstance(request, dict):
+            raise ValueError('A request should be a JSON object.')
+        unknown = [key for key in request if key not in SimulationServer.REQUEST_KEYS]
+        if unknown:
+            raise ValueError('Unknown request keys: {0}'.format(', '.join(unknown)))
+        if 'num_users' not in request:
+            raise ValueError('The request needs num_users.')
+        args = dict(self.base_args, **dict(SimulationServer.DEFAULT_REQUEST, **request))
+        if int(args['num_users']) < 1 or int(args['chunk_size']) < 1:
+            raise ValueError('The number of users and the chunk size should be positive numbers.')
+        return args
+
+    async def start(self):
+        """ Starts the worker pool and listens for requests. Sets port when an ephemeral port (0) was asked for. """
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.num_workers, initializer=_init_worker,
+                                                               initargs=(self.group_distributions,))
+        self.semaphore = asyncio.Semaphore(self.max_pending_blocks)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.close()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    async def handle(self, reader, writer):
+        """ Serves the requests of a connection, one after the other """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    await self.stream_results(self.get_args(json.loads(line)), writer)
+                except ConnectionError:
+                    raise
+                except Exception as error:
+                    # Any failure of a request is reported to its client, and the connection stays usable
+                    writer.write(Protocol.encode_message({'type': 'error',
+                                                          'message': '{0}: {1}'.format(type(error).__name__, error)}))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def stream_results(self, args, writer):
+        """ Simulates the blocks of a request on the pool, up to num_workers of them ahead of the client,
+            and writes them in order.
+        """
+        loop = asyncio.get_running_loop()
+        num_users, chunk_size = int(args['num_users']), int(args['chunk_size'])
+        num_blocks = (num_users + chunk_size - 1) // chunk_size
+        writer.write(Protocol.encode_message({'type': 'start', 'num_users': num_users,
+                                              'num_items': int(args['num_items']),
+                                              'num_trips': int(args['num_trips']),
+                                              'shelf_size': int(args['shelf_size']),
+                                              'num_blocks': num_blocks}))
+        pending = collections.deque()
+        next_block = 0
+        try:
+            while next_block < num_blocks or pending:
+                # Only wait for a slot while holding none, so that requests never wait for each other's slots
+                while (next_block < num_blocks and len(pending) < self.num_workers
+                       and not (pending and self.semaphore.locked())):
+                    await self.semaphore.acquire()
+                    pending.append(self.executor.submit(_simulate_block, args, next_block))
+                    next_block += 1
+                message = await asyncio.wrap_future(pending[0])
+                writer.write(message)
+                await writer.drain()
+                # The block holds its slot until the client has taken it
+                pending.popleft()
+                self.semaphore.release()
+        finally:
+            # A block given up keeps its slot until its worker is done with it, if it already started
+            for future in pending:
+                future.cancel()
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.semaphore.release))
+        writer.write(Protocol.encode_message({'type': 'done'}))
+        await writer.drain()
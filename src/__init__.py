@@ -1,4 +1,17 @@
 from src.dataset.doe.doe_builder import DoEBuilder
+from src.dataset.doe.doe_batch_builder import DoEBatchBuilder
+from src.dataset.doe.sparse_doe_builder import SparseDoEBuilder
+from src.dataset.doe.design_library import DesignLibrary
 from src.dataset.parsers.distribution_parser import DistributionParser
+from src.dataset.parsers.covariance_spec import (CovarianceSpec, DenseCovariance, DiagonalCovariance,
+                                                 LowRankCovariance, BlockDiagonalCovariance)
 from src.dataset.user.user_builder import UserBuilder
+from src.dataset.user.user_batch_builder import UserBatchBuilder
+from src.dataset.user.pantry_batch_builder import PantryBatchBuilder
+from src.dataset.output.result_buffer import ResultBuffer
+from src.dataset.output.result_store import ResultStore
+from src.dataset.output.checkpoint_manifest import CheckpointManifest
+from src.dataset.output.design_diagnostics import DesignDiagnostics
+from src.dataset.instrumentation.run_monitor import RunMonitor
+from src.estimation.mnl_estimator import MNLEstimator
 from src.dataset.dataset_builder import DatasetBuilder
@@ -1,23 +1,88 @@
 import os
-import sys
+import shutil
+import multiprocessing
 import numpy as np
-import pandas as pd
 from src.dataset.doe import doe_builder
+from src.dataset.doe import doe_batch_builder
+from src.dataset.doe import design_library
+from src.dataset.doe import sparse_doe_builder
 from src.dataset.user import user_builder
+from src.dataset.user import user_batch_builder
+from src.dataset.user import pantry_batch_builder
 from src.dataset.parsers import distribution_parser
+from src.dataset.output import result_buffer
+from src.dataset.output import result_store
+from src.dataset.output import report_accumulator
+from src.dataset.output import checkpoint_manifest
+from src.dataset.instrumentation import run_monitor
+
+# Dataset builder of a pool worker process
+_worker_builder = None
+
+
+def _init_worker(builder):
+    global _worker_builder
+    _worker_builder = builder
+    # Progress is reported by the parent process as block results arrive
+    _worker_builder.monitor.verbose = False
+
+
+def _simulate_block(block_index):
+    return _worker_builder.simulate_block(block_index)
+
+
+def _store_block(block_index):
+    block = _worker_builder.simulate_block(block_index)
+    result_store.ResultStore(_worker_builder.output_dir).write_block(block, block_index*_worker_builder.chunk_size)
+    return block_index, _worker_builder.accumulate_block(block)
+
+
+def _write_shard(block_index):
+    return _worker_builder.write_shard(block_index)
 
 
 class DatasetBuilder:
     """ The main engine of simulation.
         After parsing the command line parameters and checking for possible errors,
         doe and user generator objects are instantiated to mimic real shopping behavior.
+
+        Runs sharing the same input files can pass an already parsed DistributionParser
+        as group_distributions to skip parsing.
+
+        With design_library_size > 0 users are served designs from a precomputed DesignLibrary
+        instead of having a design drawn for each of them.
+
+        In large catalog mode designs are drawn by SparseDoEBuilder and shelves are kept as
+        item index arrays from the DoE up to the reports and the index output format.
+
+        In pantry mode the pantries of each block of users are simulated by PantryBatchBuilder,
+        adding the quantity bought and the timestamp of every trip to the data set.
+
+        In checkpoint mode blocks are written as shard files recorded in a CheckpointManifest,
+        and a run restarted with the same settings skips the shards completed before it was interrupted.
+
+        With design_diagnostics the reports also hold item co-occurrences, global balance and the
+        D-efficiency of the design, computed by DesignDiagnostics on bit-packed assortments.
     """
 
     NUM_NON_DOE_DATASET_COLUMNS = 3
     NUM_USER_UTILITY_COLUMNS = 2
-
-    def __init__(self, args):
-        print("Initializing data set builder... Checking arguments...")
+    ENGINES = ('legacy', 'batched')
+    RANDOM_STATES = ('global', 'spawn')
+    OUTPUT_FORMATS = ('csv',) + result_store.ResultStore.FORMATS
+    DEFAULT_ENGINE = 'legacy'
+    DEFAULT_CHUNK_SIZE = 1000
+    DEFAULT_SEED = 1234
+    DEFAULT_CONSUMPTION_RATE = 1.0
+    DEFAULT_PURCHASE_QUANTITY = 3.0
+    SHARD_DIR = 'shards'
+
+    def __init__(self, args, monitor=None, group_distributions=None):
+        self.monitor = monitor if monitor is not None else run_monitor.RunMonitor(
+            profile=bool(getattr(args, 'profile', False)),
+            trace_memory=bool(getattr(args, 'trace_memory', False)))
+        self.monitor.start()
+        self.monitor.log("Initializing data set builder... Checking arguments...")
         self.input_dir = args.input_dir
         self.output_dir = args.output_dir
         self.num_groups = int(args.num_groups)
@@ -27,21 +92,55 @@ class DatasetBuilder:
         self.num_items = int(args.num_items)
         self.num_trips = int(args.num_trips)
         self.shelf_size = int(args.shelf_size)
+        self.engine = getattr(args, 'engine', DatasetBuilder.DEFAULT_ENGINE)
+        self.chunk_size = int(getattr(args, 'chunk_size', DatasetBuilder.DEFAULT_CHUNK_SIZE))
+        self.stream = bool(getattr(args, 'stream', False))
+        self.seed = int(getattr(args, 'seed', DatasetBuilder.DEFAULT_SEED))
+        self.rng = getattr(args, 'rng', 'global')
+        self.num_workers = int(getattr(args, 'num_workers', 1))
+        self.output_format = getattr(args, 'output_format', 'csv')
+        self.distribution_cache_dir = getattr(args, 'distribution_cache_dir', None)
+        self.design_library_size = int(getattr(args, 'design_library_size', 0) or 0)
+        self.design_library_best = getattr(args, 'design_library_best', None)
+        self.design_cache_dir = getattr(args, 'design_cache_dir', None)
+        self.large_catalog = bool(getattr(args, 'large_catalog', False))
+        self.pantry = bool(getattr(args, 'pantry', False))
+        self.consumption_rate = float(getattr(args, 'consumption_rate', DatasetBuilder.DEFAULT_CONSUMPTION_RATE))
+        self.purchase_quantity = float(getattr(args, 'purchase_quantity', DatasetBuilder.DEFAULT_PURCHASE_QUANTITY))
+        self.checkpoint = bool(getattr(args, 'checkpoint', False))
+        self.design_diagnostics = bool(getattr(args, 'design_diagnostics', False))
         self.inspect_arguments(args)
-        print("Checking arguments done.")
+        self.monitor.log("Checking arguments done.")
+
+        self.monitor.log("Reading canonical distribution data and unpacking them...")
+        with self.monitor.stage('parsing'):
+            if group_distributions is not None:
+                if (group_distributions.num_items, group_distributions.num_groups) != (self.num_items,
+                                                                                       self.num_groups):
+                    raise ValueError('The parsed group distributions do not match num_items and num_groups.')
+                self.group_distributions = group_distributions
+            else:
+                self.group_distributions = distribution_parser.DistributionParser(self.group_distributions_file,
+                                                                                  self.group_probabilities_file,
+                                                                                  self.num_items, self.num_groups,
+                                                                                  self.distribution_cache_dir)
+
+        self.design_library = None
+        if self.design_library_size > 0:
+            self.monitor.log("Preparing design library...")
+            with self.monitor.stage('design_library'):
+                self.design_library = design_library.DesignLibrary(self.num_items, self.num_trips, self.shelf_size,
+                                                                   self.design_library_size, self.seed,
+                                                                   num_best=self.design_library_best,
+                                                                   cache_dir=self.design_cache_dir,
+                                                                   large_catalog=self.large_catalog)
 
-        print("Reading canonical distribution data and unpacking them...")
-        self.group_distributions = distribution_parser.DistributionParser(self.group_distributions_file,
-                                                                          self.group_probabilities_file,
-                                                                          self.num_items, self.num_groups)
-
-        print("Instantiating DoE builder")
-        self.shopping_env_simulator = doe_builder.DoEBuilder(self.num_items,
-                                                             self.num_trips, self.shelf_size)
         self.true_user_utilities = None
         self.user_groups = None
+        self.result_buffer = None
+        self.report_accumulator = None
         self.data_set = None
-        print("Done with initializing dataset builder.")
+        self.monitor.log("Done with initializing dataset builder.")
 
     def inspect_arguments(self, args):
         """ Inspects arguments for common errors. Raises appropriate errors accordingly.
@@ -61,67 +160,442 @@ class DatasetBuilder:
         if not os.path.exists(self.group_probabilities_file):
             raise ValueError('Specified groups probabilities file could not be found in input directory.')
 
+        if not 0 < self.shelf_size <= self.num_items:
+            raise ValueError('The shelf size should be between 1 and the number of items.')
+
+        if self.engine not in DatasetBuilder.ENGINES:
+            raise ValueError('Unknown simulation engine: {0}. Expected one of {1}.'.format(self.engine,
+                                                                                         DatasetBuilder.ENGINES))
+
+        if self.chunk_size < 1:
+            raise ValueError('The chunk size should be a positive number of users.')
+
+        if self.rng not in DatasetBuilder.RANDOM_STATES:
+            raise ValueError('Unknown random state mode: {0}. Expected one of {1}.'.format(self.rng,
+                                                                                         DatasetBuilder.RANDOM_STATES))
+
+        if self.num_workers < 1:
+            raise ValueError('The number of workers should be a positive number.')
+
+        if self.output_format not in DatasetBuilder.OUTPUT_FORMATS:
+            raise ValueError('Unknown output format: {0}. Expected one of {1}.'.format(self.output_format,
+                                                                                      DatasetBuilder.OUTPUT_FORMATS))
+
+        if self.num_workers > 1 and self.rng != 'spawn':
+            raise ValueError('Parallel simulation needs independent random streams per block (rng=spawn).')
+
+        if self.design_library_size < 0:
+            raise ValueError('The design library size should be a non-negative number of designs.')
+
+        if self.design_library_best is not None:
+            self.design_library_best = int(self.design_library_best)
+
+        if self.pantry and (self.consumption_rate <= 0 or self.purchase_quantity < 1):
+            raise ValueError('The consumption rate should be positive and the purchase quantity at least one unit.')
+
+        if self.checkpoint and self.output_format != 'csv':
+            raise ValueError('Checkpointed runs write csv shards. Use the csv output format.')
+
     def draw_user_groups(self):
         """ Draws shopper memberships according to group probabilities file content.
             Assigns each shopper to a canonical group of like-minded shoppers.
         """
-        group_prob = self.group_distributions.get_group_probabilities()
-        self.user_groups = np.random.choice(a=self.num_groups, size=self.num_users, p=group_prob)
+        with self.monitor.stage('group_draw'):
+            group_prob = self.group_distributions.get_group_probabilities()
+            self.user_groups = np.random.choice(a=self.num_groups, size=self.num_users, p=group_prob)
+
+    def get_num_blocks(self):
+        return (self.num_users + self.chunk_size - 1) // self.chunk_size
+
+    def get_block_range(self, block_index):
+        """ Returns: start and stop (excluded) user indices of a block """
+        start = block_index*self.chunk_size
+        return start, min(start + self.chunk_size, self.num_users)
+
+    def accumulate_block(self, block):
+        """ Returns: A ReportAccumulator holding the report statistics of a block only """
+        with self.monitor.stage('accumulate'):
+            block_statistics = self.create_report_accumulator(block.num_users, user_offset=int(block.user_id[0]))
+            block_statistics.update(block)
+        return block_statistics
+
+    def create_report_accumulator(self, num_users, user_offset=0):
+        """ Returns: An empty ReportAccumulator for num_users users, keeping design diagnostics if asked for """
+        return report_accumulator.ReportAccumulator(self.num_groups, self.num_items, num_users,
+                                                    user_offset=user_offset, diagnostics=self.design_diagnostics)
+
+    def count_block(self, block_index):
+        start, stop = self.get_block_range(block_index)
+        self.monitor.count(users=stop - start, trips=(stop - start)*self.num_trips)
+
+    def get_block_random_state(self, block_index):
+        """ Returns the random state of a block of users.
+            With rng=global this is None, i.e. the global numpy random state seeded by the caller.
+            With rng=spawn every block gets an independent Generator whose stream is derived from
+            the seed and the block index only, so results do not depend on which process runs the block.
+        """
+        if self.rng == 'global':
+            return None
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(block_index,)))
 
     def generate_data_set(self, save=True):
         """ Draws user preferences from associated Gaussian.
             Simulates DoE and shopper choices in one place.
             Produces user utilities and data set.
+
+            In streaming mode each block of chunk_size users is appended to the output files
+            as soon as it is generated and the full data set is never held in memory.
+            Memory is not bounded by chunk_size alone: the report accumulator of the run keeps
+            num_users x num_items int32 item view counts, and with rng=global the groups of all
+            users are drawn before the first block.
+            With several workers, streamed blocks are written by the workers as shard files
+            which are then concatenated into the output files, or directly into the binary
+            result files when a binary output format is used.
+
+            In checkpoint mode blocks are always written as shards, see generate_checkpointed_shards.
         """
+        self.monitor.log("Dataset generation started...")
+        self.report_accumulator = self.create_report_accumulator(self.num_users)
+        if self.checkpoint and save:
+            self.generate_checkpointed_shards()
+        elif self.stream and save and self.output_format != 'csv':
+            self.generate_binary_results()
+        elif self.stream and save and self.num_workers > 1:
+            self.generate_shards()
+        elif self.stream:
+            for ib, block in enumerate(self.iter_data_set()):
+                if(save):
+                    self.save_block(block, append=(ib > 0))
+        else:
+            self.result_buffer = self.create_result_buffer(self.num_users)
+            for block in self.iter_data_set():
+                with self.monitor.stage('assemble'):
+                    self.result_buffer.append(block)
+            with self.monitor.stage('assemble'):
+                self.true_user_utilities = self.result_buffer.get_user_utilities()
+                self.data_set = self.result_buffer.get_data_set()
+                self.user_groups = self.result_buffer.user_group
+        self.monitor.log("")
+        self.monitor.log("Done generating dataset.")
+        if(save and not self.stream and not self.checkpoint):
+            self.save_results()
 
-        print("Draw user memberships")
-        self.draw_user_groups()
+    def iter_data_set(self):
+        """ Generates the data set in blocks of chunk_size users, in order.
+            The output of the legacy engine with rng=global does not depend on chunk_size. Otherwise
+            each block is drawn as a whole, so the output is reproducible for a given seed and chunk_size,
+            whatever the number of workers.
 
-        print("Initialize user utilities and dataset structure")
-        self.true_user_utilities = pd.DataFrame(data=np.zeros([self.num_users,
-                                                               self.num_items +
-                                                               DatasetBuilder.NUM_USER_UTILITY_COLUMNS]),
-                                                columns=["user_id", "user_group"] +
-                                                        ['item{0:03d}'.format(i) for i in range(self.num_items)])
+            Yields:
+                block:  A ResultBuffer holding the utilities and trips of the users of the block
+        """
+        if self.rng == 'global':
+            self.monitor.log("Draw user memberships")
+            self.draw_user_groups()
+
+        if self.num_workers > 1:
+            with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                for ib, block in enumerate(pool.imap(_simulate_block, range(self.get_num_blocks()))):
+                    self.count_block(ib)
+                    self.monitor.progress(self.get_block_range(ib)[1], self.num_users)
+                    self.accumulate(block)
+                    yield block
+        else:
+            for ib in range(self.get_num_blocks()):
+                block = self.simulate_block(ib)
+                self.count_block(ib)
+                self.accumulate(block)
+                yield block
+
+    def accumulate(self, block):
+        """ Adds a block to the report statistics, if the builder is collecting them """
+        if self.report_accumulator is not None:
+            with self.monitor.stage('accumulate'):
+                self.report_accumulator.update(block)
+
+    def generate_binary_results(self):
+        """ Simulates blocks and writes each one into its slice of the preallocated binary result files.
+            Workers write their blocks themselves.
+        """
+        store = self.create_result_store()
+        if self.num_workers > 1:
+            with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                num_done = 0
+                for ib, block_statistics in pool.imap_unordered(_store_block, range(self.get_num_blocks())):
+                    self.count_block(ib)
+                    start, stop = self.get_block_range(ib)
+                    num_done += stop - start
+                    self.monitor.progress(num_done, self.num_users)
+                    self.report_accumulator.merge(block_statistics)
+            self.monitor.count(rows_written=self.num_users*self.num_trips)
+        else:
+            for ib, block in enumerate(self.iter_data_set()):
+                with self.monitor.stage('save'):
+                    store.write_block(block, ib*self.chunk_size)
+                self.monitor.count(rows_written=block.trip.size)
+
+    def create_result_store(self):
+        store = result_store.ResultStore(self.output_dir)
+        store.create(self.output_format, self.num_users, self.num_items, self.num_trips, self.shelf_size,
+                     pantry=self.pantry)
+        return store
+
+    def generate_shards(self):
+        """ Simulates blocks on a pool of workers. Each worker writes its blocks to shard files
+            and the shards are concatenated in block order into the output files.
+        """
+        shard_files = []
+        with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self,)) as pool:
+            for ib, (files, block_statistics) in enumerate(pool.imap(_write_shard, range(self.get_num_blocks()))):
+                self.count_block(ib)
+                self.monitor.progress(self.get_block_range(ib)[1], self.num_users)
+                self.report_accumulator.merge(block_statistics)
+                shard_files.append(files)
+
+        with self.monitor.stage('save'):
+            self.merge_shards(shard_files)
+        self.monitor.count(rows_written=self.num_users*self.num_trips)
+
+    def generate_checkpointed_shards(self):
+        """ Simulates blocks into shard files recorded in a checkpoint manifest, then merges them in block order.
+            Blocks completed by an interrupted run with the same settings are not simulated again.
+
+            With rng=spawn the stream of a block only depends on its index, so any completed block is reused.
+            With rng=global the blocks share the global random state: the run goes on from the first missing
+            block, with the state saved after the block before it. The caller seeds the global state as for
+            a fresh run, so that user groups are drawn again identically.
+        """
+        shard_dir = os.path.join(self.output_dir, DatasetBuilder.SHARD_DIR)
+        config = dict(self.get_config())
+        del config['num_workers']
+        manifest = checkpoint_manifest.CheckpointManifest(shard_dir, config)
+        completed = manifest.get_completed_shards()
+        num_blocks = self.get_num_blocks()
+        if self.rng == 'global':
+            self.draw_user_groups()
+            num_done = 0
+            while num_done < len(completed) and completed[num_done] == num_done:
+                num_done += 1
+            completed = list(range(num_done))
+            if num_done > 0:
+                np.random.set_state(manifest.load_random_state(num_done - 1))
+        self.monitor.log("Resuming from checkpoint: {0:d} of {1:d} shards already done.".format(len(completed),
+                                                                                                num_blocks))
+        for ib in completed:
+            self.report_accumulator.merge(manifest.load_statistics(ib, self.num_groups, self.num_items))
+
+        def record(ib, files, block_statistics):
+            self.count_block(ib)
+            self.monitor.progress(self.get_block_range(ib)[1], self.num_users)
+            self.report_accumulator.merge(block_statistics)
+            stream = {'rng': self.rng, 'seed': self.seed}
+            if self.rng == 'spawn':
+                stream['spawn_key'] = [ib]
+            else:
+                stream['block'] = ib
+            manifest.add_shard(ib, self.get_block_range(ib), stream, files, block_statistics,
+                               np.random.get_state() if self.rng == 'global' else None)
+
+        pending = sorted(set(range(num_blocks)) - set(completed))
+        if self.num_workers > 1:
+            with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                for ib, (files, block_statistics) in zip(pending, pool.imap(_write_shard, pending)):
+                    record(ib, files, block_statistics)
+        else:
+            for ib in pending:
+                record(ib, *self.write_shard(ib))
+
+        with self.monitor.stage('save'):
+            self.merge_shards([manifest.get_shard_files(ib) for ib in range(num_blocks)])
+        self.monitor.count(rows_written=self.num_users*self.num_trips)
+
+    def merge_shards(self, shard_files):
+        """ Concatenates shard files in block order into the output files """
+        for i, file_name in enumerate(['true_user_utilities.csv', 'simulated_data.csv']):
+            with open(os.path.join(self.output_dir, file_name), 'wb') as output_file:
+                for files in shard_files:
+                    with open(files[i], 'rb') as shard_file:
+                        shutil.copyfileobj(shard_file, output_file)
+        shutil.rmtree(os.path.join(self.output_dir, DatasetBuilder.SHARD_DIR))
+
+    def write_shard(self, block_index):
+        """ Simulates a block and writes it to its shard files.
+
+            Returns:
+                file_paths:         Paths of the shard files
+                block_statistics:   A ReportAccumulator holding the report statistics of the block
+        """
+        block = self.simulate_block(block_index)
+        return self.save_block(block, append=False, shard_index=block_index), self.accumulate_block(block)
 
-        self.data_set = pd.DataFrame(data=np.zeros([self.num_users * self.num_trips,
-                                                    (DatasetBuilder.NUM_NON_DOE_DATASET_COLUMNS + self.num_items)]),
-                                     columns=["user_id", "trip", "choice"] +
-                                             ["item{0:03}".format(i) for i in range(self.num_items)])
+    def simulate_block(self, block_index):
+        """ Simulates users of a block with the engine chosen.
 
-        print("Dataset generation started...")
+            Returns:
+                block:  A ResultBuffer holding the utilities and trips of the users of the block
+        """
+        start, stop = self.get_block_range(block_index)
+        random_state = self.get_block_random_state(block_index)
+        if random_state is None:
+            user_groups = self.user_groups[start:stop]
+        else:
+            with self.monitor.stage('group_draw'):
+                user_groups = random_state.choice(a=self.num_groups, size=stop - start,
+                                                  p=self.group_distributions.get_group_probabilities())
+
+        block = self.create_result_buffer(stop - start)
+        if self.engine == 'batched':
+            self.simulate_batched_users(block, start, user_groups, random_state)
+        else:
+            with self.monitor.stage('simulation'):
+                self.simulate_users(block, start, user_groups, random_state)
+
+        if self.pantry:
+            with self.monitor.stage('pantry'):
+                pantries = pantry_batch_builder.PantryBatchBuilder(stop - start, self.num_trips, self.consumption_rate,
+                                                                   self.purchase_quantity, random_state)
+                block.set_pantry(slice(None), *pantries.simulate_trips())
+        return block
+
+    def create_result_buffer(self, num_users):
+        """ Returns: A ResultBuffer for num_users users, with sparse shelves in large catalog mode """
+        return result_buffer.ResultBuffer(num_users, self.num_items, self.num_trips,
+                                          shelf_size=self.shelf_size if self.large_catalog else None,
+                                          pantry=self.pantry)
+
+    def simulate_users(self, block, start, user_groups, random_state=None):
+        """ Legacy engine: generates one user at a time and simulates its shopping trips.
+            Fills block with users starting at user id start.
+        """
+        if self.large_catalog:
+            shopping_env_simulator = sparse_doe_builder.SparseDoEBuilder(self.num_items, self.num_trips,
+                                                                         self.shelf_size, random_state)
+        else:
+            shopping_env_simulator = doe_builder.DoEBuilder(self.num_items, self.num_trips, self.shelf_size,
+                                                            random_state)
+        designs = None
+        if self.design_library is not None:
+            designs = self.design_library.get_designs(np.arange(start, start + user_groups.size))
         row_index = 0
-        for iu in range(self.num_users):
-            if ((iu+1) % 50 == 0):
-                sys.stdout.write("\r{0:d}/{1:d}".format(iu+1, self.num_users))
-                sys.stdout.flush()
+        for iu in range(user_groups.size):
+            if ((start+iu+1) % 50 == 0):
+                self.monitor.progress(start+iu+1, self.num_users)
 
             # Generate a new user and draw its item utilities
-            new_user = user_builder.UserBuilder(self.group_distributions.get_group_distribution(self.user_groups[iu]),
-                                                iu,
-                                                self.user_groups[iu])
-            self.true_user_utilities.iloc[iu, 0] = new_user.user_id
-            self.true_user_utilities.iloc[iu, 1] = new_user.user_group
-            self.true_user_utilities.iloc[iu, DatasetBuilder.NUM_USER_UTILITY_COLUMNS:] = new_user.get_utilities()
+            new_user = user_builder.UserBuilder([self.group_distributions.get_group_mean(user_groups[iu]),
+                                                 self.group_distributions.get_group_covariance(user_groups[iu])],
+                                                start+iu,
+                                                user_groups[iu],
+                                                random_state)
+            block.set_users(iu, new_user.user_id, new_user.user_group, new_user.get_utilities())
 
             # Make sure DoE generator is reset before first shopping trip
-            self.shopping_env_simulator.reset()
+            shopping_env_simulator.reset()
 
             # Simulate shopping trips for user
             for it in range(self.num_trips):
-                idx, x = self.shopping_env_simulator.next_shelf()
-                self.data_set.iloc[row_index, :DatasetBuilder.NUM_NON_DOE_DATASET_COLUMNS] = new_user.choose_from_items(idx)
-                self.data_set.iloc[row_index, DatasetBuilder.NUM_NON_DOE_DATASET_COLUMNS:] = x
+                if designs is not None:
+                    idx = designs[iu, it]
+                elif self.large_catalog:
+                    idx = shopping_env_simulator.next_shelf()
+                else:
+                    idx, x = shopping_env_simulator.next_shelf()
+                block.set_trips(row_index, *new_user.choose_from_items(idx), idx)
                 row_index += 1
-        print("")
-        print("Done generating dataset.")
-        if(save):
-            self.save_results()
+
+    def simulate_batched_users(self, block, start, user_groups, random_state=None):
+        """ Batched engine: draws the utilities of all users of the block at once, one matrix per group,
+            then simulates the shopping trips of all users of the block at once.
+            Fills block with users starting at user id start.
+        """
+        stop = start + user_groups.size
+        self.monitor.progress(stop, self.num_users)
+        with self.monitor.stage('utilities'):
+            users = user_batch_builder.UserBatchBuilder(self.group_distributions,
+                                                        np.arange(start, stop),
+                                                        user_groups,
+                                                        random_state)
+            block.set_users(slice(None), users.user_ids, users.user_groups, users.get_utilities())
+
+        # Simulate shopping trips of all users one trip at a time
+        with self.monitor.stage('doe'):
+            if self.design_library is not None:
+                shelves = self.design_library.get_designs(np.arange(start, stop)).reshape(-1, self.shelf_size)
+            elif self.large_catalog:
+                shopping_env_simulator = sparse_doe_builder.SparseDoEBuilder(self.num_items, self.num_trips,
+                                                                             self.shelf_size, random_state)
+                shelves = np.concatenate([shopping_env_simulator.generate_design() for _ in range(user_groups.size)])
+            else:
+                shopping_env_simulator = doe_batch_builder.DoEBatchBuilder(self.num_items, self.num_trips,
+                                                                           self.shelf_size, random_state)
+                shelves = shopping_env_simulator.generate_design(user_groups.size).reshape(-1, self.shelf_size)
+
+        # Draw choices of all trips at once
+        with self.monitor.stage('choices'):
+            block.set_trips(slice(None), *users.choose_from_items(shelves), shelves)
+
+    def save_block(self, block, append, shard_index=None):
+        """ Writes a block of users to disk, appending to the files written by previous blocks
+            unless append is False. If shard_index is given, the block is written to its own shard
+            files instead, with a header only for the first shard.
+
+            Returns:
+                file_paths: Paths of the user utilities and data set files written
+        """
+        mode = 'a' if append else 'w'
+        header = not append
+        file_paths = [os.path.join(self.output_dir, 'true_user_utilities.csv'),
+                      os.path.join(self.output_dir, 'simulated_data.csv')]
+        if shard_index is not None:
+            shard_dir = os.path.join(self.output_dir, DatasetBuilder.SHARD_DIR)
+            if not os.path.exists(shard_dir):
+                os.makedirs(shard_dir, exist_ok=True)
+            file_paths = [os.path.join(shard_dir, 'shard{0:06d}_{1}'.format(shard_index, os.path.basename(path)))
+                          for path in file_paths]
+            header = (shard_index == 0)
+        with self.monitor.stage('save'):
+            block.get_user_utilities().to_csv(file_paths[0], mode=mode, header=header, index=False)
+            block.get_data_set().to_csv(file_paths[1], mode=mode, header=header, index=False)
+        self.monitor.count(rows_written=block.trip.size)
+        return file_paths
 
     def save_results(self):
-        print("Writing user utilities and full dataset to disk.")
-        self.true_user_utilities.to_csv(os.path.join(self.output_dir, 'true_user_utilities.csv'), index=False)
-        self.data_set.to_csv(os.path.join(self.output_dir, 'simulated_data.csv'), index=False)
+        self.monitor.log("Writing user utilities and full dataset to disk.")
+        with self.monitor.stage('save'):
+            if self.output_format != 'csv':
+                self.create_result_store().write_block(self.result_buffer, 0)
+            else:
+                self.true_user_utilities.to_csv(os.path.join(self.output_dir, 'true_user_utilities.csv'),
+                                                index=False)
+                self.data_set.to_csv(os.path.join(self.output_dir, 'simulated_data.csv'), index=False)
+        self.monitor.count(rows_written=self.num_users*self.num_trips)
+
+    def get_config(self):
+        """ Returns: The simulation settings as a JSON serializable dictionary """
+        return {'num_groups': self.num_groups,
+                'num_users': self.num_users,
+                'num_items': self.num_items,
+                'num_trips': self.num_trips,
+                'shelf_size': self.shelf_size,
+                'engine': self.engine,
+                'chunk_size': self.chunk_size,
+                'stream': self.stream,
+                'seed': self.seed,
+                'rng': self.rng,
+                'num_workers': self.num_workers,
+                'output_format': self.output_format,
+                'design_library_size': self.design_library_size,
+                'design_library_best': self.design_library_best,
+                'large_catalog': self.large_catalog,
+                'pantry': self.pantry,
+                'consumption_rate': self.consumption_rate,
+                'purchase_quantity': self.purchase_quantity,
+                'checkpoint': self.checkpoint,
+                'design_diagnostics': self.design_diagnostics}
+
+    def write_run_report(self):
+        """ Writes the JSON run report of the monitor (stage timings, counters, memory) next to the results """
+        self.monitor.write_report(self.output_dir, self.get_config())
 
     def get_results(self):
         return self.true_user_utilities, self.data_set
@@ -130,43 +604,18 @@ class DatasetBuilder:
         """ Verifies the simulation first for users and then for the design.
             Note that doe is simulated with a very simple sampling scheme.
             Balance and orthogonality is not directly controlled here.
-        """
-        print("Generating reports.")
-        # Input user memberships and utilities
-        input_mean_util = dict()
-        for g in range(self.num_groups):
-            input_mean_util[g] = self.group_distributions.get_group_distribution(g)[0]
-            input_mean_util[g] = input_mean_util[g]-input_mean_util[g][self.num_items-1]
-        input_mean_util = pd.DataFrame.from_dict(data=input_mean_util, orient='index')
-        input_mean_util.columns = ["mean_input_util_item{0:03d}".format(i) for i in range(self.num_items)]
-        input_mean_util.reset_index(inplace=True, drop=True)
-
-        input_memb_prob = self.group_distributions.get_group_probabilities()
-        input_memb_prob = pd.DataFrame(data=input_memb_prob, columns=['input_memb_prob'])
-        input_memb_prob.reset_index(inplace=True, drop=True)
-
-        # Drawn user membership probabilities
-        drawn_memb_prob = self.true_user_utilities.groupby(['user_group'])[['user_group']].count() / self.num_users
-        drawn_memb_prob.rename(columns={'user_group': 'sim_memb_prob'}, inplace=True)
-        drawn_memb_prob.reset_index(inplace=True, drop=True)
-
-        # Drawn user utilities (mean)
-        drawn_mean_util = self.true_user_utilities.groupby(['user_group']).mean()
-        drawn_mean_util.drop(labels=['user_id'], axis=1, inplace=True)
-        drawn_mean_util.columns = ["mean_sim_util_item{0:03d}".format(i) for i in range(self.num_items)]
-        drawn_mean_util.reset_index(inplace=True, drop=True)
-
-        user_summary = pd.concat(objs=[input_memb_prob, drawn_memb_prob, input_mean_util, drawn_mean_util], axis=1)
-        user_summary.to_csv(os.path.join(self.output_dir, 'drawn_users_summary.csv'), index=False)
-
-        # Checking design balance per user
-        balance_per_user = self.data_set.groupby(['user_id']).sum()/(self.num_trips*self.shelf_size/self.num_items)
-        balance_per_user.drop(labels=['trip', 'choice'], axis=1, inplace=True)
-        balance_per_user.reset_index(inplace=True)
-        balance_per_user.to_csv(os.path.join(self.output_dir, 'item_balance_per_user.csv'), index=False)
-
-        print("Done with generating reports.")
-
-
-
 
+            Reports are computed from the statistics accumulated while users were generated,
+            so they are also available in streaming mode.
+        """
+        if self.report_accumulator is None:
+            if self.result_buffer is None:
+                raise ValueError('No data set has been generated yet.')
+            self.report_accumulator = self.create_report_accumulator(self.num_users)
+            self.accumulate(self.result_buffer)
+
+        self.monitor.log("Generating reports.")
+        with self.monitor.stage('reports'):
+            self.report_accumulator.write_reports(self.output_dir, self.group_distributions,
+                                                  self.num_trips, self.shelf_size)
+        self.monitor.log("Done with generating reports.")
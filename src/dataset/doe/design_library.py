@@ -0,0 +1,154 @@
+import os
+import tempfile
+import numpy as np
+from src.dataset.doe import doe_batch_builder
+from src.dataset.doe import sparse_doe_builder
+
+
+class DesignLibrary:
+    """ A pool of precomputed designs (shelf assortments of all trips of a user) shared by all users.
+        Capabilities:
+            - Generates num_designs designs once with the receding quota rule of the DoE builders,
+            - Caches the pool on disk, keyed by design parameters and seed,
+            - Ranks designs by item balance and pairwise co-occurrence and serves the best ones only,
+            - Assigns designs to users by user index.
+
+        Designs are stored as item indices on shelf (size = num_designs x num_trips x shelf_size)
+        in the smallest unsigned integer type holding num_items. Designs are generated and measured
+        in chunks of about CHUNK_BYTES of work memory. With large_catalog they are drawn by SparseDoEBuilder
+        and no step of the library allocates memory in proportion to num_items for each design.
+    """
+    CACHE_VERSION = 2
+    GENERATION_CHUNK_SIZE = 1000
+    CHUNK_BYTES = 1 << 25
+
+    def __init__(self, num_items, num_trips, shelf_size, num_designs, seed, num_best=None, cache_dir=None,
+                 large_catalog=False):
+        if num_designs < 1:
+            raise ValueError('The design library needs at least one design.')
+        if num_best is not None and not 1 <= num_best <= num_designs:
+            raise ValueError('The number of best designs served should be between 1 and the library size.')
+        self.num_items = num_items
+        self.num_trips = num_trips
+        self.shelf_size = shelf_size
+        self.num_designs = num_designs
+        self.seed = seed
+        self.large_catalog = large_catalog
+        self.cache_file = None if cache_dir is None else os.path.join(cache_dir, self.get_cache_name())
+
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            with np.load(self.cache_file) as arrays:
+                self.designs = arrays['designs']
+                self.balance_errors = arrays['balance_errors']
+                self.cooccurrence_errors = arrays['cooccurrence_errors']
+        else:
+            self.designs = self.generate_designs()
+            self.balance_errors, self.cooccurrence_errors = self.get_design_errors(self.designs)
+            if self.cache_file is not None:
+                self.save_cache(self.cache_file)
+
+        # Designs served to users: the whole pool, or the best num_best of it
+        if num_best is not None:
+            self.served_designs = self.designs[self.rank_designs()[:num_best]]
+        else:
+            self.served_designs = self.designs
+
+    def get_cache_name(self):
+        return 'designs_v{0:d}_ni{1:d}_nt{2:d}_ss{3:d}_nd{4:d}_seed{5:d}{6}.npz'.format(
+            DesignLibrary.CACHE_VERSION, self.num_items, self.num_trips, self.shelf_size, self.num_designs, self.seed,
+            '_lc' if self.large_catalog else '')
+
+    @staticmethod
+    def get_chunk_size(bytes_per_design):
+        """ Returns: Number of designs processed at once, so that a chunk takes about CHUNK_BYTES """
+        return int(max(1, min(DesignLibrary.GENERATION_CHUNK_SIZE, DesignLibrary.CHUNK_BYTES // bytes_per_design)))
+
+    def get_index_dtype(self):
+        return np.min_scalar_type(self.num_items - 1)
+
+    def generate_designs(self):
+        """ Draws the designs of the pool with the batched DoE builder (the sparse one for large catalogs),
+            seeded by seed only.
+
+            Returns:
+                designs:    Index of items on shelf (size = num_designs x num_trips x shelf_size)
+        """
+        random_state = np.random.default_rng(self.seed)
+        designs = np.zeros([self.num_designs, self.num_trips, self.shelf_size], dtype=self.get_index_dtype())
+        if self.large_catalog:
+            builder = sparse_doe_builder.SparseDoEBuilder(self.num_items, self.num_trips, self.shelf_size,
+                                                          random_state)
+            for d in range(self.num_designs):
+                designs[d] = builder.generate_design()
+            return designs
+
+        # Item counts and draw probabilities of the batched builder take a few float64 rows per design
+        chunk_size = self.get_chunk_size(32*self.num_items)
+        builder = doe_batch_builder.DoEBatchBuilder(self.num_items, self.num_trips, self.shelf_size, random_state)
+        for start in range(0, self.num_designs, chunk_size):
+            stop = min(start + chunk_size, self.num_designs)
+            designs[start:stop] = builder.generate_design(stop - start)
+        return designs
+
+    def get_design_errors(self, designs):
+        """ Measures how far each design is from a perfectly balanced and orthogonal one.
+            The co-occurrence counts C = X'X of a design X (trips x items) are never formed:
+            the sum of their squares equals that of the trip overlap counts X X' (trips x trips),
+            which are counted from the shelf indices. Item counts come from the sorted shelf indices,
+            so memory does not grow with num_items.
+
+            Returns:
+                balance_errors:         RMS deviation of item counts from num_trips*shelf_size/num_items
+                cooccurrence_errors:    RMS deviation of the counts of item pairs from their ideal count
+        """
+        num_pairs = self.num_items*(self.num_items - 1)
+        ideal_count = self.num_trips*self.shelf_size/self.num_items
+        ideal_pair_count = self.num_trips*self.shelf_size*(self.shelf_size - 1)/max(num_pairs, 1)
+        balance_errors = np.zeros(designs.shape[0])
+        cooccurrence_errors = np.zeros(designs.shape[0])
+        num_trips, shelf_size = designs.shape[1:]
+        chunk_size = self.get_chunk_size(num_trips**2*shelf_size**2)
+        for start in range(0, designs.shape[0], chunk_size):
+            chunk = designs[start:start + chunk_size].astype(np.int64)
+            num_chunk_designs = chunk.shape[0]
+            stop = start + num_chunk_designs
+
+            # Items of a shelf are distinct, so equal indices between two shelves count their common items
+            overlaps = np.sum(chunk[:, :, None, :, None] == chunk[:, None, :, None, :], axis=(3, 4), dtype=np.int64)
+
+            # Counts of the items present in each design, the other items have a count of 0
+            keys = np.unique(np.arange(num_chunk_designs)[:, None]*self.num_items
+                             + chunk.reshape(num_chunk_designs, -1), return_counts=True)
+            key_design = keys[0] // self.num_items
+            counts = keys[1].astype(np.float64)
+            num_present = np.bincount(key_design, minlength=num_chunk_designs)
+            count_squares = np.bincount(key_design, weights=counts**2, minlength=num_chunk_designs)
+            count_errors = (np.bincount(key_design, weights=(counts - ideal_count)**2, minlength=num_chunk_designs)
+                            + (self.num_items - num_present)*ideal_count**2)
+
+            pair_squares = np.sum(overlaps.astype(np.float64)**2, axis=(1, 2)) - count_squares
+            balance_errors[start:stop] = np.sqrt(count_errors/self.num_items)
+            cooccurrence_errors[start:stop] = np.sqrt(np.maximum(pair_squares/max(num_pairs, 1)
+                                                                 - ideal_pair_count**2, 0.0))
+        return balance_errors, cooccurrence_errors
+
+    def rank_designs(self):
+        """ Returns: Design indices from best to worst, by balance error first and co-occurrence error next """
+        return np.lexsort((self.cooccurrence_errors, self.balance_errors))
+
+    def save_cache(self, cache_file):
+        """ Writes the pool and its errors to a .npz file (atomically) """
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, designs=self.designs, balance_errors=self.balance_errors,
+                     cooccurrence_errors=self.cooccurrence_errors)
+        os.replace(tmp_file, cache_file)
+
+    def get_designs(self, user_ids):
+        """ Returns: The designs of the given users (size = num_users x num_trips x shelf_size).
+            User u is served design u modulo the number of designs served.
+        """
+        return self.served_designs[np.asarray(user_ids) % self.served_designs.shape[0]]
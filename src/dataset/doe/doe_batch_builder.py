@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class DoEBatchBuilder:
+    """ Generates assortments of products on shelf for a block of shoppers at once.
+        All users of the block advance one shopping trip at a time. Item counts and
+        draw probabilities are kept as num_users x num_items matrices and follow the same
+        receding quota rule as DoEBuilder, drawing from random_state the way it does.
+    """
+    def __init__(self, num_items, num_trips, shelf_size, random_state=None):
+        self.random_state = np.random if random_state is None else random_state
+        self.num_running_trips = 0
+        self.num_users = 0
+        self.num_items = num_items
+        self.num_trips = num_trips
+        self.shelf_size = shelf_size
+
+        # Average chance of each product to appear on shelf
+        self.item_balanced_view_prob = shelf_size/num_items
+
+        # Item counts across user shopping trips and item draw probabilities (one row per user)
+        self.item_trip_counts = np.zeros([0, num_items])
+        self.item_draw_probs = np.zeros([0, num_items])
+
+    def reset(self, num_users):
+        """ Resets the DoE generator before a new block of users starts
+        """
+
+        # Draw probabilities back to flat
+        self.num_users = num_users
+        self.item_draw_probs = np.ones([num_users, self.num_items])/self.num_items
+
+        # Reset number of shopping trips and item counts across trips
+        self.num_running_trips = 0
+        self.item_trip_counts = np.zeros([num_users, self.num_items])
+
+    def update_probabilities(self):
+        """ Row-wise version of DoEBuilder.update_probabilities.
+            Items close to their theoretical count limit get a lower chance of being drawn.
+        """
+        ideal_counts = self.item_balanced_view_prob*(1+self.num_running_trips)
+        current_portions = self.item_trip_counts / ideal_counts
+        # To avoid edge cases 0.999 is used instead of 1.0
+        np.minimum(current_portions, 0.999, out=current_portions)
+        self.item_draw_probs = 1.0 - current_portions
+        row_sums = np.sum(self.item_draw_probs, axis=1, keepdims=True)
+        flat_rows = (row_sums[:, 0] == 0.0)
+        if np.any(flat_rows):
+            self.item_draw_probs[flat_rows] = 1.0
+            row_sums[flat_rows] = self.num_items
+        self.item_draw_probs /= row_sums
+
+    def draw_without_replacement(self):
+        """ Weighted sampling of shelf_size items per user without replacement (Gumbel-top-k).
+            Taking the k largest log(p) + Gumbel noise keys is equivalent to drawing items
+            one by one and renormalizing p after each draw, as np.random.choice does.
+
+            Returns:
+                idx:    Sorted item indices on shelf per user (size = num_users x shelf_size)
+        """
+        with np.errstate(divide='ignore'):
+            keys = np.log(self.item_draw_probs)
+        keys += self.random_state.gumbel(size=keys.shape)
+        idx = np.argpartition(-keys, self.shelf_size-1, axis=1)[:, :self.shelf_size]
+        return np.sort(idx, axis=1)
+
+    def next_shelves(self):
+        """ Generates next shelf assortment for all users of the block.
+            Updates draw probabilities at the end for next shelf.
+
+            Returns:
+                idx:    Index of items available on shelf (size = num_users x shelf_size)
+        """
+        if self.num_running_trips >= self.num_trips:
+            raise ValueError('The number of shipping trips exceeds what is expected: {0:d}'.format(self.num_trips))
+
+        idx = self.draw_without_replacement()
+        self.item_trip_counts[np.arange(self.num_users)[:, None], idx] += 1
+        self.num_running_trips += 1
+        self.update_probabilities()
+
+        return idx
+
+    def generate_design(self, num_users):
+        """ Runs all shopping trips for a block of users.
+
+            Returns:
+                shelves:    Index of items on shelf (size = num_users x num_trips x shelf_size)
+        """
+        self.reset(num_users)
+        shelves = np.zeros([num_users, self.num_trips, self.shelf_size], dtype=np.int64)
+        for it in range(self.num_trips):
+            shelves[:, it, :] = self.next_shelves()
+        return shelves
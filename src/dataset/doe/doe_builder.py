@@ -3,8 +3,11 @@ import numpy as np
 
 class DoEBuilder:
     """ Generates assortments of products on shelf for each shopper trip.
+        Shelves are sampled with random_state: a np.random.Generator, a RandomState,
+        or None to keep using the global numpy random state.
     """
-    def __init__(self, num_items, num_trips, shelf_size):
+    def __init__(self, num_items, num_trips, shelf_size, random_state=None):
+        self.random_state = np.random if random_state is None else random_state
         self.num_running_trips = 0
         # Item counts across user shopping trips
         self.item_trip_counts = np.zeros(num_items)
@@ -61,7 +64,7 @@ class DoEBuilder:
         if self.num_running_trips >= self.num_trips:
             raise ValueError('The number of shipping trips exceeds what is expected: {0:d}'.format(self.num_trips))
 
-        idx = np.random.choice(a=self.num_items, size=self.shelf_size, replace=False, p=self.item_draw_probs)
+        idx = self.random_state.choice(a=self.num_items, size=self.shelf_size, replace=False, p=self.item_draw_probs)
         x = np.zeros(self.num_items)
         x[idx] = 1
         self.doe[self.num_running_trips, idx] = 1
@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class QuotaTree:
+    """ Fenwick tree over the item draw weights of the receding quota rule.
+        Item j weighs ideal_count*u_j - v_j where (u_j, v_j) is:
+            - (SCALE, SCALE*count_j) for items below their quota (weight SCALE*(ideal_count - count_j)),
+            - (1, 0) for items at or above their quota (the 0.999 cap of DoEBuilder),
+            - (0, 0) for items already drawn on the current shelf.
+        u and v are integers, so sums are exact and the weights of all items follow the ideal count
+        of the trip without being rewritten. Only the nodes of changed items are updated.
+    """
+    SCALE = 1000
+
+    def __init__(self, num_items):
+        self.num_items = num_items
+        self.top = 1 << (num_items.bit_length() - 1)
+        self.u = [QuotaTree.SCALE*(i & -i) for i in range(num_items + 1)]
+        self.v = [0]*(num_items + 1)
+        self.touched = []
+
+    def reset(self):
+        """ Restores flat weights, touching only the nodes updated since the last reset """
+        for i in set(self.touched):
+            self.u[i] = QuotaTree.SCALE*(i & -i)
+            self.v[i] = 0
+        self.touched = []
+
+    def add(self, item, du, dv):
+        i = item + 1
+        while i <= self.num_items:
+            self.u[i] += du
+            self.v[i] += dv
+            self.touched.append(i)
+            i += i & -i
+
+    def total(self, ideal_count):
+        u = v = 0
+        i = self.num_items
+        while i > 0:
+            u += self.u[i]
+            v += self.v[i]
+            i -= i & -i
+        return ideal_count*u - v
+
+    def find(self, ideal_count, r):
+        """ Returns: The first item whose cumulative weight exceeds r (num_items if none does) """
+        pos = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt <= self.num_items:
+                weight = ideal_count*self.u[nxt] - self.v[nxt]
+                if weight <= r:
+                    r -= weight
+                    pos = nxt
+            step >>= 1
+        return pos
+
+
+class SparseDoEBuilder:
+    """ Large catalog version of DoEBuilder.
+        Follows the same receding quota rule and takes the same random_state, but keeps item counts sparse
+        and draw weights in a QuotaTree, so a shelf costs O(shelf_size log num_items) instead of O(num_items)
+        and shelves are returned as item index arrays only. Starting a new user costs
+        O(num_trips shelf_size log num_items).
+    """
+    def __init__(self, num_items, num_trips, shelf_size, random_state=None):
+        if not 0 < shelf_size <= num_items:
+            raise ValueError('The shelf size should be between 1 and the number of items: {0:d}'.format(num_items))
+        self.random_state = np.random if random_state is None else random_state
+        self.num_items = num_items
+        self.num_trips = num_trips
+        self.shelf_size = shelf_size
+        self.num_running_trips = 0
+
+        # Average chance of each product to appear on shelf
+        self.item_balanced_view_prob = shelf_size/num_items
+
+        # Counts of items seen so far and items at or above their quota, grouped by count
+        self.tree = QuotaTree(num_items)
+        self.item_trip_counts = dict()
+        self.capped_items = dict()
+
+    def reset(self):
+        """ Resets the DoE generator before user starts
+        """
+        self.tree.reset()
+        self.item_trip_counts = dict()
+        self.capped_items = dict()
+        self.num_running_trips = 0
+
+    def get_ideal_count(self):
+        return self.item_balanced_view_prob*(1 + self.num_running_trips)
+
+    def get_item_weight(self, item):
+        """ Returns: (u, v) of an item in the quota tree """
+        count = self.item_trip_counts.get(item, 0)
+        if item in self.capped_items.get(count, ()):
+            return 1, 0
+        return QuotaTree.SCALE, QuotaTree.SCALE*count
+
+    def get_draw_probabilities(self):
+        """ Returns: Dense draw probabilities of the next shelf (size = num_items), as DoEBuilder.item_draw_probs """
+        weights = np.full(self.num_items, float(QuotaTree.SCALE)*self.get_ideal_count())
+        for item in self.item_trip_counts:
+            u, v = self.get_item_weight(item)
+            weights[item] = self.get_ideal_count()*u - v
+        return weights/np.sum(weights)
+
+    def update_probabilities(self, idx):
+        """ Puts the items of the last shelf back with their new counts and releases capped items
+            that fall below the quota of the next trip. Only these items are updated.
+        """
+        ideal_counts = self.get_ideal_count()
+        for count in [c for c in self.capped_items if c/ideal_counts < 1.0]:
+            for item in self.capped_items.pop(count):
+                self.tree.add(item, QuotaTree.SCALE - 1, QuotaTree.SCALE*count)
+
+        for item in idx:
+            count = self.item_trip_counts.get(item, 0) + 1
+            self.item_trip_counts[item] = count
+            if count/ideal_counts >= 1.0:
+                self.capped_items.setdefault(count, set()).add(item)
+                self.tree.add(item, 1, 0)
+            else:
+                self.tree.add(item, QuotaTree.SCALE, QuotaTree.SCALE*count)
+
+    def next_shelf(self):
+        """ Generates next shelf assortment for user.
+            Items are drawn one by one with probabilities renormalized after each draw, as np.random.choice does.
+            Updates draw probabilities at the end for next shelf.
+
+            Returns:
+                idx:    Index of items available on shelf (size = shelf_size)
+        """
+        if self.num_running_trips >= self.num_trips:
+            raise ValueError('The number of shipping trips exceeds what is expected: {0:d}'.format(self.num_trips))
+
+        ideal_count = self.get_ideal_count()
+        idx = []
+        while len(idx) < self.shelf_size:
+            total = self.tree.total(ideal_count)
+            if not total > 0:
+                raise ValueError('No item is left to draw on the shelf.')
+            item = self.tree.find(ideal_count, self.random_state.random()*total)
+            if item >= self.num_items:
+                # Rounding put the draw past the last item, draw again
+                continue
+            u, v = self.get_item_weight(item)
+            count = self.item_trip_counts.get(item, 0)
+            if count in self.capped_items:
+                self.capped_items[count].discard(item)
+            self.tree.add(item, -u, -v)
+            idx.append(item)
+
+        self.num_running_trips += 1
+        self.update_probabilities(idx)
+        return np.array(idx, dtype=np.int64)
+
+    def generate_design(self):
+        """ Resets the generator and runs all shopping trips of a user.
+
+            Returns:
+                shelves:    Index of items on shelf (size = num_trips x shelf_size)
+        """
+        self.reset()
+        return np.array([self.next_shelf() for _ in range(self.num_trips)], dtype=np.int64)
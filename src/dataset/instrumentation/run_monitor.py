@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+import contextlib
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class RunMonitor:
+    """ Collects stage timings, counters and optional profiles of a simulation run.
+        Capabilities:
+            - Times named stages and calls the registered start and end hooks,
+            - Counts users, trips and output rows generated,
+            - Optionally profiles the run with cProfile and traces peak memory with tracemalloc,
+            - Writes a JSON run report next to the results.
+
+        Progress messages of the dataset builder also go through the monitor.
+        When no hook, profiler or memory tracing is enabled, a stage costs two clock reads.
+    """
+    REPORT_FILE = 'run_report.json'
+    PROFILE_FILE = 'run_profile.prof'
+
+    def __init__(self, verbose=True, profile=False, trace_memory=False):
+        self.verbose = verbose
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.stage_start_hooks = []
+        self.stage_end_hooks = []
+        self.stage_seconds = dict()
+        self.stage_calls = dict()
+        self.counters = {'users': 0, 'trips': 0, 'rows_written': 0}
+        self.profiler = None
+        self.start_time = None
+        self.stop_time = None
+        self.peak_traced_memory = None
+
+    def __getstate__(self):
+        """ Monitors copied to worker processes keep their verbosity only """
+        return {'verbose': self.verbose}
+
+    def __setstate__(self, state):
+        self.__init__(verbose=state['verbose'])
+
+    def add_hook(self, on_stage_start=None, on_stage_end=None):
+        """ Registers callbacks. on_stage_start(stage) is called when a stage starts and
+            on_stage_end(stage, seconds) when it ends.
+        """
+        if on_stage_start is not None:
+            self.stage_start_hooks.append(on_stage_start)
+        if on_stage_end is not None:
+            self.stage_end_hooks.append(on_stage_end)
+
+    def start(self):
+        """ Starts the run clock and the optional profiler and memory tracing """
+        self.start_time = time.perf_counter()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        """ Stops the run clock, the profiler and memory tracing """
+        self.stop_time = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_traced_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ Context manager timing a stage. Repeated stages (e.g. one per block) are accumulated. """
+        for hook in self.stage_start_hooks:
+            hook(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            for hook in self.stage_end_hooks:
+                hook(name, seconds)
+
+    def count(self, users=0, trips=0, rows_written=0):
+        self.counters['users'] += users
+        self.counters['trips'] += trips
+        self.counters['rows_written'] += rows_written
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def progress(self, done, total):
+        if self.verbose:
+            sys.stdout.write("\r{0:d}/{1:d}".format(done, total))
+            sys.stdout.flush()
+
+    def get_report(self, config=None):
+        """ Returns: A JSON serializable dictionary describing the run """
+        stop_time = time.perf_counter() if self.stop_time is None else self.stop_time
+        wall_seconds = 0.0 if self.start_time is None else stop_time - self.start_time
+        report = {'config': config if config is not None else dict(),
+                  'wall_seconds': wall_seconds,
+                  'stages': {name: {'seconds': self.stage_seconds[name], 'calls': self.stage_calls[name]}
+                             for name in self.stage_seconds},
+                  'counters': dict(self.counters),
+                  'users_per_sec': self.counters['users']/wall_seconds if wall_seconds > 0 else None,
+                  'trips_per_sec': self.counters['trips']/wall_seconds if wall_seconds > 0 else None,
+                  'peak_traced_memory_bytes': self.peak_traced_memory}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['max_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss*1024
+        return report
+
+    def write_report(self, output_dir, config=None):
+        """ Stops the run and writes the JSON run report (and the profile, if enabled) to output_dir """
+        self.stop()
+        with open(os.path.join(output_dir, RunMonitor.REPORT_FILE), 'w') as f:
+            json.dump(self.get_report(config), f, indent=2, sort_keys=True)
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(output_dir, RunMonitor.PROFILE_FILE))
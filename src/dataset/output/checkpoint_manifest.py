@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import numpy as np
+from src.dataset.output import report_accumulator
+
+
+class CheckpointManifest:
+    """ Checkpoint of a sharded run, kept as checkpoint.json in the shard directory.
+        Capabilities:
+            - Records for every completed shard its user range, random stream position and file checksums,
+            - Saves the report statistics (and design diagnostics) of a shard, and the global random state after it,
+              next to its files,
+            - Finds the shards of an interrupted run that can be reused, checking their checksums.
+
+        The manifest is rewritten atomically after each shard, so a run killed at any point leaves
+        either the previous or the new manifest. A manifest written by a run with other settings is rejected.
+    """
+    MANIFEST_FILE = 'checkpoint.json'
+    VERSION = 1
+
+    def __init__(self, shard_dir, config):
+        self.shard_dir = shard_dir
+        self.manifest_file = os.path.join(shard_dir, CheckpointManifest.MANIFEST_FILE)
+        self.manifest = {'version': CheckpointManifest.VERSION, 'config': config, 'shards': {}}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as f:
+                manifest = json.load(f)
+            if manifest.get('version') != CheckpointManifest.VERSION or manifest.get('config') != config:
+                raise ValueError('The checkpoint in {0} was written by a run with other settings.'.format(shard_dir))
+            self.manifest = manifest
+        elif not os.path.exists(shard_dir):
+            os.makedirs(shard_dir, exist_ok=True)
+
+    @staticmethod
+    def checksum(file_path):
+        """ Returns: The sha256 hex digest of a file """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_state_file(self, shard_index):
+        return os.path.join(self.shard_dir, 'shard{0:06d}_state.npz'.format(shard_index))
+
+    def get_shard_files(self, shard_index):
+        """ Returns: Paths of the result files of a completed shard, in the order they were added """
+        entry = self.manifest['shards'][str(shard_index)]
+        return [os.path.join(self.shard_dir, file_name) for file_name in entry['results']]
+
+    def get_completed_shards(self):
+        """ Returns: Sorted indices of the recorded shards whose files are all present and unchanged """
+        completed = []
+        for key, entry in self.manifest['shards'].items():
+            if all(os.path.exists(os.path.join(self.shard_dir, file_name)) and
+                   CheckpointManifest.checksum(os.path.join(self.shard_dir, file_name)) == digest
+                   for file_name, digest in entry['checksums'].items()):
+                completed.append(int(key))
+        return sorted(completed)
+
+    def add_shard(self, shard_index, user_range, stream, file_paths, block_statistics, random_state=None):
+        """ Records a completed shard.
+
+            Args:
+                user_range:         First and last (excluded) user ids of the shard
+                stream:             JSON serializable position of the shard in the random streams of the run
+                file_paths:         Result files of the shard, in the shard directory
+                block_statistics:   ReportAccumulator of the users of the shard
+                random_state:       Global numpy random state after the shard (rng=global only)
+        """
+        state = {'group_counts': block_statistics.group_counts,
+                 'group_means': block_statistics.group_means,
+                 'group_m2': block_statistics.group_m2,
+                 'item_view_counts': block_statistics.item_view_counts}
+        if block_statistics.design_diagnostics is not None:
+            state.update(num_rows=block_statistics.design_diagnostics.num_rows,
+                         cooccurrence=block_statistics.design_diagnostics.cooccurrence,
+                         shelf_size_counts=block_statistics.design_diagnostics.shelf_size_counts)
+        if random_state is not None:
+            state.update(random_state_keys=random_state[1], random_state_pos=random_state[2],
+                         random_state_has_gauss=random_state[3], random_state_cached_gaussian=random_state[4])
+        np.savez(self.get_state_file(shard_index), **state)
+
+        results = [os.path.basename(path) for path in file_paths]
+        file_names = results + [os.path.basename(self.get_state_file(shard_index))]
+        self.manifest['shards'][str(shard_index)] = {
+            'users': [int(user_range[0]), int(user_range[1])],
+            'stream': stream,
+            'results': results,
+            'checksums': {file_name: CheckpointManifest.checksum(os.path.join(self.shard_dir, file_name))
+                          for file_name in file_names}}
+        self.write()
+
+    def write(self):
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.manifest_file)
+
+    def load_statistics(self, shard_index, num_groups, num_items):
+        """ Returns: The ReportAccumulator saved with a completed shard """
+        user_range = self.manifest['shards'][str(shard_index)]['users']
+        with np.load(self.get_state_file(shard_index)) as state:
+            block_statistics = report_accumulator.ReportAccumulator(num_groups, num_items,
+                                                                    user_range[1] - user_range[0],
+                                                                    user_offset=user_range[0],
+                                                                    diagnostics='cooccurrence' in state)
+            block_statistics.group_counts[:] = state['group_counts']
+            block_statistics.group_means[:] = state['group_means']
+            block_statistics.group_m2[:] = state['group_m2']
+            block_statistics.item_view_counts[:] = state['item_view_counts']
+            if block_statistics.design_diagnostics is not None:
+                block_statistics.design_diagnostics.num_rows = int(state['num_rows'])
+                block_statistics.design_diagnostics.cooccurrence[:] = state['cooccurrence']
+                block_statistics.design_diagnostics.shelf_size_counts[:] = state['shelf_size_counts']
+        return block_statistics
+
+    def load_random_state(self, shard_index):
+        """ Returns: The global numpy random state saved after a completed shard, as given by np.random.get_state """
+        with np.load(self.get_state_file(shard_index)) as state:
+            return ('MT19937', state['random_state_keys'], int(state['random_state_pos']),
+                    int(state['random_state_has_gauss']), float(state['random_state_cached_gaussian']))
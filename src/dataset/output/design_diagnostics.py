@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pd
+from src.dataset.output import result_store
+
+
+class DesignDiagnostics:
+    """ Online diagnostics of the assortment design: balance, co-occurrence (orthogonality) and D-efficiency.
+        Capabilities:
+            - Keeps assortments bit-packed, one bit per item per trip (the layout of the bitpacked output format),
+            - Counts items per shelf with popcounts and item pair co-occurrences with one matrix product per chunk,
+            - Processes trips in chunks of bounded memory, from blocks of users or from stored binary results,
+            - Merges with diagnostics of other blocks or processes.
+
+        Co-occurrence counts are exact: each chunk has less than 2^24 trips, so float32 products are exact.
+        The cost is O(trips x num_items^2), so diagnostics are opt-in for large catalogs.
+
+        D-efficiency compares the covariance of item presence with that of an ideal design, where every item
+        is on the shelf at shelf_size/num_items of the trips and every pair of items at the same rate.
+        As shelves have a fixed size, one item is left out of both determinants. It is 1 for the ideal design.
+    """
+    CHUNK_BYTES = 1 << 25
+
+    # Number of set bits of every byte value
+    POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+    def __init__(self, num_items):
+        self.num_items = num_items
+        self.num_rows = 0
+        self.cooccurrence = np.zeros([num_items, num_items], dtype=np.int64)
+        self.shelf_size_counts = np.zeros(num_items + 1, dtype=np.int64)
+
+        # Rows per chunk, so that an unpacked float32 chunk takes about CHUNK_BYTES
+        self.chunk_rows = int(max(8, min(1 << 16, DesignDiagnostics.CHUNK_BYTES // (4*num_items))))
+
+    @staticmethod
+    def pack_shelf_items(shelf_items, num_items):
+        """ Returns: Bit-packed assortments (rows x ceil(num_items/8), uint8) of shelves given as item indices """
+        num_rows, num_bytes = shelf_items.shape[0], (num_items + 7) // 8
+        cells = np.arange(num_rows)[:, None]*num_bytes + (shelf_items >> 3)
+        # Items of a shelf are distinct, so adding their bits is the same as or-ing them
+        bits = np.bincount(cells.ravel(), weights=(128 >> (shelf_items & 7)).ravel(), minlength=num_rows*num_bytes)
+        return bits.astype(np.uint8).reshape(num_rows, num_bytes)
+
+    def update(self, block):
+        """ Adds the trips of a block of users (ResultBuffer) """
+        if block.assortment is not None:
+            bits = np.packbits(block.assortment, axis=1)
+        else:
+            bits = DesignDiagnostics.pack_shelf_items(block.shelf_items, self.num_items)
+        self.update_bits(bits)
+
+    def update_bits(self, bits):
+        """ Adds trips given as bit-packed assortments (rows x ceil(num_items/8), uint8), chunk by chunk """
+        for start in range(0, bits.shape[0], self.chunk_rows):
+            chunk = np.asarray(bits[start:start + self.chunk_rows])
+            self.shelf_size_counts += np.bincount(np.sum(DesignDiagnostics.POPCOUNT[chunk], axis=1, dtype=np.int64),
+                                                  minlength=self.num_items + 1)
+            flags = np.unpackbits(chunk, axis=1, count=self.num_items).astype(np.float32)
+            self.cooccurrence += np.rint(np.dot(flags.T, flags)).astype(np.int64)
+            self.num_rows += chunk.shape[0]
+
+    @classmethod
+    def from_store(cls, output_dir):
+        """ Returns: Diagnostics of the binary results stored in output_dir, read chunk by chunk """
+        store = result_store.ResultStore(output_dir)
+        arrays = store.load_arrays()
+        diagnostics = cls(store.schema['num_items'])
+        num_rows = arrays['trip'].shape[0]
+        for start in range(0, num_rows, diagnostics.chunk_rows):
+            rows = slice(start, start + diagnostics.chunk_rows)
+            if store.schema['format'] == 'bitpacked':
+                diagnostics.update_bits(arrays['assortment_bits'][rows])
+            elif store.schema['format'] == 'index':
+                diagnostics.update_bits(cls.pack_shelf_items(np.asarray(arrays['assortment_index'][rows]),
+                                                             diagnostics.num_items))
+            else:
+                diagnostics.update_bits(np.packbits(arrays['assortment'][rows], axis=1))
+        return diagnostics
+
+    def merge(self, other):
+        """ Adds the diagnostics of another set of trips """
+        self.num_rows += other.num_rows
+        self.cooccurrence += other.cooccurrence
+        self.shelf_size_counts += other.shelf_size_counts
+
+    def get_item_views(self):
+        """ Returns: Number of trips each item was on the shelf """
+        return np.diag(self.cooccurrence).copy()
+
+    def get_d_efficiency(self, shelf_size):
+        """ Returns: D-efficiency of the design relative to the ideal design (NaN if undefined) """
+        if self.num_rows == 0 or not 0 < shelf_size < self.num_items:
+            return np.nan
+        free = self.num_items - 1
+        frequency = self.get_item_views()/self.num_rows
+        covariance = self.cooccurrence/self.num_rows - np.outer(frequency, frequency)
+
+        view_prob = shelf_size/self.num_items
+        pair_prob = view_prob*(shelf_size - 1)/(self.num_items - 1)
+        ideal = (view_prob - pair_prob)*np.eye(free) + (pair_prob - view_prob**2)*np.ones([free, free])
+
+        sign, log_det = np.linalg.slogdet(covariance[:free, :free])
+        if sign <= 0:
+            return 0.0
+        return float(np.exp((log_det - np.linalg.slogdet(ideal)[1])/free))
+
+    def get_summary(self, num_trips, shelf_size, item_view_counts=None):
+        """ Returns: A DataFrame of design metrics, one per row. Per-user balance metrics need the item
+            view counts per user (users x num_items).
+        """
+        views = self.get_item_views()
+        ideal_views = self.num_rows*shelf_size/self.num_items
+        ideal_pairs = ideal_views*(shelf_size - 1)/(self.num_items - 1) if self.num_items > 1 else np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pair_balance = self.cooccurrence[~np.eye(self.num_items, dtype=bool)]/ideal_pairs
+            item_balance = views/ideal_views
+        shelf_sizes = np.flatnonzero(self.shelf_size_counts)
+
+        metrics = {'num_trips': self.num_rows,
+                   'min_shelf_size': shelf_sizes.min() if shelf_sizes.size else np.nan,
+                   'max_shelf_size': shelf_sizes.max() if shelf_sizes.size else np.nan,
+                   'min_item_balance': np.min(item_balance) if self.num_rows else np.nan,
+                   'max_item_balance': np.max(item_balance) if self.num_rows else np.nan,
+                   'min_pair_cooccurrence': np.min(pair_balance) if pair_balance.size else np.nan,
+                   'max_pair_cooccurrence': np.max(pair_balance) if pair_balance.size else np.nan,
+                   'std_pair_cooccurrence': np.std(pair_balance) if pair_balance.size else np.nan,
+                   'd_efficiency': self.get_d_efficiency(shelf_size)}
+        if item_view_counts is not None and item_view_counts.size:
+            deviation = item_view_counts/(num_trips*shelf_size/self.num_items) - 1
+            user_rms_deviation = np.sqrt(np.mean(deviation**2, axis=1))
+            metrics.update(mean_user_balance_rmse=np.mean(user_rms_deviation),
+                           max_user_balance_rmse=np.max(user_rms_deviation),
+                           max_user_balance_deviation=np.max(np.abs(deviation)))
+        return pd.DataFrame({'metric': list(metrics.keys()), 'value': list(metrics.values())})
+
+    def write_reports(self, output_dir, num_trips, shelf_size, item_view_counts=None):
+        """ Writes design_diagnostics.csv (design metrics), item_balance_global.csv (views of each item
+            relative to a balanced design) and item_cooccurrence.csv (co-occurrences of each pair of items
+            relative to a design with flat co-occurrences) to output_dir.
+        """
+        item_columns = ["item{0:03d}".format(i) for i in range(self.num_items)]
+        self.get_summary(num_trips, shelf_size, item_view_counts).to_csv(
+            os.path.join(output_dir, 'design_diagnostics.csv'), index=False)
+
+        views = self.get_item_views()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            balance = pd.DataFrame({'item': item_columns, 'num_views': views,
+                                    'balance': views/(self.num_rows*shelf_size/self.num_items)})
+            balance.to_csv(os.path.join(output_dir, 'item_balance_global.csv'), index=False)
+
+            ideal_pairs = self.num_rows*shelf_size*(shelf_size - 1)/(self.num_items*(self.num_items - 1))
+            pair_balance = self.cooccurrence/ideal_pairs
+        np.fill_diagonal(pair_balance, np.nan)
+        cooccurrence = pd.DataFrame(data=pair_balance, columns=item_columns)
+        cooccurrence.insert(0, 'item', item_columns)
+        cooccurrence.to_csv(os.path.join(output_dir, 'item_cooccurrence.csv'), index=False)
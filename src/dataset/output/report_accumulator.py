@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pandas as pd
+from src.dataset.output import design_diagnostics
+
+
+class ReportAccumulator:
+    """ Online statistics behind the simulation reports.
+        Updated block by block while users are generated, so reports never need the full data set.
+        Capabilities:
+            - Counts users per group,
+            - Keeps per-group means and variances of the drawn utilities (Welford / Chan updates),
+            - Counts how many times each user has seen each item,
+            - Optionally keeps DesignDiagnostics of the assortments (co-occurrence, D-efficiency),
+            - Merges with accumulators of other blocks or processes.
+
+        Item view counts are kept for users user_offset to user_offset+num_users-1 only,
+        so the accumulator of a block is as small as the block. The accumulator of a whole run
+        holds num_users x num_items int32 counts, which is its main memory cost.
+    """
+    def __init__(self, num_groups, num_items, num_users, user_offset=0, diagnostics=False):
+        self.num_groups = num_groups
+        self.num_items = num_items
+        self.num_users = num_users
+        self.user_offset = user_offset
+
+        # Users per group, running mean and sum of squared deviations of utilities per group
+        self.group_counts = np.zeros(num_groups, dtype=np.int64)
+        self.group_means = np.zeros([num_groups, num_items])
+        self.group_m2 = np.zeros([num_groups, num_items])
+
+        # Item view counts per user
+        self.item_view_counts = np.zeros([num_users, num_items], dtype=np.int32)
+
+        # Design diagnostics of all trips
+        self.design_diagnostics = design_diagnostics.DesignDiagnostics(num_items) if diagnostics else None
+
+    def update_group(self, group, count, mean, m2):
+        """ Merges statistics of count utility vectors of a group into the running ones (Chan et al.) """
+        total = self.group_counts[group] + count
+        delta = mean - self.group_means[group]
+        self.group_m2[group] += m2 + delta**2 * (self.group_counts[group]*count/total)
+        self.group_means[group] += delta * (count/total)
+        self.group_counts[group] = total
+
+    def update(self, block):
+        """ Adds a block of users (ResultBuffer) """
+        for g in np.unique(block.user_group):
+            utilities = block.user_utilities[block.user_group == g]
+            mean = np.mean(utilities, axis=0)
+            self.update_group(g, utilities.shape[0], mean, np.sum((utilities - mean)**2, axis=0))
+
+        num_trips = block.trip.size // max(block.num_users, 1)
+        if block.assortment is not None:
+            views = np.sum(block.assortment.reshape(block.num_users, num_trips, self.num_items), axis=1,
+                           dtype=np.int32)
+            self.item_view_counts[block.user_id - self.user_offset] += views
+        else:
+            # Sparse shelves: add one view per (user, item on shelf)
+            users = np.repeat(block.user_id - self.user_offset, num_trips*block.shelf_items.shape[1])
+            np.add.at(self.item_view_counts, (users, block.shelf_items.ravel()), 1)
+
+        if self.design_diagnostics is not None:
+            self.design_diagnostics.update(block)
+
+    def merge(self, other):
+        """ Adds the statistics of another accumulator whose users lie within the users of this one """
+        for g in np.flatnonzero(other.group_counts):
+            self.update_group(g, other.group_counts[g], other.group_means[g], other.group_m2[g])
+        start = other.user_offset - self.user_offset
+        self.item_view_counts[start:start + other.num_users] += other.item_view_counts
+        if self.design_diagnostics is not None:
+            self.design_diagnostics.merge(other.design_diagnostics)
+
+    def get_group_variances(self):
+        """ Returns: Sample variances of utilities per group (NaN for groups with less than two users) """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.group_m2 / (self.group_counts[:, None] - 1)
+
+    def write_reports(self, output_dir, group_distributions, num_trips, shelf_size):
+        """ Writes drawn_users_summary.csv and item_balance_per_user.csv to output_dir,
+            and the design diagnostics reports if they are kept.
+        """
+        item_columns = ["item{0:03d}".format(i) for i in range(self.num_items)]
+
+        # Input user memberships and utilities
+        input_mean_util = np.array([group_distributions.get_group_mean(g)
+                                    for g in range(self.num_groups)], dtype=np.float64)
+        input_mean_util = input_mean_util - input_mean_util[:, self.num_items-1:]
+        input_mean_util = pd.DataFrame(data=input_mean_util, columns=["mean_input_util_" + c for c in item_columns])
+        input_memb_prob = pd.DataFrame(data=group_distributions.get_group_probabilities(),
+                                       columns=['input_memb_prob'])
+
+        # Drawn user membership probabilities and utilities (mean)
+        drawn_memb_prob = pd.DataFrame(data=self.group_counts/np.sum(self.group_counts), columns=['sim_memb_prob'])
+        drawn_mean_util = np.where(self.group_counts[:, None] > 0, self.group_means, np.nan)
+        drawn_mean_util = pd.DataFrame(data=drawn_mean_util, columns=["mean_sim_util_" + c for c in item_columns])
+
+        user_summary = pd.concat(objs=[input_memb_prob, drawn_memb_prob, input_mean_util, drawn_mean_util], axis=1)
+        user_summary.to_csv(os.path.join(output_dir, 'drawn_users_summary.csv'), index=False)
+
+        # Checking design balance per user
+        balance_per_user = pd.DataFrame(data=self.item_view_counts/(num_trips*shelf_size/self.num_items),
+                                        columns=item_columns)
+        balance_per_user.insert(0, 'user_id', np.arange(self.user_offset, self.user_offset + self.num_users))
+        balance_per_user.to_csv(os.path.join(output_dir, 'item_balance_per_user.csv'), index=False)
+
+        if self.design_diagnostics is not None:
+            self.design_diagnostics.write_reports(output_dir, num_trips, shelf_size, self.item_view_counts)
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+
+class ResultBuffer:
+    """ Preallocated typed columns holding simulation results.
+        The hot loops of the dataset builder write into plain NumPy arrays and the
+        user utilities and data set DataFrames are built once at the end.
+
+        If shelf_size is given, assortments are kept as item index arrays (rows x shelf_size)
+        in shelf_items instead of dense 0/1 flags, for catalogs much larger than the shelf.
+        If pantry is True, the quantity bought and the timestamp of each trip are kept as well.
+    """
+    def __init__(self, num_users, num_items, num_trips, shelf_size=None, pantry=False):
+        self.num_users = num_users
+        self.num_items = num_items
+        self.num_trips = num_trips
+        self.shelf_size = shelf_size
+        num_rows = num_users*num_trips
+
+        # User utilities columns
+        self.user_id = np.zeros(num_users, dtype=np.int32)
+        self.user_group = np.zeros(num_users, dtype=np.int32)
+        self.user_utilities = np.zeros([num_users, num_items], dtype=np.float64)
+
+        # Data set columns
+        self.trip_user_id = np.zeros(num_rows, dtype=np.int32)
+        self.trip = np.zeros(num_rows, dtype=np.int32)
+        self.choice = np.zeros(num_rows, dtype=np.int32)
+        if shelf_size is None:
+            self.assortment = np.zeros([num_rows, num_items], dtype=np.uint8)
+            self.shelf_items = None
+        else:
+            self.assortment = None
+            self.shelf_items = np.zeros([num_rows, shelf_size], dtype=np.int32)
+        self.quantity = np.zeros(num_rows, dtype=np.int32) if pantry else None
+        self.timestamp = np.zeros(num_rows, dtype=np.float64) if pantry else None
+
+        # Number of users already copied in by append
+        self.num_appended_users = 0
+
+    @classmethod
+    def from_columns(cls, user_id, user_group, user_utilities, trip_user_id, trip, choice, assortment,
+                     quantity=None, timestamp=None, shelf_items=None):
+        """ Wraps existing column arrays (e.g. memory-mapped ones) in a ResultBuffer without copying them.
+            Assortments are given either as dense flags (assortment) or as item indices (shelf_items).
+        """
+        buffer = cls(0, user_utilities.shape[1], trip.size // max(user_id.size, 1))
+        buffer.num_users = user_id.size
+        buffer.user_id, buffer.user_group, buffer.user_utilities = user_id, user_group, user_utilities
+        buffer.trip_user_id, buffer.trip, buffer.choice, buffer.assortment = trip_user_id, trip, choice, assortment
+        if shelf_items is not None:
+            buffer.shelf_size, buffer.shelf_items = shelf_items.shape[1], shelf_items
+        buffer.quantity, buffer.timestamp = quantity, timestamp
+        return buffer
+
+    @staticmethod
+    def get_item_columns(num_items):
+        return ['item{0:03d}'.format(i) for i in range(num_items)]
+
+    def set_users(self, user_index, user_id, user_group, user_utilities):
+        """ Writes one user (integer user_index) or a block of users (slice or index array) """
+        self.user_id[user_index] = user_id
+        self.user_group[user_index] = user_group
+        self.user_utilities[user_index] = user_utilities
+
+    def set_trips(self, row_index, user_id, trip, choice, trip_items):
+        """ Writes one trip (integer row_index) or a block of trips (slice or index array).
+            trip_items holds the index of items on shelf, one row per trip.
+        """
+        self.trip_user_id[row_index] = user_id
+        self.trip[row_index] = trip
+        self.choice[row_index] = choice
+        if self.shelf_items is not None:
+            self.shelf_items[row_index] = np.reshape(trip_items, self.shelf_items[row_index].shape)
+            return
+        if isinstance(row_index, slice):
+            rows = np.arange(*row_index.indices(self.trip.size))
+        else:
+            rows = np.atleast_1d(row_index)
+        self.assortment[np.reshape(rows, (-1, 1)), np.reshape(trip_items, (np.size(rows), -1))] = 1
+
+    def set_pantry(self, row_index, quantity, timestamp):
+        """ Writes the quantity bought and the timestamp of one trip or a block of trips """
+        self.quantity[row_index] = quantity
+        self.timestamp[row_index] = timestamp
+
+    def append(self, block):
+        """ Copies a block of users (another ResultBuffer) right after the previously appended ones """
+        user_index = slice(self.num_appended_users, self.num_appended_users + block.num_users)
+        row_index = slice(user_index.start*self.num_trips, user_index.stop*self.num_trips)
+        self.set_users(user_index, block.user_id, block.user_group, block.user_utilities)
+        self.trip_user_id[row_index] = block.trip_user_id
+        self.trip[row_index] = block.trip
+        self.choice[row_index] = block.choice
+        if self.shelf_items is not None:
+            self.shelf_items[row_index] = block.get_shelf_items()
+        else:
+            self.assortment[row_index] = block.get_assortment()
+        if self.quantity is not None:
+            self.set_pantry(row_index, block.quantity, block.timestamp)
+        self.num_appended_users = user_index.stop
+
+    def get_assortment(self):
+        """ Returns: Dense 0/1 assortment flags (rows x num_items), built from shelf_items if needed """
+        if self.assortment is not None:
+            return self.assortment
+        assortment = np.zeros([self.shelf_items.shape[0], self.num_items], dtype=np.uint8)
+        assortment[np.arange(self.shelf_items.shape[0])[:, None], self.shelf_items] = 1
+        return assortment
+
+    def get_shelf_items(self):
+        """ Returns: Sorted index of items on shelf (rows x shelf_size), built from dense flags if needed """
+        if self.shelf_items is not None:
+            return np.sort(self.shelf_items, axis=1)
+        return np.nonzero(self.assortment)[1].reshape(self.assortment.shape[0], -1)
+
+    def get_user_utilities(self):
+        """ Returns: user utilities DataFrame with user_id, user_group and one column per item """
+        true_user_utilities = pd.DataFrame(data=self.user_utilities, columns=self.get_item_columns(self.num_items))
+        true_user_utilities.insert(0, 'user_group', self.user_group)
+        true_user_utilities.insert(0, 'user_id', self.user_id)
+        return true_user_utilities
+
+    def get_data_set(self):
+        """ Returns: data set DataFrame with user_id, trip, choice, quantity and timestamp (pantry mode only)
+            and one 0/1 column per item
+        """
+        data_set = pd.DataFrame(data=self.get_assortment(), columns=self.get_item_columns(self.num_items))
+        if self.quantity is not None:
+            data_set.insert(0, 'timestamp', self.timestamp)
+            data_set.insert(0, 'quantity', self.quantity)
+        data_set.insert(0, 'choice', self.choice)
+        data_set.insert(0, 'trip', self.trip)
+        data_set.insert(0, 'user_id', self.trip_user_id)
+        return data_set
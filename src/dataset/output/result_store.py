@@ -0,0 +1,165 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from src.dataset.output import result_buffer
+
+
+class ResultStore:
+    """ Reads and writes simulation results in compact binary layouts.
+        Results are stored in a directory of .npy column files described by a sidecar schema.json,
+        so they can be memory-mapped back instead of parsed, whole (load_arrays) or one block of users
+        at a time (iter_blocks). Assortments can be stored as:
+            - npy:          Dense 0/1 flags (rows x num_items, uint8)
+            - index:        Index of items on shelf (rows x shelf_size)
+            - bitpacked:    Dense flags packed 8 items per byte (rows x ceil(num_items/8), uint8)
+        Files are preallocated by create, so blocks of users can be written in any order,
+        possibly by different processes.
+    """
+    FORMATS = ('npy', 'index', 'bitpacked')
+    DATA_DIR = 'simulated_data'
+    SCHEMA_FILE = 'schema.json'
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.data_dir = os.path.join(output_dir, ResultStore.DATA_DIR)
+        self.schema = None
+        schema_file = os.path.join(self.data_dir, ResultStore.SCHEMA_FILE)
+        if os.path.exists(schema_file):
+            with open(schema_file) as f:
+                self.schema = json.load(f)
+
+    @staticmethod
+    def get_columns(output_format, num_users, num_items, num_trips, shelf_size, pantry=False):
+        """ Returns: A dictionary with column names as keys and [dtype, shape] as values """
+        num_rows = num_users*num_trips
+        if output_format == 'index':
+            index_dtype = 'int16' if num_items <= np.iinfo(np.int16).max else 'int32'
+            assortment = ['assortment_index', index_dtype, [num_rows, shelf_size]]
+        elif output_format == 'bitpacked':
+            assortment = ['assortment_bits', 'uint8', [num_rows, (num_items + 7) // 8]]
+        else:
+            assortment = ['assortment', 'uint8', [num_rows, num_items]]
+        columns = {'user_id': ['int32', [num_users]],
+                   'user_group': ['int32', [num_users]],
+                   'user_utilities': ['float64', [num_users, num_items]],
+                   'trip_user_id': ['int32', [num_rows]],
+                   'trip': ['int32', [num_rows]],
+                   'choice': ['int32', [num_rows]],
+                   assortment[0]: assortment[1:]}
+        if pantry:
+            columns['quantity'] = ['int32', [num_rows]]
+            columns['timestamp'] = ['float64', [num_rows]]
+        return columns
+
+    def create(self, output_format, num_users, num_items, num_trips, shelf_size, pantry=False):
+        """ Writes the schema and preallocates the column files """
+        if output_format not in ResultStore.FORMATS:
+            raise ValueError('Unknown output format: {0}. Expected one of {1}.'.format(output_format,
+                                                                                      ResultStore.FORMATS))
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        self.schema = {'format': output_format,
+                       'num_users': num_users,
+                       'num_items': num_items,
+                       'num_trips': num_trips,
+                       'shelf_size': shelf_size,
+                       'columns': self.get_columns(output_format, num_users, num_items, num_trips, shelf_size,
+                                                   pantry)}
+        for name, (dtype, shape) in self.schema['columns'].items():
+            np.lib.format.open_memmap(self.get_column_file(name), mode='w+', dtype=dtype, shape=tuple(shape))
+        with open(os.path.join(self.data_dir, ResultStore.SCHEMA_FILE), 'w') as f:
+            json.dump(self.schema, f, indent=2)
+
+    def get_column_file(self, name):
+        return os.path.join(self.data_dir, name + '.npy')
+
+    def write_block(self, block, start):
+        """ Writes a block of users (ResultBuffer) whose first user is at index start """
+        num_trips = self.schema['num_trips']
+        values = {'user_id': block.user_id,
+                  'user_group': block.user_group,
+                  'user_utilities': block.user_utilities,
+                  'trip_user_id': block.trip_user_id,
+                  'trip': block.trip,
+                  'choice': block.choice}
+        if 'quantity' in self.schema['columns']:
+            values['quantity'] = block.quantity
+            values['timestamp'] = block.timestamp
+        if self.schema['format'] == 'index':
+            values['assortment_index'] = block.get_shelf_items()
+        elif self.schema['format'] == 'bitpacked':
+            values['assortment_bits'] = np.packbits(block.get_assortment(), axis=1)
+        else:
+            values['assortment'] = block.get_assortment()
+
+        for name, value in values.items():
+            column = np.load(self.get_column_file(name), mmap_mode='r+')
+            offset = start if column.shape[0] == self.schema['num_users'] else start*num_trips
+            column[offset:offset + value.shape[0]] = value
+            column.flush()
+            del column
+
+    def load_arrays(self, mmap_mode='r'):
+        """ Returns: A dictionary of memory-mapped column arrays as described by the schema """
+        if self.schema is None:
+            raise ValueError('No binary results found in {0}.'.format(self.output_dir))
+        return {name: np.load(self.get_column_file(name), mmap_mode=mmap_mode) for name in self.schema['columns']}
+
+    def iter_blocks(self, chunk_size, mmap_mode='r'):
+        """ Reads the results one block of chunk_size users at a time. Only the block being used is read
+            from the memory-mapped files: index assortments stay item indices and bitpacked ones are
+            unpacked block by block.
+
+            Yields:
+                block:  A ResultBuffer holding the utilities and trips of the users of the block
+        """
+        if chunk_size < 1:
+            raise ValueError('The chunk size should be a positive number of users.')
+        arrays = self.load_arrays(mmap_mode)
+        num_users, num_trips, num_items = self.schema['num_users'], self.schema['num_trips'], self.schema['num_items']
+        for start in range(0, num_users, chunk_size):
+            users = slice(start, min(start + chunk_size, num_users))
+            rows = slice(users.start*num_trips, users.stop*num_trips)
+            assortment, shelf_items = None, None
+            if self.schema['format'] == 'index':
+                shelf_items = arrays['assortment_index'][rows]
+            elif self.schema['format'] == 'bitpacked':
+                assortment = np.unpackbits(arrays['assortment_bits'][rows], axis=1, count=num_items)
+            else:
+                assortment = arrays['assortment'][rows]
+            yield result_buffer.ResultBuffer.from_columns(
+                arrays['user_id'][users], arrays['user_group'][users], arrays['user_utilities'][users],
+                arrays['trip_user_id'][rows], arrays['trip'][rows], arrays['choice'][rows], assortment,
+                arrays['quantity'][rows] if 'quantity' in arrays else None,
+                arrays['timestamp'][rows] if 'timestamp' in arrays else None, shelf_items=shelf_items)
+
+    def load(self, mmap_mode='r'):
+        """ Loads results in the shape DatasetBuilder.get_results returns them.
+            Falls back to the csv files when no binary results are found.
+            The DataFrames are built in memory, with index and bitpacked assortments expanded to dense
+            rows x num_items flags, so nothing stays memory-mapped. Use iter_blocks for large results.
+
+            Returns:
+                true_user_utilities:    User utilities DataFrame
+                data_set:               Data set DataFrame with dense 0/1 assortment columns
+        """
+        if self.schema is None:
+            return (pd.read_csv(os.path.join(self.output_dir, 'true_user_utilities.csv')),
+                    pd.read_csv(os.path.join(self.output_dir, 'simulated_data.csv')))
+
+        arrays = self.load_arrays(mmap_mode)
+        num_items = self.schema['num_items']
+        if self.schema['format'] == 'index':
+            index = arrays['assortment_index']
+            assortment = np.zeros([index.shape[0], num_items], dtype=np.uint8)
+            assortment[np.arange(index.shape[0])[:, None], index] = 1
+        elif self.schema['format'] == 'bitpacked':
+            assortment = np.unpackbits(arrays['assortment_bits'], axis=1, count=num_items)
+        else:
+            assortment = arrays['assortment']
+        buffer = result_buffer.ResultBuffer.from_columns(arrays['user_id'], arrays['user_group'],
+                                                         arrays['user_utilities'], arrays['trip_user_id'],
+                                                         arrays['trip'], arrays['choice'], assortment,
+                                                         arrays.get('quantity'), arrays.get('timestamp'))
+        return buffer.get_user_utilities(), buffer.get_data_set()
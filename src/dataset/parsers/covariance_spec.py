@@ -0,0 +1,196 @@
+import abc
+import numpy as np
+
+
+class CovarianceSpec(abc.ABC):
+    """ Base class of group covariance specifications.
+        A spec is validated once when parsed and keeps a precomputed factor, so that samplers can
+        turn standard normal draws into correlated ones with transform.
+
+        Subclasses define:
+            KIND:           Name of the spec as stored in the distribution cache
+            num_normals:    Number of standard normal draws transform needs per user
+        and implement every abstract method, as the distribution parser and its cache use all of them.
+    """
+    KIND = None
+
+    def __init__(self, num_items):
+        self.num_items = num_items
+        self.num_normals = num_items
+        self.dense = None
+
+    @abc.abstractmethod
+    def transform(self, z):
+        """ Maps standard normal draws (size = num_users x num_normals) to zero mean Gaussian draws
+            with this covariance (size = num_users x num_items).
+        """
+
+    @abc.abstractmethod
+    def build_dense(self):
+        """ Returns: The dense num_items x num_items covariance matrix """
+
+    def to_dense(self):
+        """ Returns: The dense num_items x num_items covariance matrix, built once on first use """
+        if self.dense is None:
+            self.dense = self.build_dense()
+        return self.dense
+
+    @abc.abstractmethod
+    def get_arrays(self):
+        """ Returns: A dictionary of the arrays needed to rebuild the spec without validation """
+
+    @abc.abstractmethod
+    def set_arrays(self, arrays):
+        """ Restores the spec from the arrays returned by get_arrays (the spec is created without __init__) """
+
+    @staticmethod
+    def from_arrays(kind, arrays):
+        """ Rebuilds a spec of the given kind from the arrays returned by get_arrays """
+        for spec_class in (DenseCovariance, DiagonalCovariance, LowRankCovariance, BlockDiagonalCovariance):
+            if spec_class.KIND == kind:
+                spec = spec_class.__new__(spec_class)
+                spec.set_arrays(arrays)
+                return spec
+        raise ValueError('Unknown covariance spec: {0}'.format(kind))
+
+    @staticmethod
+    def check_cholesky(cov):
+        """ Returns: True if cov is symmetric positive definite """
+        if not np.allclose(cov, cov.T):
+            return False
+        try:
+            np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            return False
+        return True
+
+
+class DenseCovariance(CovarianceSpec):
+    """ Dense covariance matrix.
+        The factor is the one numpy's multivariate_normal builds from the SVD of cov, so sampling
+        through transform gives the same draws as multivariate_normal for the same normals.
+    """
+    KIND = 'dense'
+
+    def __init__(self, cov):
+        super().__init__(cov.shape[0])
+        if not self.check_cholesky(cov):
+            raise ValueError('Covariance is not positive definite.')
+        self.dense = cov
+        (u, s, v) = np.linalg.svd(cov)
+        self.factor = np.sqrt(s)[:, None] * v
+
+    def transform(self, z):
+        return np.dot(z, self.factor)
+
+    def build_dense(self):
+        return np.dot(self.factor.T, self.factor)
+
+    def get_arrays(self):
+        return {'cov': self.dense, 'factor': self.factor}
+
+    def set_arrays(self, arrays):
+        self.dense, self.factor = arrays['cov'], arrays['factor']
+        self.num_items = self.num_normals = self.factor.shape[0]
+
+
+class DiagonalCovariance(CovarianceSpec):
+    """ Independent item utilities: cov = diag(variance) """
+    KIND = 'diagonal'
+
+    def __init__(self, variance):
+        super().__init__(variance.size)
+        if not np.all(variance > 0):
+            raise ValueError('Covariance is not positive definite.')
+        self.std = np.sqrt(variance)
+
+    def transform(self, z):
+        return z * self.std
+
+    def build_dense(self):
+        return np.diag(self.std**2)
+
+    def get_arrays(self):
+        return {'std': self.std}
+
+    def set_arrays(self, arrays):
+        self.dense = None
+        self.std = arrays['std']
+        self.num_items = self.num_normals = self.std.size
+
+
+class LowRankCovariance(CovarianceSpec):
+    """ Low rank plus diagonal covariance: cov = F F' + diag(variance), F of size num_items x rank.
+        Positive variances make it positive definite. Sampling needs rank + num_items normals per user
+        and O(num_items x rank) operations instead of O(num_items^2).
+    """
+    KIND = 'low_rank'
+
+    def __init__(self, factor, variance):
+        super().__init__(variance.size)
+        if factor.shape[0] != variance.size:
+            raise ValueError('Dimension mismatch between covariance factors and variances.')
+        if not (np.all(variance > 0) and np.all(np.isfinite(factor))):
+            raise ValueError('Covariance is not positive definite.')
+        self.factor = factor
+        self.std = np.sqrt(variance)
+        self.num_normals = factor.shape[1] + self.num_items
+
+    def transform(self, z):
+        rank = self.factor.shape[1]
+        return np.dot(z[:, :rank], self.factor.T) + z[:, rank:] * self.std
+
+    def build_dense(self):
+        return np.dot(self.factor, self.factor.T) + np.diag(self.std**2)
+
+    def get_arrays(self):
+        return {'factor': self.factor, 'std': self.std}
+
+    def set_arrays(self, arrays):
+        self.dense = None
+        self.factor, self.std = arrays['factor'], arrays['std']
+        self.num_items = self.std.size
+        self.num_normals = self.factor.shape[1] + self.num_items
+
+
+class BlockDiagonalCovariance(CovarianceSpec):
+    """ Block diagonal covariance. Items of a block are correlated, items of different blocks are not.
+        Each block is validated and factorized (Cholesky) on its own.
+    """
+    KIND = 'block_diagonal'
+
+    def __init__(self, blocks, block_covs):
+        """ blocks: Block label of each item. block_covs: Covariance of each block, in np.unique(blocks) order """
+        super().__init__(blocks.size)
+        self.block_items = [np.flatnonzero(blocks == b) for b in np.unique(blocks)]
+        self.block_factors = []
+        for items, cov in zip(self.block_items, block_covs):
+            if cov.shape != (items.size, items.size) or not self.check_cholesky(cov):
+                raise ValueError('Covariance is not positive definite.')
+            self.block_factors.append(np.linalg.cholesky(cov).T)
+
+    def transform(self, z):
+        x = np.empty([z.shape[0], self.num_items])
+        for items, factor in zip(self.block_items, self.block_factors):
+            x[:, items] = np.dot(z[:, items], factor)
+        return x
+
+    def build_dense(self):
+        cov = np.zeros([self.num_items, self.num_items])
+        for items, factor in zip(self.block_items, self.block_factors):
+            cov[np.ix_(items, items)] = np.dot(factor.T, factor)
+        return cov
+
+    def get_arrays(self):
+        arrays = {'num_blocks': np.array(len(self.block_items))}
+        for ib, (items, factor) in enumerate(zip(self.block_items, self.block_factors)):
+            arrays['items{0:d}'.format(ib)] = items
+            arrays['factor{0:d}'.format(ib)] = factor
+        return arrays
+
+    def set_arrays(self, arrays):
+        self.dense = None
+        num_blocks = int(arrays['num_blocks'])
+        self.block_items = [arrays['items{0:d}'.format(ib)] for ib in range(num_blocks)]
+        self.block_factors = [arrays['factor{0:d}'.format(ib)] for ib in range(num_blocks)]
+        self.num_items = self.num_normals = sum(items.size for items in self.block_items)
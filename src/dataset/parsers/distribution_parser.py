@@ -1,15 +1,41 @@
+import os
+import hashlib
+import tempfile
 import pandas as pd
 import numpy as np
+from src.dataset.parsers import covariance_spec
 
 
 class DistributionParser:
     """ Reads the content of distribution files.
         Checks for common errors and catches cases which may cause numerical error.
+
+        Group covariances can be given in the distribution file as:
+            - dense:            group, mean, cov01, ..., covNN (one covariance row per item)
+            - diagonal:         group, mean, variance
+            - low rank:         group, mean, variance, factor1, ..., factorK (cov = F F' + diag(variance))
+            - block diagonal:   group, mean, block, cov01, ..., covBB (covariance row of the item within
+                                its block, blocks of less than BB items leave trailing cells empty)
+
+        If cache_dir is given, parsed and validated distributions (including covariance factors) are
+        stored there in binary form, keyed by a hash of the input files, and reused by later runs.
     """
-    def __init__(self, group_distributions_file, group_probabilities_file, num_items, num_groups):
+    CACHE_VERSION = 1
+
+    def __init__(self, group_distributions_file, group_probabilities_file, num_items, num_groups, cache_dir=None):
+        self.num_groups = num_groups
+        self.num_items = num_items
+        self.group_distributions = None
+        self.cache_file = None
+        if cache_dir is not None:
+            self.cache_file = self.get_cache_file(cache_dir, group_distributions_file, group_probabilities_file,
+                                                  num_items, num_groups)
+            if os.path.exists(self.cache_file):
+                self.load_cache(self.cache_file)
+                return
+
         self.group_distributions = pd.read_csv(group_distributions_file)
         self.group_probabilities = pd.read_csv(group_probabilities_file)
-        self.num_groups = num_groups
         if self.group_distributions.shape[0] != num_items*num_groups:
             raise ValueError('The group distribution file content is not aligned with num_items provided.')
 
@@ -24,6 +50,9 @@ class DistributionParser:
         self.group_probabilities = self.group_probabilities['probability'].values
         self.canonical_user_distributions = self.parse_group_distributions(num_items, num_groups)
 
+        if self.cache_file is not None:
+            self.save_cache(self.cache_file)
+
     def parse_group_distributions(self, num_items, num_groups):
         """ Parses Gaussian distributions to makes sure
             - Dimensions match other commandline specs
@@ -33,26 +62,95 @@ class DistributionParser:
                 canonical_user_distributions:   A dictionary with keys as group numbers.
                                                 Values a list of two entities:
                                                     (a) Gaussian mean vector
-                                                    (b) Gaussian covariance matrix
+                                                    (b) Gaussian covariance spec (CovarianceSpec)
         """
+        columns = list(self.group_distributions.columns)
+        factor_columns = [c for c in columns if c.startswith('factor')]
+        cov_columns = [c for c in columns if c.startswith('cov')]
         canonical_user_distributions = dict()
         for g in range(num_groups):
             idx = (self.group_distributions['group'] == (g+1)).values
             mu = self.group_distributions['mean'][idx].values
             if mu.size != num_items:
                 raise ValueError('Dimension mismatch: Group mean of Gaussian for group {0:d}'.format(g))
-            cov = self.group_distributions.iloc[:, 2:].loc[idx].values
-            if cov.shape[0] != cov.shape[1]:
-                raise ValueError('Dimension mismatch: Group cov of Gaussian for group {0:d}'.format(g))
-            if not np.all(np.linalg.eigvals(cov) > 0):
+            rows = self.group_distributions.loc[idx]
+            dense_cov = None
+            if not ('block' in columns or 'variance' in columns):
+                dense_cov = self.group_distributions.iloc[:, 2:].loc[idx].values
+                if dense_cov.shape[0] != dense_cov.shape[1]:
+                    raise ValueError('Dimension mismatch: Group cov of Gaussian for group {0:d}'.format(g))
+            try:
+                if dense_cov is not None:
+                    cov = covariance_spec.DenseCovariance(dense_cov)
+                elif 'block' in columns:
+                    blocks = rows['block'].values
+                    block_covs = []
+                    for b in np.unique(blocks):
+                        block_rows = rows[cov_columns].values[blocks == b]
+                        block_covs.append(block_rows[:, :block_rows.shape[0]].astype(np.float64))
+                    cov = covariance_spec.BlockDiagonalCovariance(blocks, block_covs)
+                elif factor_columns:
+                    cov = covariance_spec.LowRankCovariance(rows[factor_columns].values.astype(np.float64),
+                                                            rows['variance'].values.astype(np.float64))
+                else:
+                    cov = covariance_spec.DiagonalCovariance(rows['variance'].values.astype(np.float64))
+            except ValueError:
                 raise ValueError('Group cov of Gaussian for group {0:d} is not positive definite.'.format(g))
             canonical_user_distributions[g] = [mu, cov]
         return canonical_user_distributions
 
+    @staticmethod
+    def get_cache_file(cache_dir, group_distributions_file, group_probabilities_file, num_items, num_groups):
+        """ Returns: Path of the cache file of the given inputs. The name is a hash of their contents. """
+        file_hash = hashlib.sha256()
+        for file_name in (group_distributions_file, group_probabilities_file):
+            with open(file_name, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    file_hash.update(chunk)
+            file_hash.update(b'\0')
+        file_hash.update('{0:d}/{1:d}/{2:d}'.format(DistributionParser.CACHE_VERSION, num_items,
+                                                    num_groups).encode())
+        return os.path.join(cache_dir, 'distributions_{0}.npz'.format(file_hash.hexdigest()[:32]))
+
+    def save_cache(self, cache_file):
+        """ Writes group probabilities, means and covariance specs to a .npz file (atomically) """
+        arrays = {'group_probabilities': self.group_probabilities}
+        for g, (mu, cov) in self.canonical_user_distributions.items():
+            arrays['mean{0:d}'.format(g)] = mu
+            arrays['kind{0:d}'.format(g)] = np.array(cov.KIND)
+            for name, value in cov.get_arrays().items():
+                arrays['cov{0:d}_{1}'.format(g, name)] = value
+
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_file, cache_file)
+
+    def load_cache(self, cache_file):
+        """ Restores group probabilities, means and covariance specs written by save_cache """
+        with np.load(cache_file) as arrays:
+            self.group_probabilities = arrays['group_probabilities']
+            self.canonical_user_distributions = dict()
+            for g in range(self.num_groups):
+                prefix = 'cov{0:d}_'.format(g)
+                cov_arrays = {name[len(prefix):]: arrays[name] for name in arrays.files if name.startswith(prefix)}
+                cov = covariance_spec.CovarianceSpec.from_arrays(str(arrays['kind{0:d}'.format(g)]), cov_arrays)
+                self.canonical_user_distributions[g] = [arrays['mean{0:d}'.format(g)], cov]
+
     def get_group_probabilities(self):
         return self.group_probabilities
 
     def get_group_distribution(self, group_index):
-        """ Returns mean and cov for specified group """
-        return self.canonical_user_distributions[group_index]
+        """ Returns mean and dense cov for specified group """
+        mu, cov = self.canonical_user_distributions[group_index]
+        return [mu, cov.to_dense()]
+
+    def get_group_mean(self, group_index):
+        return self.canonical_user_distributions[group_index][0]
 
+    def get_group_covariance(self, group_index):
+        """ Returns the covariance spec (CovarianceSpec) of specified group, with its precomputed factor """
+        return self.canonical_user_distributions[group_index][1]
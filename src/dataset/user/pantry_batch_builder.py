@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class PantryBatchBuilder:
+    """ Simulates the pantry of a batch of users across their shopping trips.
+        Capabilities:
+            - Draws a consumption rate (units per day), a reorder level and a target level (units) per user,
+            - Restocks at each trip: the quantity bought is the shortfall of the pantry below the target level,
+              rounded up to whole units,
+            - Times trips: a user shops again when the pantry falls to the reorder level, after a random delay.
+
+        Pantries are depleted during the shopping delay, and may run out, so users who wait longer buy more.
+        Target levels are set so that quantities average about purchase_quantity when pantries rarely run out.
+
+        All users advance one trip at a time as arrays, so the cost per trip does not depend on Python loops
+        over users. Timestamps are in days since the start of the simulation. Rates, levels and shopping
+        delays are drawn from the random_state of the block, like its utilities and shelves.
+    """
+    # Shape of the Gamma distribution of consumption rates across users (heterogeneity)
+    RATE_SHAPE = 4.0
+    # Mean delay in days between reaching the reorder level and shopping
+    MEAN_SHOPPING_DELAY = 1.0
+
+    def __init__(self, num_users, num_trips, consumption_rate=1.0, purchase_quantity=3.0, random_state=None):
+        if consumption_rate <= 0:
+            raise ValueError('The consumption rate should be a positive number of units per day.')
+        if purchase_quantity < 1:
+            raise ValueError('The mean purchase quantity should be at least one unit.')
+        self.random_state = np.random if random_state is None else random_state
+        self.num_users = num_users
+        self.num_trips = num_trips
+        self.purchase_quantity = purchase_quantity
+
+        # User consumption rates, reorder levels, and time of first trip
+        self.consumption_rates = self.random_state.gamma(PantryBatchBuilder.RATE_SHAPE,
+                                                         consumption_rate/PantryBatchBuilder.RATE_SHAPE,
+                                                         size=num_users)
+        self.reorder_levels = self.random_state.uniform(0.0, purchase_quantity - 1, size=num_users)
+        self.first_trip_times = self.random_state.uniform(0.0, purchase_quantity/consumption_rate,
+                                                          size=num_users)
+
+        # A restock covers the target level minus the reorder level, the consumption of the mean shopping delay
+        # and half a unit of rounding on average
+        restock_sizes = np.maximum(purchase_quantity - 0.5
+                                   - self.consumption_rates*PantryBatchBuilder.MEAN_SHOPPING_DELAY, 0.5)
+        self.target_levels = self.reorder_levels + restock_sizes
+        self.initial_levels = self.random_state.uniform(0.0, self.reorder_levels)
+
+    def simulate_trips(self):
+        """ Advances the pantries of all users through their trips.
+
+            Returns: A list containing arrays (size = num_users*num_trips, ordered by user and then trip)
+                quantity:   Units bought at each trip, restocking up to the target level (at least 1)
+                timestamp:  Time of each trip in days
+        """
+        quantity = np.zeros([self.num_users, self.num_trips], dtype=np.int32)
+        timestamp = np.zeros([self.num_users, self.num_trips])
+        pantry = self.initial_levels.copy()
+        time = self.first_trip_times.copy()
+        for it in range(self.num_trips):
+            timestamp[:, it] = time
+            quantity[:, it] = np.maximum(np.ceil(self.target_levels - pantry), 1)
+            pantry += quantity[:, it]
+
+            # Consume down to the reorder level, then shop after a random delay
+            wait = (np.maximum(pantry - self.reorder_levels, 0.0)/self.consumption_rates
+                    + self.random_state.exponential(PantryBatchBuilder.MEAN_SHOPPING_DELAY, size=self.num_users))
+            pantry = np.maximum(pantry - self.consumption_rates*wait, 0.0)
+            time += wait
+        return [quantity.ravel(), timestamp.ravel()]
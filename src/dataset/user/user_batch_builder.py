@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class UserBatchBuilder:
+    """ Generates a batch of users given their canonical groups
+        Capabilities:
+            - Draws utilities of all members of a group as one matrix,
+            - Turns utilities into a choice probability matrix (one row per user)
+
+        Utilities are drawn the same way UserBuilder draws them, with the same kind of random_state,
+        using the covariance factor precomputed once per group by the distribution parser.
+    """
+    def __init__(self, group_distributions, user_ids, user_groups, random_state=None):
+        self.random_state = np.random if random_state is None else random_state
+        self.group_distributions = group_distributions
+        self.user_ids = np.asarray(user_ids)
+        self.user_groups = np.asarray(user_groups)
+
+        # Draw utilities
+        self.user_utilities = self.draw_user_utilities()
+
+        # Turn utilities to item probabilities
+        self.user_item_probabilities = np.exp(self.user_utilities)
+        self.user_item_probabilities /= np.sum(self.user_item_probabilities, axis=1, keepdims=True)
+
+    def draw_user_utilities(self):
+        """ Draws utilities of each group's members from the associated canonical Gaussian
+            Returns:
+                user_utilities: A matrix of size = num_users x num_items.
+
+            Note:
+                Since, the model is logit only difference of utilities matter.
+                Hence, we subtract the last utility from all row entries.
+        """
+        num_items = self.group_distributions.get_group_mean(0).size
+        user_utilities = np.zeros([self.user_ids.size, num_items])
+        for g in np.unique(self.user_groups):
+            members = (self.user_groups == g)
+            group_mean = self.group_distributions.get_group_mean(g)
+            group_cov = self.group_distributions.get_group_covariance(g)
+            z = self.random_state.standard_normal(size=[np.count_nonzero(members), group_cov.num_normals])
+            user_utilities[members] = group_cov.transform(z) + group_mean
+        user_utilities -= user_utilities[:, num_items-1:]
+        return user_utilities
+
+    def choose_from_items(self, trip_items):
+        """ Simulates a simple multinomial process of size 1 for every trip of every user in one pass.
+            The shelf probabilities of each row are accumulated and a single uniform draw per row
+            is located in the cumulative sums, which is how np.random.choice picks an item.
+
+            Args:
+                trip_items: Index of items on shelf (size = rows x shelf_size). Rows are ordered by
+                            user and then trip, all users having the same number of trips.
+
+            Returns: A list containing integer arrays (size = rows)
+                user_id:    User id of each row
+                trip:       Trip of each row which ranges from 1 to num_trips
+                choice:     Single choice made at each trip
+        """
+        num_rows, shelf_size = trip_items.shape
+        num_trips = num_rows // self.user_ids.size
+        user_index = np.repeat(np.arange(self.user_ids.size), num_trips)
+
+        cdf = np.cumsum(self.user_item_probabilities[user_index[:, None], trip_items], axis=1)
+        u = self.random_state.uniform(size=num_rows) * cdf[:, shelf_size-1]
+        position = np.minimum(np.sum(cdf <= u[:, None], axis=1), shelf_size-1)
+        choice = trip_items[np.arange(num_rows), position]
+
+        trip = np.tile(np.arange(1, num_trips+1), self.user_ids.size)
+        return [self.user_ids[user_index], trip, choice]
+
+    def get_utilities(self):
+        return self.user_utilities
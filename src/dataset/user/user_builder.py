@@ -1,4 +1,5 @@
 import numpy as np
+from src.dataset.parsers import covariance_spec
 
 
 class UserBuilder:
@@ -7,8 +8,15 @@ class UserBuilder:
             - Draws utilities,
             - Turns utilities into choice probabilities
             - Makes selection given choice probabilities and shelf assortment (trip items)
+
+        Utilities and choices are drawn with random_state, which may be a np.random.Generator,
+        a RandomState, or None for the global numpy random state seeded by the caller.
+
+        The group covariance is either a dense matrix or a CovarianceSpec whose precomputed
+        factor is reused instead of factorizing the covariance for every user.
     """
-    def __init__(self, group_distribution, user_id, user_group):
+    def __init__(self, group_distribution, user_id, user_group, random_state=None):
+        self.random_state = np.random if random_state is None else random_state
         self.group_mean, self.group_cov = group_distribution[0], group_distribution[1]
         self.user_id = user_id
         self.trip = 0
@@ -30,7 +38,12 @@ class UserBuilder:
                 Since, the model is logit only difference of utilities matter.
                 Hence, we subtract the last utility from all vector entries.
         """
-        user_utilities = np.random.multivariate_normal(mean=self.group_mean, cov=self.group_cov, size=1).ravel()
+        if isinstance(self.group_cov, covariance_spec.CovarianceSpec):
+            z = self.random_state.standard_normal(size=[1, self.group_cov.num_normals])
+            user_utilities = (self.group_cov.transform(z) + self.group_mean).ravel()
+        else:
+            user_utilities = self.random_state.multivariate_normal(mean=self.group_mean, cov=self.group_cov,
+                                                                   size=1).ravel()
         user_utilities = user_utilities-user_utilities[user_utilities.size-1]
         return user_utilities
 
@@ -43,9 +56,9 @@ class UserBuilder:
                 choice:     Single choice made at this trip
         """
         p = self.user_item_probabilities[trip_items]/np.sum(self.user_item_probabilities[trip_items])
-        choice = np.random.choice(a=trip_items, size=1, replace=False, p=p)
+        choice = self.random_state.choice(a=trip_items, size=1, replace=False, p=p)
         self.trip = self.trip+1
-        return [self.user_id, self.trip, choice]
+        return [self.user_id, self.trip, choice[0]]
 
     def get_utilities(self):
         return self.user_utilities
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class MNLEstimator:
+    """ Maximum likelihood estimator of multinomial logit item utilities from shelf choices.
+        Capabilities:
+            - Evaluates log-likelihoods, gradients and Hessians of all rows at once from the shelf index matrix,
+              accumulating them per shelf so that no rows x num_items array is formed,
+            - Fits independent utility vectors for several segments (e.g. user groups) in one batched Newton loop,
+            - Fits a pooled model as a single segment.
+
+        As in UserBuilder, only utility differences are identified and the utility of the last item is fixed to 0.
+        A small ridge penalty keeps Newton steps defined when a segment has few observations.
+    """
+    def __init__(self, num_items, ridge=1e-6, max_iterations=100, tolerance=1e-8):
+        self.num_items = num_items
+        self.ridge = ridge
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    def get_shelf_probabilities(self, utilities, shelf_items, segments):
+        """ Returns: Logit probabilities of the items on each shelf (size = rows x shelf_size) """
+        shelf_utilities = utilities[segments[:, None], shelf_items]
+        shelf_utilities = shelf_utilities - np.max(shelf_utilities, axis=1, keepdims=True)
+        probabilities = np.exp(shelf_utilities)
+        probabilities /= np.sum(probabilities, axis=1, keepdims=True)
+        return probabilities
+
+    def log_likelihood(self, utilities, shelf_items, choice_position, segments, num_segments):
+        """ Returns: Penalized log-likelihood of each segment (size = num_segments) """
+        shelf_utilities = utilities[segments[:, None], shelf_items]
+        top = np.max(shelf_utilities, axis=1)
+        log_sums = top + np.log(np.sum(np.exp(shelf_utilities - top[:, None]), axis=1))
+        chosen = shelf_utilities[np.arange(shelf_items.shape[0]), choice_position]
+        return (np.bincount(segments, weights=chosen - log_sums, minlength=num_segments)
+                - 0.5*self.ridge*np.sum(utilities**2, axis=1))
+
+    def gradient_and_hessian(self, utilities, shelf_items, choice_position, segments, num_segments):
+        """ Returns:
+                gradient:   Gradient of the penalized log-likelihood of each segment (size = num_segments x num_items)
+                hessian:    Hessian of each segment (size = num_segments x num_items x num_items)
+        """
+        num_rows = shelf_items.shape[0]
+        probabilities = self.get_shelf_probabilities(utilities, shelf_items, segments)
+        cell = segments[:, None]*self.num_items + shelf_items
+        size = num_segments*self.num_items
+        chosen = cell[np.arange(num_rows), choice_position]
+        expected = np.bincount(cell.ravel(), weights=probabilities.ravel(), minlength=size)
+        gradient = np.bincount(chosen, minlength=size) - expected
+        gradient = gradient.reshape(num_segments, self.num_items) - self.ridge*utilities
+
+        # Sum over rows of p p' - diag(p), added shelf by shelf into the (segment, item, item) cells
+        pair_cell = cell[:, :, None]*self.num_items + shelf_items[:, None, :]
+        pair_weights = probabilities[:, :, None]*probabilities[:, None, :]
+        hessian = np.bincount(pair_cell.ravel(), weights=pair_weights.ravel(), minlength=size*self.num_items)
+        hessian = hessian.reshape(num_segments, self.num_items, self.num_items)
+        hessian -= expected.reshape(num_segments, self.num_items)[:, :, None]*np.eye(self.num_items)
+        hessian -= self.ridge*np.eye(self.num_items)
+        return gradient, hessian
+
+    def fit(self, shelf_items, choice, segments=None, num_segments=1):
+        """ Fits the utilities of every segment by Newton's method with step halving.
+            If a step does not improve a segment after 30 halvings, that segment keeps its previous
+            utilities and the fit stops.
+
+            Args:
+                shelf_items:    Index of items on shelf (size = rows x shelf_size)
+                choice:         Item chosen at each row (size = rows)
+                segments:       Segment of each row, from 0 to num_segments-1 (None for a pooled fit)
+
+            Returns:
+                utilities:  Estimated utilities, last item fixed to 0 (size = num_segments x num_items).
+                            Segments without rows are NaN.
+        """
+        shelf_items = np.asarray(shelf_items, dtype=np.int64)
+        segments = (np.zeros(shelf_items.shape[0], dtype=np.int64) if segments is None
+                    else np.asarray(segments, dtype=np.int64))
+        choice_position = np.argmax(shelf_items == np.asarray(choice)[:, None], axis=1)
+        free = self.num_items - 1
+
+        utilities = np.zeros([num_segments, self.num_items])
+        log_likelihood = self.log_likelihood(utilities, shelf_items, choice_position, segments, num_segments)
+        for _ in range(self.max_iterations):
+            gradient, hessian = self.gradient_and_hessian(utilities, shelf_items, choice_position, segments,
+                                                          num_segments)
+            step = np.zeros_like(utilities)
+            step[:, :free] = -np.linalg.solve(hessian[:, :free, :free], gradient[:, :free, None])[:, :, 0]
+
+            # Halve the step of segments whose log-likelihood would not improve
+            scale = np.ones(num_segments)
+            for _ in range(30):
+                candidate = utilities + scale[:, None]*step
+                candidate_log_likelihood = self.log_likelihood(candidate, shelf_items, choice_position, segments,
+                                                               num_segments)
+                worse = candidate_log_likelihood < log_likelihood - 1e-12
+                if not np.any(worse):
+                    break
+                scale[worse] /= 2
+            if np.any(worse):
+                # No improving step left: keep the previous utilities of these segments
+                candidate[worse] = utilities[worse]
+                utilities = candidate
+                break
+            utilities, log_likelihood = candidate, candidate_log_likelihood
+            if np.max(np.abs(scale[:, None]*step)) < self.tolerance:
+                break
+
+        utilities[np.bincount(segments, minlength=num_segments) == 0] = np.nan
+        return utilities
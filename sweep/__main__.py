@@ -0,0 +1,35 @@
+import sys
+import argparse
+from sweep.sweep_runner import SweepRunner
+
+
+def main():
+    """ Runs a sweep of simulation scenarios described by a JSON configuration file.
+        Scenarios are run in-process by a pool of workers. Input files shared by several scenarios
+        are parsed once. Each scenario writes its results, reports and run_report.json into
+        <output_dir>/<label>, and sweep_manifest.json in <output_dir> lists the timings of all of them.
+
+        Detailed description of commandline arguments:
+        config: JSON sweep configuration file (see SweepRunner for its layout)
+        -nw:    Number of worker processes. Overrides num_workers of the configuration.
+
+        Example run from the project root:
+        python -m sweep sweep_config.json -nw 4
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', help='Sweep configuration JSON file')
+    parser.add_argument('-nw', '--num_workers', help='Number of worker processes', type=int, default=None,
+                        required=False)
+    args = parser.parse_args()
+
+    manifest = SweepRunner(SweepRunner.load_config(args.config), num_workers=args.num_workers).run()
+    failed = [entry['label'] for entry in manifest['scenarios'] if entry['status'] != 'done']
+    print("Sweep done in {0:.3f} sec. Manifest written to {1}".format(manifest['wall_seconds'],
+                                                                       manifest['output_dir']))
+    if failed:
+        print("FAILED " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+from src.dataset.dataset_builder import DatasetBuilder
+from src.dataset.parsers.distribution_parser import DistributionParser
+from src.dataset.instrumentation.run_monitor import RunMonitor
+
+# Parsed group distributions of a pool worker process, keyed by SweepRunner.get_input_key
+_worker_distributions = None
+
+
+def _init_worker(distributions):
+    global _worker_distributions
+    _worker_distributions = distributions
+
+
+def _run_scenario(task):
+    index, scenario = task
+    return index, SweepRunner.run_scenario(scenario, _worker_distributions[SweepRunner.get_input_key(scenario)])
+
+
+class SweepRunner:
+    """ Runs many simulation scenarios in one process pool.
+        Capabilities:
+            - Expands a grid of parameters (and an optional list of explicit scenarios) over a base configuration,
+            - Parses every distinct pair of input files once and shares it with all scenarios using it,
+            - Runs scenarios in-process, in parallel over worker processes,
+            - Writes each scenario into its own labelled output directory and a manifest of timings.
+
+        A sweep configuration is a JSON file like:
+            {"output_dir": "sweep_results",
+             "num_workers": 4,
+             "base": {"input_dir": "input_data", "num_groups": 3, "num_items": 12},
+             "grid": {"seed": [1, 2, 3], "shelf_size": [4, 6]},
+             "scenarios": [{"group_probabilities_file": "p1.csv"}, {"group_probabilities_file": "p2.csv"}]}
+        Scenario keys are the DatasetBuilder arguments (the long names of the commandline options).
+    """
+    MANIFEST_FILE = 'sweep_manifest.json'
+    DEFAULT_SCENARIO = {'group_distributions_file': 'user_group_distributions.csv',
+                        'group_probabilities_file': 'user_group_probabilities.csv',
+                        'num_users': 450,
+                        'num_trips': 18,
+                        'shelf_size': 6,
+                        'seed': DatasetBuilder.DEFAULT_SEED}
+    REQUIRED_KEYS = ('input_dir', 'num_groups', 'num_items')
+
+    def __init__(self, config, num_workers=None):
+        if 'output_dir' not in config:
+            raise ValueError('The sweep configuration needs an output_dir.')
+        self.output_dir = config['output_dir']
+        self.num_workers = int(num_workers if num_workers is not None else config.get('num_workers', 1))
+        self.distribution_cache_dir = config.get('distribution_cache_dir', None)
+        self.scenarios = self.get_scenarios(config)
+        if self.num_workers < 1:
+            raise ValueError('The number of workers should be a positive number.')
+        if self.num_workers > 1 and any(int(s.get('num_workers', 1)) > 1 for s in self.scenarios.values()):
+            raise ValueError('Scenarios of a parallel sweep can not use worker processes themselves.')
+
+    @staticmethod
+    def load_config(config_file):
+        with open(config_file) as f:
+            return json.load(f)
+
+    @staticmethod
+    def get_label_value(key, value):
+        """ Returns: A value as shown in a label. Files and directories are shown by their base name,
+            and decimal points of other values are written as p (1.5 is 1p5).
+        """
+        if key.endswith('_file') or key.endswith('_dir'):
+            return os.path.splitext(os.path.basename(str(value)))[0]
+        return str(value).replace('.', 'p')
+
+    @staticmethod
+    def get_label(index, values):
+        """ Returns: Output directory name of a scenario, made of its index and the values varied by the sweep """
+        parts = ['{0}-{1}'.format(key, SweepRunner.get_label_value(key, value))
+                 for key, value in sorted(values.items())]
+        return re.sub(r'[^A-Za-z0-9.=_-]+', '_', '_'.join(['s{0:04d}'.format(index)] + parts))
+
+    @staticmethod
+    def get_scenarios(config):
+        """ Combines every explicit scenario with every point of the grid, on top of the base configuration.
+
+            Returns:
+                scenarios:  An ordered dictionary of scenario configurations keyed by label
+        """
+        base = dict(SweepRunner.DEFAULT_SCENARIO, **config.get('base', dict()))
+        grid = config.get('grid', dict())
+        grid_keys = sorted(grid)
+        scenarios = dict()
+        for explicit in config.get('scenarios', [dict()]):
+            for grid_values in itertools.product(*[grid[key] for key in grid_keys]):
+                values = dict(explicit, **dict(zip(grid_keys, grid_values)))
+                scenario = dict(base, **values)
+                missing = [key for key in SweepRunner.REQUIRED_KEYS if key not in scenario]
+                if missing:
+                    raise ValueError('Scenario {0} misses {1}.'.format(values, ', '.join(missing)))
+                scenario.pop('output_dir', None)
+                scenarios[SweepRunner.get_label(len(scenarios), values)] = scenario
+        return scenarios
+
+    @staticmethod
+    def get_input_key(scenario):
+        """ Returns: The identity of the parsed inputs of a scenario """
+        return (os.path.abspath(os.path.join(scenario['input_dir'], scenario['group_distributions_file'])),
+                os.path.abspath(os.path.join(scenario['input_dir'], scenario['group_probabilities_file'])),
+                int(scenario['num_items']), int(scenario['num_groups']))
+
+    def parse_inputs(self):
+        """ Parses the input files of all scenarios, each distinct set of inputs once.
+            Inputs that can not be parsed are reported instead of stopping the sweep.
+
+            Returns:
+                distributions:  A dictionary of DistributionParser objects keyed by get_input_key
+                errors:         A dictionary of parsing error messages keyed by get_input_key
+        """
+        distributions = dict()
+        errors = dict()
+        for scenario in self.scenarios.values():
+            key = self.get_input_key(scenario)
+            if key in distributions or key in errors:
+                continue
+            try:
+                distributions[key] = DistributionParser(*key, cache_dir=scenario.get('distribution_cache_dir',
+                                                                                     self.distribution_cache_dir))
+            except Exception as error:
+                errors[key] = '{0}: {1}'.format(type(error).__name__, error)
+        return distributions, errors
+
+    @staticmethod
+    def run_scenario(scenario, group_distributions):
+        """ Runs one scenario the way __main__.py does, writing results, reports and run report.
+
+            Returns:
+                entry:  A manifest entry with the status, timings and counters of the run
+        """
+        seed = int(scenario['seed'])
+        random.seed(seed)
+        np.random.seed(seed)
+        monitor = RunMonitor(verbose=False)
+        start = time.perf_counter()
+        try:
+            db = DatasetBuilder(argparse.Namespace(**scenario), monitor=monitor,
+                                group_distributions=group_distributions)
+            db.generate_data_set()
+            db.generate_reports()
+            db.write_run_report()
+        except Exception as error:
+            # Any failure of a scenario is recorded in the manifest, and the sweep goes on
+            return {'status': 'failed', 'error': '{0}: {1}'.format(type(error).__name__, error),
+                    'wall_seconds': time.perf_counter() - start}
+
+        report = monitor.get_report()
+        return {'status': 'done',
+                'error': None,
+                'wall_seconds': time.perf_counter() - start,
+                'stages': report['stages'],
+                'counters': report['counters']}
+
+    def run(self):
+        """ Runs all scenarios and writes the manifest to the sweep output directory.
+
+            Returns:
+                manifest:   A dictionary with sweep timings and one entry per scenario
+        """
+        start = time.perf_counter()
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        distributions, errors = self.parse_inputs()
+        parsing_seconds = time.perf_counter() - start
+
+        labels = list(self.scenarios)
+        tasks = [(index, dict(self.scenarios[label], output_dir=os.path.join(self.output_dir, label)))
+                 for index, label in enumerate(labels)]
+        manifest = {'output_dir': self.output_dir,
+                    'num_workers': self.num_workers,
+                    'num_inputs_parsed': len(distributions),
+                    'parsing_seconds': parsing_seconds,
+                    'scenarios': [None]*len(tasks)}
+
+        # Scenarios whose inputs could not be parsed fail without being run
+        failed = [(index, {'status': 'failed', 'error': errors[self.get_input_key(scenario)], 'wall_seconds': 0.0})
+                  for index, scenario in tasks if self.get_input_key(scenario) in errors]
+        tasks_to_run = [task for task in tasks if self.get_input_key(task[1]) not in errors]
+        self.collect(failed, tasks, labels, manifest)
+        if self.num_workers > 1 and tasks_to_run:
+            with multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(distributions,)) as pool:
+                results = pool.imap_unordered(_run_scenario, tasks_to_run)
+                self.collect(results, tasks, labels, manifest, num_done=len(failed))
+        else:
+            _init_worker(distributions)
+            self.collect(map(_run_scenario, tasks_to_run), tasks, labels, manifest, num_done=len(failed))
+
+        manifest['wall_seconds'] = time.perf_counter() - start
+        with open(os.path.join(self.output_dir, SweepRunner.MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest
+
+    @staticmethod
+    def collect(results, tasks, labels, manifest, num_done=0):
+        for done, (index, entry) in enumerate(results, start=num_done):
+            entry.update({'label': labels[index], 'output_dir': tasks[index][1]['output_dir'],
+                          'config': dict(tasks[index][1])})
+            manifest['scenarios'][index] = entry
+            sys.stdout.write("{0:d}/{1:d} {2} {3} ({4:.3f} sec)\n".format(done+1, len(tasks), labels[index],
+                                                                          entry['status'], entry['wall_seconds']))
+            sys.stdout.flush()
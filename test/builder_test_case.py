@@ -0,0 +1,55 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DatasetBuilder
+import random
+import numpy as np
+import pandas as pd
+
+
+class BuilderTestCase(unittest.TestCase):
+    """ Base of the tests running DatasetBuilder on the small test inputs.
+        Each test gets a temporary output directory, and builder arguments made of BASE_ARGS
+        updated with the ARGS of the test class, in self.args.
+    """
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+    INPUT_DIR = os.path.join(TEST_DIR, 'test_data', 'input')
+    BASE_ARGS = {'input_dir': INPUT_DIR,
+                 'group_distributions_file': 'user_group_distributions.csv',
+                 'group_probabilities_file': 'user_group_probabilities.csv',
+                 'num_groups': 3,
+                 'num_items': 12,
+                 'num_users': 60,
+                 'num_trips': 18,
+                 'shelf_size': 6,
+                 'seed': 1234}
+    ARGS = dict()
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.args = dict(BuilderTestCase.BASE_ARGS, **self.ARGS)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def get_args(self, name, **kwargs):
+        """ Returns: Builder arguments writing into output_dir/name, with kwargs overriding self.args """
+        return pd.Series(dict(dict(self.args, **kwargs), output_dir=os.path.join(self.output_dir, name)))
+
+    def run_builder(self, name, builder_class=DatasetBuilder, reports=False, **kwargs):
+        """ Runs a builder (and its reports) on a seeded global random state into output_dir/name
+            and returns it
+        """
+        args = self.get_args(name, **kwargs)
+        random.seed(args['seed'])
+        np.random.seed(args['seed'])
+        with redirect_stdout(StringIO()):
+            db = builder_class(args)
+            db.generate_data_set()
+            if reports:
+                db.generate_reports()
+        return db
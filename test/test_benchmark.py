@@ -0,0 +1,69 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from benchmark.benchmark_runner import BenchmarkRunner
+
+
+class TestBenchmark(unittest.TestCase):
+    BASE_CONFIG = {'num_users': 60, 'num_items': 12, 'num_trips': 18, 'shelf_size': 6, 'num_groups': 3}
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    @staticmethod
+    def get_report(rows_per_sec, stage_seconds):
+        key = BenchmarkRunner.get_config_key(TestBenchmark.BASE_CONFIG)
+        return {'meta': dict(), 'results': {key: {'rows_per_sec': rows_per_sec, 'stage_seconds': stage_seconds}}}
+
+    def test_configs(self):
+        """ Parameters are swept one at a time, without duplicates and without shelves larger than the catalog.
+        """
+        configs = BenchmarkRunner.get_configs(TestBenchmark.BASE_CONFIG,
+                                              {'num_items': [4, 100], 'shelf_size': [6, 3], 'num_users': []})
+        self.assertEqual(configs[0], TestBenchmark.BASE_CONFIG)
+        self.assertEqual([(c['num_items'], c['shelf_size']) for c in configs[1:]], [(100, 6), (12, 3)])
+        self.assertEqual(len(set(BenchmarkRunner.get_config_key(c) for c in configs)), len(configs))
+
+    def test_find_regressions(self):
+        """ Throughput drops and stage slowdowns beyond the tolerance are flagged, noise and new stages are not.
+        """
+        baseline = TestBenchmark.get_report(1000.0, {'doe': 0.1, 'choices': 0.001})
+        self.assertEqual(BenchmarkRunner.find_regressions(
+            TestBenchmark.get_report(900.0, {'doe': 0.11, 'choices': 0.004, 'pantry': 1.0}), baseline), [])
+
+        regressions = BenchmarkRunner.find_regressions(
+            TestBenchmark.get_report(700.0, {'doe': 0.2, 'choices': 0.001}), baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('700 rows/sec', regressions[0])
+        self.assertIn('stage doe', regressions[1])
+
+        other = {'meta': dict(), 'results': {'other': baseline['results'].popitem()[1]}}
+        self.assertEqual(BenchmarkRunner.find_regressions(TestBenchmark.get_report(1.0, {}), other), [])
+
+    def test_run(self):
+        """ A run reports the DatasetBuilder stages of every configuration, and its saved report loads back.
+        """
+        runner = BenchmarkRunner(self.work_dir, chunk_size=25, rng='spawn')
+        with redirect_stdout(StringIO()):
+            report = runner.run(BenchmarkRunner.get_configs(TestBenchmark.BASE_CONFIG, {'num_groups': [1]}))
+        self.assertEqual(len(report['results']), 2)
+        for result in report['results'].values():
+            self.assertTrue({'parsing', 'group_draw', 'utilities', 'doe', 'choices', 'accumulate', 'assemble',
+                             'reports', 'save'} <= set(result['stage_seconds']))
+            self.assertEqual(set(result['stage_peak_memory_bytes']), set(result['stage_seconds']))
+            self.assertTrue(result['rows_per_sec'] > 0)
+
+        report_file = os.path.join(self.work_dir, 'report.json')
+        BenchmarkRunner.save_report(report, report_file)
+        self.assertEqual(BenchmarkRunner.load_report(report_file), report)
+        self.assertEqual(BenchmarkRunner.find_regressions(report, report), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import json
+import functools
+from src import DatasetBuilder, CheckpointManifest
+from test.builder_test_case import BuilderTestCase
+
+
+class InterruptedDatasetBuilder(DatasetBuilder):
+    """ Dataset builder dying when it reaches a given block """
+    def __init__(self, args, fail_block):
+        super().__init__(args)
+        self.fail_block = fail_block
+
+    def simulate_block(self, block_index):
+        if block_index == self.fail_block:
+            raise RuntimeError('Interrupted')
+        return super().simulate_block(block_index)
+
+
+class TestCheckpoint(BuilderTestCase):
+    ARGS = {'num_users': 47, 'num_trips': 9, 'shelf_size': 5, 'chunk_size': 10, 'seed': 7}
+    RESULT_FILES = ['true_user_utilities.csv', 'simulated_data.csv', 'drawn_users_summary.csv',
+                    'item_balance_per_user.csv']
+
+    def run_builder(self, name, fail_block=None, **kwargs):
+        """ Runs a builder, dying at fail_block if given, then writes its reports """
+        builder_class = DatasetBuilder
+        if fail_block is not None:
+            builder_class = functools.partial(InterruptedDatasetBuilder, fail_block=fail_block)
+        return super().run_builder(name, builder_class=builder_class, reports=True, **kwargs)
+
+    def assert_same_results(self, expected_dir, actual_dir):
+        for file_name in TestCheckpoint.RESULT_FILES:
+            with open(os.path.join(self.output_dir, expected_dir, file_name), 'rb') as f:
+                expected = f.read()
+            with open(os.path.join(self.output_dir, actual_dir, file_name), 'rb') as f:
+                self.assertEqual(expected, f.read(), file_name)
+
+    def test_resume_global(self):
+        """ A legacy run on the global random state, interrupted and resumed, gives the results of an
+            uninterrupted run. A shard whose checksum does not match is simulated again.
+        """
+        self.run_builder('expected', stream=True)
+        with self.assertRaises(RuntimeError):
+            self.run_builder('resumed', fail_block=3, checkpoint=True)
+
+        shard_dir = os.path.join(self.output_dir, 'resumed', DatasetBuilder.SHARD_DIR)
+        with open(os.path.join(shard_dir, CheckpointManifest.MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(manifest['shards']), ['0', '1', '2'])
+        self.assertEqual(manifest['shards']['2']['users'], [20, 30])
+        self.assertEqual(manifest['shards']['2']['stream'], {'rng': 'global', 'seed': 7, 'block': 2})
+        with open(os.path.join(shard_dir, manifest['shards']['1']['results'][1]), 'ab') as f:
+            f.write(b'0\n')
+
+        self.run_builder('resumed', checkpoint=True)
+        self.assert_same_results('expected', 'resumed')
+        self.assertFalse(os.path.exists(shard_dir))
+
+    def test_resume_spawn(self):
+        """ A batched run on two workers with independent block streams, interrupted and resumed,
+            gives the results of an uninterrupted run.
+        """
+        args = dict(engine='batched', rng='spawn', pantry=True)
+        self.run_builder('expected', **args)
+        with self.assertRaises(RuntimeError):
+            self.run_builder('resumed', fail_block=2, checkpoint=True, **args)
+        self.run_builder('resumed', checkpoint=True, num_workers=2, **args)
+        self.assert_same_results('expected', 'resumed')
+
+    def test_other_settings(self):
+        """ A checkpoint is not resumed by a run with other settings.
+        """
+        with self.assertRaises(RuntimeError):
+            self.run_builder('resumed', fail_block=1, checkpoint=True)
+        with self.assertRaises(ValueError):
+            self.run_builder('resumed', checkpoint=True, shelf_size=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import os
+import shutil
+import itertools
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DatasetBuilder, DesignDiagnostics
+import numpy as np
+import pandas as pd
+
+
+class TestDesignDiagnostics(unittest.TestCase):
+    TOL = 0.0000001  # Accepted level of error
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+    REPORT_FILES = ['design_diagnostics.csv', 'item_balance_global.csv', 'item_cooccurrence.csv']
+
+    def test_counts(self):
+        """ Counts from bit-packed chunks match dense products, whatever the chunk size and shelf layout.
+        """
+        rng = np.random.default_rng(3)
+        shelf_items = np.argsort(rng.random([1000, 21]), axis=1)[:, :5]
+        assortment = np.zeros([1000, 21], dtype=np.uint8)
+        assortment[np.arange(1000)[:, None], shelf_items] = 1
+        self.assertTrue(np.array_equal(DesignDiagnostics.pack_shelf_items(shelf_items, 21),
+                                       np.packbits(assortment, axis=1)))
+
+        diagnostics = DesignDiagnostics(21)
+        diagnostics.chunk_rows = 64
+        diagnostics.update_bits(np.packbits(assortment, axis=1))
+        self.assertEqual(diagnostics.num_rows, 1000)
+        self.assertTrue(np.array_equal(diagnostics.cooccurrence, np.dot(assortment.T.astype(np.int64), assortment)))
+        self.assertEqual(diagnostics.shelf_size_counts[5], 1000)
+
+        merged = DesignDiagnostics(21)
+        merged.update_bits(DesignDiagnostics.pack_shelf_items(shelf_items[:300], 21))
+        other = DesignDiagnostics(21)
+        other.update_bits(DesignDiagnostics.pack_shelf_items(shelf_items[300:], 21))
+        merged.merge(other)
+        self.assertTrue(np.array_equal(merged.cooccurrence, diagnostics.cooccurrence))
+
+    def test_d_efficiency(self):
+        """ A design showing every pair of items equally often is D-efficient, a constant shelf is not.
+        """
+        shelves = np.array(list(itertools.combinations(range(6), 3)))
+        diagnostics = DesignDiagnostics(6)
+        diagnostics.update_bits(DesignDiagnostics.pack_shelf_items(shelves, 6))
+        self.assertTrue(np.abs(diagnostics.get_d_efficiency(3) - 1) < TestDesignDiagnostics.TOL)
+
+        diagnostics = DesignDiagnostics(6)
+        diagnostics.update_bits(DesignDiagnostics.pack_shelf_items(np.tile([0, 1, 2], (20, 1)), 6))
+        self.assertEqual(diagnostics.get_d_efficiency(3), 0)
+
+    def test_reports(self):
+        """ Reports of in-memory and parallel streamed runs agree, and match diagnostics of the stored results.
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            args = {'input_dir': os.path.join(TestDesignDiagnostics.TEST_DIR, 'test_data', 'input'),
+                    'num_groups': 3, 'num_items': 12, 'num_users': 60, 'num_trips': 18, 'shelf_size': 6,
+                    'group_distributions_file': 'user_group_distributions.csv',
+                    'group_probabilities_file': 'user_group_probabilities.csv', 'chunk_size': 25,
+                    'rng': 'spawn', 'design_diagnostics': True}
+            runs = {'in_memory': dict(),
+                    'streamed': dict(stream=True, num_workers=2, output_format='bitpacked'),
+                    'large_catalog': dict(large_catalog=True, output_format='index')}
+            builders = dict()
+            for name, run_args in runs.items():
+                with redirect_stdout(StringIO()):
+                    builders[name] = DatasetBuilder(pd.Series(dict(args, output_dir=os.path.join(output_dir, name),
+                                                                   **run_args)))
+                    builders[name].generate_data_set()
+                    builders[name].generate_reports()
+
+            for file_name in TestDesignDiagnostics.REPORT_FILES:
+                expected = pd.read_csv(os.path.join(output_dir, 'in_memory', file_name))
+                actual = pd.read_csv(os.path.join(output_dir, 'streamed', file_name))
+                self.assertTrue(expected.equals(actual), file_name)
+
+            summary = pd.read_csv(os.path.join(output_dir, 'in_memory', 'design_diagnostics.csv'),
+                                  index_col='metric')['value']
+            self.assertEqual(summary['num_trips'], 60*18)
+            self.assertEqual(summary['min_shelf_size'], 6)
+            self.assertTrue(0 < summary['d_efficiency'] <= 1)
+
+            for name in ['streamed', 'large_catalog']:
+                stored = DesignDiagnostics.from_store(os.path.join(output_dir, name))
+                self.assertTrue(np.array_equal(stored.cooccurrence,
+                                               builders[name].report_accumulator.design_diagnostics.cooccurrence))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DesignLibrary, DatasetBuilder
+import random
+import numpy as np
+import pandas as pd
+
+
+class TestDesignLibrary(unittest.TestCase):
+    TOL = 0.0000001  # Accepted level of error
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+    NUM_ITEMS = 12
+    NUM_TRIPS = 18
+    SHELF_SIZE = 6
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def get_library(self, num_designs=50, **kwargs):
+        return DesignLibrary(TestDesignLibrary.NUM_ITEMS, TestDesignLibrary.NUM_TRIPS, TestDesignLibrary.SHELF_SIZE,
+                             num_designs, 1234, **kwargs)
+
+    def test_designs(self):
+        """ Designs hold shelf_size distinct items per trip and their errors match the co-occurrence matrix.
+        """
+        library = self.get_library()
+        self.assertEqual(library.designs.shape, (50, TestDesignLibrary.NUM_TRIPS, TestDesignLibrary.SHELF_SIZE))
+        self.assertEqual(library.designs.dtype, np.uint8)
+        self.assertTrue(np.all(np.diff(np.sort(library.designs, axis=2), axis=2) > 0))
+
+        pairs = ~np.eye(TestDesignLibrary.NUM_ITEMS, dtype=bool)
+        for d in range(5):
+            x = np.zeros([TestDesignLibrary.NUM_TRIPS, TestDesignLibrary.NUM_ITEMS])
+            x[np.arange(TestDesignLibrary.NUM_TRIPS)[:, None], library.designs[d]] = 1
+            cooccurrences = np.dot(x.T, x)[pairs]
+            self.assertTrue(abs(library.cooccurrence_errors[d] - np.std(cooccurrences)) < TestDesignLibrary.TOL)
+            self.assertTrue(abs(library.balance_errors[d] - np.sqrt(np.mean((np.sum(x, axis=0) - 9.0)**2)))
+                            < TestDesignLibrary.TOL)
+
+    def test_large_catalog(self):
+        """ Large catalog libraries are drawn by the sparse DoE builder and measured from shelf indices.
+        """
+        library = DesignLibrary(50000, 5, 4, 30, 1234, large_catalog=True)
+        self.assertEqual(library.designs.shape, (30, 5, 4))
+        self.assertTrue(library.get_cache_name().endswith('_lc.npz'))
+        x = np.zeros([5, 50000])
+        x[np.arange(5)[:, None], library.designs[0]] = 1
+        self.assertTrue(abs(library.balance_errors[0] - np.sqrt(np.mean((np.sum(x, axis=0) - 20/50000)**2)))
+                        < TestDesignLibrary.TOL)
+
+    def test_best_designs(self):
+        """ Only the best ranked designs are served, cycling over user indices.
+        """
+        library = self.get_library(num_best=5)
+        served = library.rank_designs()[:5]
+        self.assertTrue(np.max(library.balance_errors[served]) <= np.min(np.delete(library.balance_errors, served)))
+        designs = library.get_designs(np.arange(10))
+        self.assertTrue(np.all(designs[:5] == library.designs[served]))
+        self.assertTrue(np.all(designs[5:] == designs[:5]))
+
+    def test_cache(self):
+        """ A second library with the same parameters and seed is loaded from the cache.
+        """
+        cache_dir = os.path.join(self.output_dir, 'cache')
+        library = self.get_library(cache_dir=cache_dir)
+        self.assertTrue(os.path.exists(library.cache_file))
+        os.utime(library.cache_file, (0, 0))
+
+        cached = self.get_library(cache_dir=cache_dir)
+        self.assertEqual(os.stat(cached.cache_file).st_mtime, 0)
+        self.assertTrue(np.all(cached.designs == library.designs))
+        self.assertTrue(np.all(cached.cooccurrence_errors == library.cooccurrence_errors))
+
+    def test_dataset_builder(self):
+        """ Both engines serve the designs of the library to users.
+        """
+        args = {'input_dir': os.path.join(TestDesignLibrary.TEST_DIR, 'test_data', 'input'),
+                'group_distributions_file': 'user_group_distributions.csv',
+                'group_probabilities_file': 'user_group_probabilities.csv',
+                'num_groups': 3, 'num_users': 30, 'num_items': TestDesignLibrary.NUM_ITEMS,
+                'num_trips': TestDesignLibrary.NUM_TRIPS, 'shelf_size': TestDesignLibrary.SHELF_SIZE, 'seed': 1234,
+                'chunk_size': 7, 'design_library_size': 20, 'design_library_best': 10}
+        expected = self.get_library(num_designs=20, num_best=10).get_designs(np.arange(30))
+        for engine in ['legacy', 'batched']:
+            random.seed(1234)
+            np.random.seed(1234)
+            with redirect_stdout(StringIO()):
+                db = DatasetBuilder(pd.Series(dict(args, engine=engine, output_dir=self.output_dir)))
+                db.generate_data_set(save=False)
+            assortment = db.result_buffer.assortment.reshape(30, TestDesignLibrary.NUM_TRIPS, -1)
+            shelves = np.sort(np.nonzero(assortment)[2].reshape(expected.shape), axis=2)
+            self.assertTrue(np.all(shelves == np.sort(expected, axis=2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
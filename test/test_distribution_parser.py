@@ -0,0 +1,118 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src import CovarianceSpec, DiagonalCovariance, DistributionParser, UserBuilder
+
+
+class TestDistributionParser(unittest.TestCase):
+    TOL = 0.0000001  # Accepted level of error
+    NUM_ITEMS = 4
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.probabilities_file = os.path.join(self.tmp_dir.name, 'probabilities.csv')
+        pd.DataFrame({'group': [1], 'probability': [1.0]}).to_csv(self.probabilities_file, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def parse(self, distributions, cache_dir=None):
+        distributions_file = os.path.join(self.tmp_dir.name, 'distributions.csv')
+        distributions.to_csv(distributions_file, index=False)
+        return DistributionParser(distributions_file, self.probabilities_file, TestDistributionParser.NUM_ITEMS, 1,
+                                  cache_dir)
+
+    @staticmethod
+    def get_frame(**columns):
+        frame = pd.DataFrame({'group': 1, 'mean': [1.0, 0.5, -0.5, 0.0]})
+        for name, values in columns.items():
+            frame[name] = values
+        return frame
+
+    def test_structured_covariances(self):
+        """ Structured specs give the expected dense covariance and sample it correctly.
+        """
+        factor = np.array([[1.0], [0.5], [0.0], [-1.0]])
+        variance = np.array([1.0, 2.0, 0.5, 1.5])
+        specs = {'diagonal': (self.get_frame(variance=variance), np.diag(variance)),
+                 'low_rank': (self.get_frame(variance=variance, factor1=factor[:, 0]),
+                              np.dot(factor, factor.T) + np.diag(variance)),
+                 'block_diagonal': (self.get_frame(block=[1, 2, 1, 2], cov01=[2.0, 2.0, 0.5, 0.5],
+                                                   cov02=[0.5, 0.5, 1.0, 1.0]),
+                                    np.array([[2.0, 0.0, 0.5, 0.0], [0.0, 2.0, 0.0, 0.5],
+                                              [0.5, 0.0, 1.0, 0.0], [0.0, 0.5, 0.0, 1.0]]))}
+        for kind, (frame, expected_cov) in specs.items():
+            parser = self.parse(frame)
+            cov = parser.get_group_covariance(0)
+            self.assertEqual(cov.KIND, kind)
+            self.assertTrue(np.all(np.abs(parser.get_group_distribution(0)[1] - expected_cov)
+                                   < TestDistributionParser.TOL))
+
+            draws = cov.transform(np.random.RandomState(1234).standard_normal(size=[100000, cov.num_normals]))
+            self.assertTrue(np.all(np.abs(np.cov(draws.T) - expected_cov) < 0.05))
+
+    def test_dense_covariance_matches_multivariate_normal(self):
+        """ Dense specs sample exactly what multivariate_normal draws for the same seed.
+        """
+        cov = np.array([[2.0, 0.5, 0.0, 0.0], [0.5, 1.0, 0.2, 0.0], [0.0, 0.2, 1.0, 0.3], [0.0, 0.0, 0.3, 1.0]])
+        parser = self.parse(self.get_frame(**{'cov{0:02d}'.format(i+1): cov[:, i] for i in range(4)}))
+
+        np.random.seed(1234)
+        expected = np.random.multivariate_normal(mean=parser.get_group_mean(0), cov=cov, size=1).ravel()
+        np.random.seed(1234)
+        user = UserBuilder([parser.get_group_mean(0), parser.get_group_covariance(0)], 0, 0)
+        self.assertTrue(np.all(np.abs(user.get_utilities() - (expected - expected[-1]))
+                               < TestDistributionParser.TOL))
+
+    def test_not_positive_definite(self):
+        """ Invalid covariances are rejected with a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            self.parse(self.get_frame(variance=[1.0, 0.0, 1.0, 1.0]))
+        with self.assertRaises(ValueError):
+            self.parse(self.get_frame(block=[1, 1, 2, 2], cov01=[1.0, 2.0, 1.0, 0.0], cov02=[2.0, 1.0, 0.0, 1.0]))
+
+    def test_spec_interface(self):
+        """ Specs missing a hook used by the parser, such as set_arrays, cannot be created.
+        """
+        class IncompleteCovariance(CovarianceSpec):
+            def transform(self, z):
+                return z
+
+            def build_dense(self):
+                return np.eye(self.num_items)
+
+            def get_arrays(self):
+                return dict()
+
+        with self.assertRaises(TypeError):
+            CovarianceSpec(4)
+        with self.assertRaises(TypeError):
+            IncompleteCovariance(4)
+        self.assertEqual(DiagonalCovariance(np.ones(4)).to_dense().shape, (4, 4))
+
+    def test_cache(self):
+        """ A second parser reads the cached distributions and builds the same specs.
+        """
+        cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        frame = self.get_frame(variance=[1.0, 2.0, 0.5, 1.5], factor1=[1.0, 0.5, 0.0, -1.0])
+        parsed = self.parse(frame, cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        cached = self.parse(frame, cache_dir)
+        self.assertIsNone(cached.group_distributions)
+        self.assertEqual(cached.get_group_covariance(0).KIND, 'low_rank')
+        self.assertTrue(np.all(cached.get_group_mean(0) == parsed.get_group_mean(0)))
+        self.assertTrue(np.all(cached.get_group_distribution(0)[1] == parsed.get_group_distribution(0)[1]))
+        self.assertTrue(np.all(cached.get_group_probabilities() == parsed.get_group_probabilities()))
+
+        # Different inputs do not hit the cache
+        frame['variance'] = [1.0, 1.0, 1.0, 1.0]
+        self.parse(frame, cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from src import DoEBuilder, DoEBatchBuilder
+import numpy as np
+
+
+class TestDoEBatchBuilder(unittest.TestCase):
+    NUM_USERS = 500
+    NUM_ITEMS = 12
+    NUM_TRIPS = 18
+    SHELF_SIZE = 6
+
+    def setUp(self):
+        np.random.seed(1234)
+
+    def test_shelves_are_valid(self):
+        """ Every shelf holds shelf_size distinct items.
+        """
+        doe = DoEBatchBuilder(TestDoEBatchBuilder.NUM_ITEMS, TestDoEBatchBuilder.NUM_TRIPS,
+                              TestDoEBatchBuilder.SHELF_SIZE)
+        shelves = doe.generate_design(TestDoEBatchBuilder.NUM_USERS)
+        self.assertEqual(shelves.shape, (TestDoEBatchBuilder.NUM_USERS, TestDoEBatchBuilder.NUM_TRIPS,
+                                         TestDoEBatchBuilder.SHELF_SIZE))
+        self.assertTrue(np.all(np.diff(shelves, axis=2) > 0))
+        self.assertTrue(np.all((shelves >= 0) & (shelves < TestDoEBatchBuilder.NUM_ITEMS)))
+
+    def test_same_balance_as_doe_builder(self):
+        """ Item view counts per user never deviate from the ideal count by more than
+            what the per-trip DoEBuilder allows.
+        """
+        doe = DoEBatchBuilder(TestDoEBatchBuilder.NUM_ITEMS, TestDoEBatchBuilder.NUM_TRIPS,
+                              TestDoEBatchBuilder.SHELF_SIZE)
+        doe.generate_design(TestDoEBatchBuilder.NUM_USERS)
+        ideal_counts = TestDoEBatchBuilder.NUM_TRIPS*TestDoEBatchBuilder.SHELF_SIZE/TestDoEBatchBuilder.NUM_ITEMS
+        batch_deviation = np.max(np.abs(doe.item_trip_counts - ideal_counts))
+
+        reference_doe = DoEBuilder(TestDoEBatchBuilder.NUM_ITEMS, TestDoEBatchBuilder.NUM_TRIPS,
+                                   TestDoEBatchBuilder.SHELF_SIZE)
+        reference_deviation = 0.0
+        for iu in range(TestDoEBatchBuilder.NUM_USERS):
+            reference_doe.reset()
+            for it in range(TestDoEBatchBuilder.NUM_TRIPS):
+                reference_doe.next_shelf()
+            reference_deviation = max(reference_deviation,
+                                      np.max(np.abs(reference_doe.item_trip_counts - ideal_counts)))
+        self.assertLessEqual(batch_deviation, reference_deviation)
+
+
+if __name__ == '__main__':
+    unittest.main()
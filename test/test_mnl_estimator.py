@@ -0,0 +1,93 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import MNLEstimator
+from bias_study.bias_study_runner import BiasStudyRunner
+import numpy as np
+import pandas as pd
+
+
+class TestMNLEstimator(unittest.TestCase):
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+
+    def simulate_choices(self, utilities, num_rows, shelf_size, rng):
+        """ Returns shelves and logit choices of num_rows trips for the given utilities """
+        shelf_items = np.argsort(rng.random([num_rows, utilities.shape[0]]), axis=1)[:, :shelf_size]
+        gumbel = -np.log(-np.log(rng.random([num_rows, shelf_size])))
+        choice = shelf_items[np.arange(num_rows), np.argmax(utilities[shelf_items] + gumbel, axis=1)]
+        return shelf_items, choice
+
+    def test_recovers_utilities(self):
+        """ Utilities of logit choices are recovered, and a per-segment fit equals separate fits.
+        """
+        rng = np.random.default_rng(0)
+        true_utilities = np.array([[1.0, -0.5, 0.5, 2.0, 0.0], [-1.0, 0.5, 1.5, 0.0, 0.0]])
+        data = [self.simulate_choices(u, 20000, 3, rng) for u in true_utilities]
+        estimator = MNLEstimator(5)
+
+        separate = np.vstack([estimator.fit(shelf_items, choice) for shelf_items, choice in data])
+        self.assertTrue(np.allclose(separate, true_utilities, atol=0.1))
+        self.assertTrue(np.all(separate[:, -1] == 0))
+
+        segments = np.repeat([1, 0], 20000)
+        segmented = estimator.fit(np.vstack([data[1][0], data[0][0]]), np.concatenate([data[1][1], data[0][1]]),
+                                  segments, 3)
+        self.assertTrue(np.allclose(segmented[:2], separate, atol=1e-6))
+        self.assertTrue(np.all(np.isnan(segmented[2])))
+
+    def test_gradient_and_hessian(self):
+        """ Shelf-wise gradients and Hessians match finite differences of the log-likelihood.
+        """
+        rng = np.random.default_rng(1)
+        shelf_items, choice = self.simulate_choices(rng.normal(size=6), 500, 3, rng)
+        segments = rng.integers(0, 2, size=500)
+        choice_position = np.argmax(shelf_items == choice[:, None], axis=1)
+        utilities = rng.normal(size=[2, 6])
+        estimator = MNLEstimator(6)
+        gradient, hessian = estimator.gradient_and_hessian(utilities, shelf_items, choice_position, segments, 2)
+
+        step = 1e-6
+        for item in range(6):
+            shift = np.zeros([2, 6])
+            shift[:, item] = step
+            up = estimator.gradient_and_hessian(utilities + shift, shelf_items, choice_position, segments, 2)[0]
+            down = estimator.gradient_and_hessian(utilities - shift, shelf_items, choice_position, segments, 2)[0]
+            self.assertTrue(np.allclose(hessian[:, :, item], (up - down)/(2*step), atol=1e-5))
+            log_likelihoods = [estimator.log_likelihood(utilities + sign*shift, shelf_items, choice_position,
+                                                        segments, 2) for sign in (1, -1)]
+            self.assertTrue(np.allclose(gradient[:, item], (log_likelihoods[0] - log_likelihoods[1])/(2*step),
+                                        atol=1e-4))
+
+    def test_bias_study(self):
+        """ Replications do not depend on the number of workers, and reports are written.
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            args = {'input_dir': os.path.join(TestMNLEstimator.TEST_DIR, 'test_data', 'input'),
+                    'output_dir': output_dir, 'num_groups': 3, 'num_items': 12, 'num_users': 60, 'num_trips': 18,
+                    'shelf_size': 6, 'group_distributions_file': 'user_group_distributions.csv',
+                    'group_probabilities_file': 'user_group_probabilities.csv', 'engine': 'batched', 'seed': 5}
+            with redirect_stdout(StringIO()):
+                serial = BiasStudyRunner(args, 3).run()
+                study = BiasStudyRunner(args, 3, num_workers=2)
+                parallel = study.run()
+            for expected, actual in zip(serial, parallel):
+                np.testing.assert_array_equal(expected, actual)
+            self.assertFalse(np.array_equal(parallel[0][0], parallel[0][1]))
+
+            study.write_reports(output_dir, *parallel)
+            summary = pd.read_csv(os.path.join(output_dir, BiasStudyRunner.SUMMARY_FILE))
+            self.assertEqual(summary.shape[0], 4*12)
+            self.assertTrue(np.allclose(summary['bias'], summary['mean_estimated_util'] - summary['mean_true_util']))
+            replications = pd.read_csv(os.path.join(output_dir, BiasStudyRunner.REPLICATIONS_FILE))
+            self.assertEqual(replications.shape, (3*4*2, 3 + 12))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
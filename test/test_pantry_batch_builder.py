@@ -0,0 +1,63 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import PantryBatchBuilder, DatasetBuilder, ResultStore
+import random
+import numpy as np
+import pandas as pd
+
+
+class TestPantryBatchBuilder(unittest.TestCase):
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+
+    def test_trips(self):
+        """ Trips are ordered in time, quantities restock the pantry to its target level, and users buy about
+            what they consume.
+        """
+        pantries = PantryBatchBuilder(2000, 100, consumption_rate=0.5, purchase_quantity=4.0,
+                                      random_state=np.random.default_rng(1234))
+        quantity, timestamp = pantries.simulate_trips()
+        quantity = quantity.reshape(2000, 100)
+        timestamp = timestamp.reshape(2000, 100)
+        self.assertTrue(np.all(np.diff(timestamp, axis=1) > 0))
+        self.assertTrue(np.all(quantity >= 1))
+        self.assertTrue(abs(np.mean(quantity) - 4.0) < 0.2)
+
+        # After the first trip, users buy back what they consumed, so longer gaps between trips mean larger restocks
+        gaps = np.diff(timestamp, axis=1)
+        self.assertTrue(np.corrcoef(gaps.ravel(), quantity[:, 1:].ravel())[0, 1] > 0.1)
+        bought_rates = np.sum(quantity[:, 1:-1], axis=1)/(timestamp[:, -1] - timestamp[:, 1])
+        self.assertTrue(np.all(bought_rates <= pantries.consumption_rates*1.05))
+        self.assertTrue(np.median(bought_rates/pantries.consumption_rates) > 0.9)
+
+    def test_dataset_builder(self):
+        """ Pantry runs add quantity and timestamp columns, in csv and binary results alike.
+        """
+        output_dir = tempfile.mkdtemp()
+        args = {'input_dir': os.path.join(TestPantryBatchBuilder.TEST_DIR, 'test_data', 'input'),
+                'group_distributions_file': 'user_group_distributions.csv',
+                'group_probabilities_file': 'user_group_probabilities.csv',
+                'num_groups': 3, 'num_users': 20, 'num_items': 12, 'num_trips': 18, 'shelf_size': 6,
+                'seed': 1234, 'chunk_size': 8, 'rng': 'spawn', 'pantry': True}
+        try:
+            results = []
+            for options in [{'engine': 'batched'}, {'engine': 'batched', 'stream': True, 'output_format': 'npy'}]:
+                random.seed(1234)
+                np.random.seed(1234)
+                with redirect_stdout(StringIO()):
+                    db = DatasetBuilder(pd.Series(dict(args, output_dir=os.path.join(output_dir, str(len(results))),
+                                                       **options)))
+                    db.generate_data_set()
+                results.append(ResultStore(db.output_dir).load()[1])
+            self.assertEqual(list(results[0].columns[:5]), ['user_id', 'trip', 'choice', 'quantity', 'timestamp'])
+            self.assertTrue(np.allclose(results[0].values, results[1].values))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
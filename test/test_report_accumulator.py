@@ -0,0 +1,54 @@
+import unittest
+import os
+from test.builder_test_case import BuilderTestCase
+import numpy as np
+import pandas as pd
+
+
+class TestReportAccumulator(BuilderTestCase):
+    TOL = 0.0000001  # Accepted level of error
+    ARGS = {'num_users': 120, 'chunk_size': 50, 'rng': 'spawn'}
+    REPORT_FILES = ['drawn_users_summary.csv', 'item_balance_per_user.csv']
+
+    def read_reports(self, name):
+        return [pd.read_csv(os.path.join(self.output_dir, name, file_name))
+                for file_name in TestReportAccumulator.REPORT_FILES]
+
+    def test_reports_match_full_data_set(self):
+        """ Accumulated statistics match the ones computed from the full data set.
+        """
+        db = self.run_builder('in_memory', reports=True)
+        user_summary, balance_per_user = self.read_reports('in_memory')
+        true_user_utilities, data_set = db.get_results()
+
+        drawn_memb_prob = true_user_utilities.groupby(['user_group'])['user_group'].count() / db.num_users
+        self.assertTrue(np.all(np.abs(user_summary['sim_memb_prob'].values - drawn_memb_prob.values)
+                               < TestReportAccumulator.TOL))
+        drawn_mean_util = true_user_utilities.groupby(['user_group']).mean().drop(labels=['user_id'], axis=1)
+        self.assertTrue(np.all(np.abs(user_summary.iloc[:, -db.num_items:].values - drawn_mean_util.values)
+                               < TestReportAccumulator.TOL))
+        drawn_var_util = true_user_utilities.groupby(['user_group']).var().drop(labels=['user_id'], axis=1)
+        self.assertTrue(np.all(np.abs(db.report_accumulator.get_group_variances() - drawn_var_util.values)
+                               < TestReportAccumulator.TOL))
+
+        expected_balance = data_set.groupby(['user_id']).sum().drop(labels=['trip', 'choice'], axis=1) / \
+            (db.num_trips*db.shelf_size/db.num_items)
+        self.assertTrue(np.array_equal(balance_per_user.iloc[:, 1:].values, expected_balance.values))
+
+    def test_reports_without_full_data_set(self):
+        """ Streamed and parallel runs, which never hold the full data set, write the same reports.
+        """
+        self.run_builder('in_memory', reports=True)
+        reference = self.read_reports('in_memory')
+        for name, run_args in [('stream', dict(stream=True)),
+                               ('shards', dict(stream=True, num_workers=2)),
+                               ('binary', dict(stream=True, num_workers=2, output_format='bitpacked'))]:
+            db = self.run_builder(name, reports=True, **run_args)
+            self.assertIsNone(db.data_set)
+            for expected, actual in zip(reference, self.read_reports(name)):
+                self.assertEqual(list(expected.columns), list(actual.columns))
+                self.assertTrue(np.all(np.abs(expected.values - actual.values) < TestReportAccumulator.TOL))
+
+
+if __name__ == '__main__':
+    unittest.main()
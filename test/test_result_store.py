@@ -0,0 +1,47 @@
+import unittest
+import os
+from src import ResultStore
+from test.builder_test_case import BuilderTestCase
+import numpy as np
+import pandas as pd
+
+
+class TestResultStore(BuilderTestCase):
+    ARGS = {'chunk_size': 25, 'rng': 'spawn'}
+
+    def test_round_trip(self):
+        """ Binary results load back into the DataFrames get_results returns, whether they were
+            written at once, streamed or written by several workers.
+        """
+        reference = self.run_builder('csv').get_results()
+        for output_format in ResultStore.FORMATS:
+            for run_args in [dict(), dict(stream=True), dict(stream=True, num_workers=2)]:
+                name = '{0}_{1}'.format(output_format, len(run_args))
+                self.run_builder(name, output_format=output_format, **run_args)
+                loaded = ResultStore(os.path.join(self.output_dir, name)).load()
+                for expected, actual in zip(reference, loaded):
+                    self.assertEqual(list(expected.columns), list(actual.columns))
+                    self.assertTrue(np.array_equal(expected.values, actual.values))
+
+    def test_iter_blocks(self):
+        """ Blocks read from binary results hold the same results, and index assortments are not expanded.
+        """
+        reference = self.run_builder('csv').get_results()[1]
+        for output_format in ResultStore.FORMATS:
+            self.run_builder(output_format, output_format=output_format)
+            blocks = list(ResultStore(os.path.join(self.output_dir, output_format)).iter_blocks(25))
+            self.assertEqual([block.num_users for block in blocks], [25, 25, 10])
+            self.assertEqual(blocks[0].assortment is None, output_format == 'index')
+            data_set = pd.concat([block.get_data_set() for block in blocks], ignore_index=True)
+            self.assertTrue(np.array_equal(reference.values, data_set.values))
+
+    def test_csv_fallback(self):
+        """ Without binary results the csv files are loaded.
+        """
+        reference = self.run_builder('csv').get_results()
+        loaded = ResultStore(os.path.join(self.output_dir, 'csv')).load()
+        self.assertTrue(np.array_equal(reference[1].values, loaded[1].values))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import os
+import json
+from src import DatasetBuilder, RunMonitor
+from test.builder_test_case import BuilderTestCase
+
+
+class TestRunMonitor(BuilderTestCase):
+    ARGS = {'chunk_size': 25, 'engine': 'batched'}
+
+    def test_hooks_and_run_report(self):
+        """ Hooks see every stage start and end, and the run report holds stage timings and counters.
+        """
+        started, ended = [], []
+        monitor = RunMonitor(verbose=False)
+        monitor.add_hook(on_stage_start=started.append, on_stage_end=lambda stage, seconds: ended.append(stage))
+        db = DatasetBuilder(self.get_args('run'), monitor=monitor)
+        db.generate_data_set()
+        db.generate_reports()
+        db.write_run_report()
+
+        self.assertEqual(started, ended)
+        for stage in ['parsing', 'group_draw', 'utilities', 'doe', 'choices', 'assemble', 'save', 'reports']:
+            self.assertIn(stage, started)
+        self.assertEqual(started.count('doe'), 3)
+
+        with open(os.path.join(db.output_dir, RunMonitor.REPORT_FILE)) as f:
+            report = json.load(f)
+        self.assertEqual(report['counters'], {'users': 60, 'trips': 60*18, 'rows_written': 60*18})
+        self.assertEqual(report['stages']['doe']['calls'], 3)
+        self.assertEqual(report['config']['engine'], 'batched')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+import threading
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DatasetBuilder
+from server.simulation_server import SimulationServer
+from server.simulation_client import SimulationClient
+from test.builder_test_case import BuilderTestCase
+import numpy as np
+
+
+class TestSimulationServer(BuilderTestCase):
+    # Other arguments keep the command line defaults, so that server defaults are checked too
+    ARGS = {'rng': 'spawn'}
+
+    @classmethod
+    def setUpClass(cls):
+        """ Runs a server with two workers on an ephemeral port, in its own event loop thread.
+        """
+        cls.server = SimulationServer(BuilderTestCase.INPUT_DIR, 3, 12, port=0, num_workers=2)
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        asyncio.run_coroutine_threadsafe(cls.server.start(), cls.loop).result()
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.server.stop(), cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def run_builder(self, **request):
+        """ Returns the results of DatasetBuilder for the arguments of a request """
+        with redirect_stdout(StringIO()):
+            db = DatasetBuilder(self.get_args('builder', **request))
+            db.generate_data_set(save=False)
+        return db.get_results()
+
+    def test_same_results_as_dataset_builder(self):
+        """ Streamed results are those of DatasetBuilder, for successive requests on a connection.
+        """
+        with SimulationClient(port=self.server.port) as client:
+            for request in [dict(num_users=30),
+                            dict(num_users=50, chunk_size=7, seed=3, engine='batched'),
+                            dict(num_users=20, num_trips=5, shelf_size=4, engine='legacy', pantry=True)]:
+                for expected, actual in zip(self.run_builder(**request), client.simulate(**request)):
+                    self.assertEqual(list(expected.columns), list(actual.columns))
+                    self.assertTrue(np.array_equal(expected.values, actual.values))
+
+    def test_early_stop(self):
+        """ A request left after its first block does not leak blocks into the next request.
+        """
+        with SimulationClient(port=self.server.port) as client:
+            for block in client.iter_blocks(num_users=50, chunk_size=5, seed=1):
+                break
+            expected = self.run_builder(num_users=20, chunk_size=5, seed=2)[1]
+            self.assertTrue(np.array_equal(client.simulate(num_users=20, chunk_size=5, seed=2)[1].values,
+                                           expected.values))
+
+    def test_concurrent_requests(self):
+        """ Concurrent clients each get their own results.
+        """
+        results = dict()
+
+        def request(seed):
+            with SimulationClient(port=self.server.port) as client:
+                results[seed] = client.simulate(num_users=40, chunk_size=10, seed=seed)
+
+        threads = [threading.Thread(target=request, args=(seed,)) for seed in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for seed in range(4):
+            self.assertTrue(np.array_equal(results[seed][1].values,
+                                           self.run_builder(num_users=40, chunk_size=10, seed=seed)[1].values))
+
+    def test_invalid_request(self):
+        """ Invalid requests are answered with an error and the connection stays usable.
+        """
+        with SimulationClient(port=self.server.port) as client:
+            with self.assertRaises(ValueError):
+                client.simulate(num_users=10, colour='red')
+            with self.assertRaises(ValueError):
+                client.simulate(num_users=10, engine='unknown')
+            with self.assertRaises(ValueError):
+                client.simulate(num_users=10, chunk_size=None)
+            with self.assertRaises(ValueError):
+                client.simulate(num_users=10, num_trips='many')
+            self.assertEqual(client.simulate(num_users=10)[1].shape[0], 10*18)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DoEBuilder, SparseDoEBuilder, DatasetBuilder, ResultBuffer, ResultStore
+from src.dataset.output.report_accumulator import ReportAccumulator
+import random
+import numpy as np
+import pandas as pd
+
+
+class TestSparseDoEBuilder(unittest.TestCase):
+    TOL = 0.0000001  # Accepted level of error
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+
+    def test_same_probabilities_as_doe_builder(self):
+        """ After every trip the tree gives the draw probabilities of the dense receding quota rule.
+        """
+        for num_items, num_trips, shelf_size in [(12, 18, 6), (50, 30, 3), (7, 10, 6)]:
+            sparse = SparseDoEBuilder(num_items, num_trips, shelf_size, np.random.default_rng(1234))
+            dense = DoEBuilder(num_items, num_trips, shelf_size)
+            for _ in range(2):
+                sparse.reset()
+                dense.reset()
+                for it in range(num_trips):
+                    idx = sparse.next_shelf()
+                    self.assertEqual(np.unique(idx).size, shelf_size)
+                    dense.item_trip_counts[idx] += 1
+                    dense.num_running_trips += 1
+                    dense.update_probabilities()
+                    self.assertTrue(np.all(np.abs(sparse.get_draw_probabilities() - dense.item_draw_probs)
+                                           < TestSparseDoEBuilder.TOL))
+            with self.assertRaises(ValueError):
+                sparse.next_shelf()
+
+    def test_invalid_shelf_size(self):
+        """ Shelves larger than the catalog are rejected instead of drawn forever.
+        """
+        with self.assertRaises(ValueError):
+            SparseDoEBuilder(5, 3, 6)
+        with self.assertRaises(ValueError):
+            SparseDoEBuilder(5, 3, 0)
+        output_dir = tempfile.mkdtemp()
+        try:
+            args = {'input_dir': os.path.join(TestSparseDoEBuilder.TEST_DIR, 'test_data', 'input'),
+                    'output_dir': output_dir, 'group_distributions_file': 'user_group_distributions.csv',
+                    'group_probabilities_file': 'user_group_probabilities.csv', 'num_groups': 3, 'num_users': 2,
+                    'num_items': 12, 'num_trips': 3, 'shelf_size': 13, 'large_catalog': True}
+            with redirect_stdout(StringIO()):
+                with self.assertRaises(ValueError):
+                    DatasetBuilder(pd.Series(args))
+        finally:
+            shutil.rmtree(output_dir)
+
+    def test_first_shelf_frequencies(self):
+        """ Items of the first shelf are drawn uniformly.
+        """
+        sparse = SparseDoEBuilder(10, 1, 3, np.random.default_rng(1234))
+        counts = np.zeros(10)
+        for _ in range(3000):
+            counts[sparse.generate_design()] += 1
+        self.assertTrue(np.all(np.abs(counts/3000 - 0.3) < 0.04))
+
+    def test_sparse_result_buffer(self):
+        """ Sparse shelves give the same data set and reports as dense flags.
+        """
+        shelves = np.array([[[0, 3], [1, 2]], [[4, 2], [0, 1]]])
+        buffers = [ResultBuffer(2, 5, 2), ResultBuffer(2, 5, 2, shelf_size=2)]
+        accumulators = [ReportAccumulator(1, 5, 2), ReportAccumulator(1, 5, 2)]
+        for buffer, accumulator in zip(buffers, accumulators):
+            buffer.set_users(slice(None), np.arange(2), np.zeros(2), np.zeros([2, 5]))
+            buffer.set_trips(slice(None), np.repeat(np.arange(2), 2), np.tile([1, 2], 2), shelves[:, :, 0].ravel(),
+                             shelves.reshape(-1, 2))
+            accumulator.update(buffer)
+        self.assertTrue(buffers[0].get_data_set().equals(buffers[1].get_data_set()))
+        self.assertTrue(np.all(buffers[0].get_shelf_items() == buffers[1].get_shelf_items()))
+        self.assertTrue(np.all(accumulators[0].item_view_counts == accumulators[1].item_view_counts))
+
+    def test_dataset_builder(self):
+        """ Large catalog runs write the same results in memory, streamed, or as a binary index store.
+        """
+        output_dir = tempfile.mkdtemp()
+        args = {'input_dir': os.path.join(TestSparseDoEBuilder.TEST_DIR, 'test_data', 'input'),
+                'group_distributions_file': 'user_group_distributions.csv',
+                'group_probabilities_file': 'user_group_probabilities.csv',
+                'num_groups': 3, 'num_users': 20, 'num_items': 12, 'num_trips': 18, 'shelf_size': 6,
+                'seed': 1234, 'chunk_size': 8, 'engine': 'batched', 'large_catalog': True}
+        results = []
+        try:
+            for name, options in [('memory', {}), ('stream', {'stream': True}),
+                                  ('index', {'stream': True, 'output_format': 'index'})]:
+                random.seed(1234)
+                np.random.seed(1234)
+                with redirect_stdout(StringIO()):
+                    db = DatasetBuilder(pd.Series(dict(args, output_dir=os.path.join(output_dir, name), **options)))
+                    db.generate_data_set()
+                    db.generate_reports()
+                results.append(ResultStore(db.output_dir).load()[1])
+            for data_set in results[1:]:
+                self.assertTrue(np.all(data_set.values == results[0].values))
+            self.assertTrue(np.all(results[0].iloc[:, 3:].sum(axis=1) == 6))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import re
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DatasetBuilder
+from test.builder_test_case import BuilderTestCase
+
+
+class TestStreaming(BuilderTestCase):
+    ARGS = {'num_users': 120, 'chunk_size': 50}
+    OUTPUT_FILES = ['true_user_utilities.csv', 'simulated_data.csv']
+
+    def read_outputs(self, db):
+        contents = []
+        for file_name in TestStreaming.OUTPUT_FILES:
+            with open(os.path.join(db.output_dir, file_name), 'rb') as f:
+                contents.append(f.read())
+        return contents
+
+    def test_stream_matches_in_memory_run(self):
+        """ Streamed output files are byte-identical to the ones of a non-streaming run.
+        """
+        for engine in DatasetBuilder.ENGINES:
+            in_memory = self.run_builder(engine, engine=engine)
+            streamed = self.run_builder(engine + '_stream', engine=engine, stream=True)
+            self.assertEqual(self.read_outputs(in_memory), self.read_outputs(streamed))
+
+    def test_legacy_engine_is_chunk_size_independent(self):
+        """ The legacy engine output does not depend on the number of users per block.
+        """
+        reference = self.run_builder('reference')
+        chunked = self.run_builder('chunked', chunk_size=7, stream=True)
+        self.assertEqual(self.read_outputs(reference), self.read_outputs(chunked))
+
+    def test_spawned_streams_are_worker_count_independent(self):
+        """ With independent random streams per block, the output does not depend on the number of workers.
+        """
+        for engine in DatasetBuilder.ENGINES:
+            reference = self.run_builder(engine, engine=engine, rng='spawn')
+            for stream in [False, True]:
+                parallel = self.run_builder('{0}_{1}'.format(engine, stream), engine=engine, rng='spawn',
+                                            num_workers=3, stream=stream)
+                self.assertEqual(self.read_outputs(reference), self.read_outputs(parallel))
+                self.assertFalse(os.path.exists(os.path.join(parallel.output_dir, DatasetBuilder.SHARD_DIR)))
+
+    def test_parallel_progress(self):
+        """ With several workers progress is reported by the parent only, once per block, in increasing order.
+        """
+        for run_args in [dict(), dict(stream=True), dict(stream=True, output_format='index')]:
+            output = StringIO()
+            with redirect_stdout(output):
+                DatasetBuilder(self.get_args('progress_{0:d}'.format(len(run_args)), rng='spawn', num_workers=3,
+                                             **run_args)).generate_data_set()
+            progress = [int(done) for done in re.findall(r'\r(\d+)/120', output.getvalue())]
+            self.assertEqual(len(progress), 3)
+            self.assertEqual(progress, sorted(progress))
+            self.assertEqual(progress[-1], 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
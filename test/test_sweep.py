@@ -0,0 +1,90 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from src import DatasetBuilder
+from sweep.sweep_runner import SweepRunner
+import random
+import numpy as np
+import pandas as pd
+
+
+class TestSweep(unittest.TestCase):
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+
+    def setUp(self):
+        """ Sets up a sweep of 2 seeds x 2 shelf sizes on the test inputs.
+        """
+        self.output_dir = tempfile.mkdtemp()
+        self.config = {'output_dir': self.output_dir,
+                       'num_workers': 2,
+                       'base': {'input_dir': os.path.join(TestSweep.TEST_DIR, 'test_data', 'input'),
+                                'num_groups': 3, 'num_items': 12, 'num_users': 30, 'engine': 'batched'},
+                       'grid': {'seed': [1, 2], 'shelf_size': [4, 6]}}
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_sweep(self):
+        """ Every scenario gets its own output directory and manifest entry, inputs are parsed once,
+            and results are those of a standalone run of the same scenario.
+        """
+        with redirect_stdout(StringIO()):
+            manifest = SweepRunner(self.config).run()
+        self.assertEqual(manifest['num_inputs_parsed'], 1)
+        self.assertEqual([entry['status'] for entry in manifest['scenarios']], ['done']*4)
+        with open(os.path.join(self.output_dir, SweepRunner.MANIFEST_FILE)) as f:
+            self.assertEqual(len(json.load(f)['scenarios']), 4)
+
+        entry = [e for e in manifest['scenarios'] if e['config']['seed'] == 2 and e['config']['shelf_size'] == 4][0]
+        self.assertTrue(os.path.exists(os.path.join(entry['output_dir'], 'drawn_users_summary.csv')))
+        args = dict(entry['config'], output_dir=os.path.join(self.output_dir, 'standalone'))
+        random.seed(2)
+        np.random.seed(2)
+        with redirect_stdout(StringIO()):
+            DatasetBuilder(pd.Series(args)).generate_data_set()
+        for file_name in ['true_user_utilities.csv', 'simulated_data.csv']:
+            with open(os.path.join(entry['output_dir'], file_name), 'rb') as f:
+                swept = f.read()
+            with open(os.path.join(args['output_dir'], file_name), 'rb') as f:
+                self.assertEqual(swept, f.read())
+
+    def test_failed_scenario(self):
+        """ A scenario with invalid arguments is reported as failed without stopping the sweep.
+        """
+        self.config['num_workers'] = 1
+        self.config['grid'] = {'engine': ['batched', 'unknown'], 'num_trips': [5, None]}
+        with redirect_stdout(StringIO()):
+            manifest = SweepRunner(self.config).run()
+        self.assertEqual([entry['status'] for entry in manifest['scenarios']], ['done', 'failed', 'failed', 'failed'])
+        self.assertIn('TypeError', manifest['scenarios'][1]['error'])
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, SweepRunner.MANIFEST_FILE)))
+
+    def test_labels(self):
+        """ Labels show file names without their directory and extension, and keep other values distinct.
+        """
+        self.assertEqual(SweepRunner.get_label(3, {'consumption_rate': 1.5, 'group_probabilities_file': 'in/p1.csv'}),
+                         's0003_consumption_rate-1p5_group_probabilities_file-p1')
+        self.config['grid'] = {'consumption_rate': [1.5, 1.75, 1]}
+        self.assertEqual(len(set(SweepRunner(self.config).scenarios)), 3)
+
+    def test_failed_inputs(self):
+        """ Scenarios whose inputs can not be parsed are reported as failed and the others still run.
+        """
+        self.config['grid'] = {'seed': [1, 2]}
+        self.config['scenarios'] = [dict(), {'input_dir': os.path.join(self.output_dir, 'missing')},
+                                    {'num_items': 10}]
+        with redirect_stdout(StringIO()):
+            manifest = SweepRunner(self.config).run()
+        self.assertEqual(manifest['num_inputs_parsed'], 1)
+        self.assertEqual([entry['status'] for entry in manifest['scenarios']], ['done']*2 + ['failed']*4)
+        self.assertIn('FileNotFoundError', manifest['scenarios'][2]['error'])
+        self.assertIn('num_items', manifest['scenarios'][4]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+from src import DistributionParser, UserBuilder, UserBatchBuilder
+import numpy as np
+
+
+class TestUserBatchBuilder(unittest.TestCase):
+    TOL = 0.0000001  # Accepted level of error
+    TEST_DIR = os.path.abspath('.')
+    TEST_DIR = os.path.join(TEST_DIR, "test")
+    NUM_USERS = 40
+
+    def setUp(self):
+        """ Loads the reference group distributions used by the main simulator test.
+        """
+        input_dir = os.path.join(TestUserBatchBuilder.TEST_DIR, 'test_data', 'input')
+        self.group_distributions = DistributionParser(os.path.join(input_dir, 'user_group_distributions.csv'),
+                                                      os.path.join(input_dir, 'user_group_probabilities.csv'),
+                                                      12, 3)
+
+    def test_same_utilities_as_user_builder(self):
+        """ Drawing a group's members as one matrix gives the utilities of the per-user path.
+        """
+        for g in range(3):
+            np.random.seed(1234)
+            users = UserBatchBuilder(self.group_distributions, np.arange(TestUserBatchBuilder.NUM_USERS),
+                                     np.repeat(g, TestUserBatchBuilder.NUM_USERS))
+
+            np.random.seed(1234)
+            for iu in range(TestUserBatchBuilder.NUM_USERS):
+                user = UserBuilder(self.group_distributions.get_group_distribution(g), iu, g)
+                self.assertTrue(np.all(np.abs(users.get_utilities()[iu] - user.get_utilities())
+                                       < TestUserBatchBuilder.TOL))
+                self.assertTrue(np.all(np.abs(users.user_item_probabilities[iu] - user.user_item_probabilities)
+                                       < TestUserBatchBuilder.TOL))
+
+    def test_choice_frequencies(self):
+        """ Choices are made from the shelf with the logit probabilities of the user.
+        """
+        np.random.seed(1234)
+        users = UserBatchBuilder(self.group_distributions, np.arange(2), np.array([0, 2]))
+        num_trips = 20000
+        shelf = np.array([0, 3, 5, 8, 10, 11])
+        trip_items = np.tile(shelf, (2*num_trips, 1))
+        user_id, trip, choice = users.choose_from_items(trip_items)
+
+        self.assertTrue(np.all(user_id == np.repeat([0, 1], num_trips)))
+        self.assertTrue(np.all(trip == np.tile(np.arange(1, num_trips+1), 2)))
+        for iu in range(2):
+            p = users.user_item_probabilities[iu, shelf]/np.sum(users.user_item_probabilities[iu, shelf])
+            user_choices = choice[user_id == iu]
+            frequencies = np.array([np.mean(user_choices == item) for item in shelf])
+            self.assertTrue(np.all(np.abs(frequencies - p) < 0.02))
+
+
+if __name__ == '__main__':
+    unittest.main()